@@ -9,11 +9,11 @@ class PaysAdmin(admin.ModelAdmin):
 
 @admin.register(Lieu)
 class LieuAdmin(admin.ModelAdmin):
-    list_display = ['nom_ville', 'pays', 'latitude', 'longitude', 'geoname_id']
+    list_display = ['nom_ville', 'pays', 'latitude', 'longitude', 'geoname_id', 'nombre_voyages']
     list_filter = ['pays']
     search_fields = ['nom_ville', 'pays__nom']
     ordering = ['nom_ville']
-    readonly_fields = ['id', 'date_creation']
+    readonly_fields = ['id', 'date_creation', 'nombre_voyages', 'nombre_notes', 'somme_notes', 'date_derniere_visite']
 
 @admin.register(Voyage)
 class VoyageAdmin(admin.ModelAdmin):
@@ -38,6 +38,7 @@ class ActiviteAdmin(admin.ModelAdmin):
     list_filter = ('lieu__pays', 'date_creation', 'cree_par')
     search_fields = ('titre', 'description', 'lieu__nom_ville')
     readonly_fields = ('date_creation', 'note_moyenne', 'nombre_notes')
+    list_select_related = ('lieu__pays', 'cree_par', 'resume_notes')
     
     def note_moyenne(self, obj):
         return obj.get_note_moyenne() or "Aucune note"
@@ -0,0 +1,306 @@
+"""Autocomplétion en mémoire des noms de lieux et de pays
+
+Chaque processus garde un tableau trié de clés normalisées (un suffixe de mots du nom par
+clé : « aix en provence », « en provence », « provence ») parcouru par dichotomie ; les
+meilleurs résultats des préfixes fréquents sont précalculés, si bien que le classement à
+la volée ne porte jamais sur plus de SEUIL_PRECALCUL clés. Une requête ne touche pas la
+base : l'index est chargé au démarrage (wsgi.py) ou à la première requête, tenu à jour
+par les signaux des modèles dans le processus qui écrit, et rechargé en arrière-plan
+après AUTOCOMPLETE_TTL secondes pour les autres processus.
+"""
+import heapq
+import logging
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.db import transaction
+
+from .search import normaliser
+
+logger = logging.getLogger(__name__)
+
+# Les préfixes couvrant plus de SEUIL_PRECALCUL clés ont leurs meilleurs résultats précalculés ;
+# les autres sont classés à la volée sur au plus SEUIL_PRECALCUL clés
+SEUIL_PRECALCUL = 256
+TAILLE_PRECALCUL = 20
+LIMITE_MAX = TAILLE_PRECALCUL
+# Borne de la fin d'une plage de préfixe : plus grand que tout caractère d'une clé normalisée
+_FIN = '\U0010ffff'
+
+LIEU = 'lieu'
+PAYS = 'pays'
+
+
+class Entree:
+    """Nom indexé : lieu ou pays, avec sa popularité (voyages + favoris)"""
+    __slots__ = ('type', 'id', 'nom', 'pays', 'latitude', 'longitude', 'popularite', 'cles')
+
+    def __init__(self, type, id, nom, pays=None, latitude=None, longitude=None, popularite=0):
+        self.type = type
+        self.id = id
+        self.nom = nom
+        self.pays = pays
+        self.latitude = latitude
+        self.longitude = longitude
+        self.popularite = popularite
+        mots = normaliser(nom).split()
+        self.cles = sorted({' '.join(mots[i:]) for i in range(len(mots))})
+
+    @property
+    def reference(self):
+        return (self.type, self.id)
+
+
+def _rang(entree):
+    """Ordre des résultats : les plus populaires d'abord, puis par nom"""
+    return (-entree.popularite, entree.nom, str(entree.id))
+
+
+class IndexAutocompletion:
+    """Tableau trié de (clé, type, id) et meilleurs résultats des préfixes fréquents"""
+
+    def __init__(self, entrees=()):
+        self.verrou = threading.Lock()
+        self.entrees = {entree.reference: entree for entree in entrees}
+        self.cles = sorted(
+            (cle,) + entree.reference for entree in self.entrees.values() for cle in entree.cles
+        )
+        self.meilleures = {}
+        self._precalculer()
+
+    def _precalculer(self):
+        """Précalcule, longueur par longueur, les préfixes dont la plage dépasse SEUIL_PRECALCUL clés
+
+        Les clés étant triées, les clés d'un même préfixe sont contiguës : chaque longueur
+        coûte un parcours du tableau, et seules les plages encore trop larges descendent d'un niveau.
+        """
+        plages = [(0, len(self.cles))]
+        longueur = 1
+        while plages:
+            suivantes = []
+            for debut, fin in plages:
+                position = debut
+                while position < fin:
+                    cle = self.cles[position][0]
+                    if len(cle) < longueur:
+                        position += 1
+                        continue
+                    prefixe = cle[:longueur]
+                    borne = bisect_left(self.cles, (prefixe + _FIN,), position, fin)
+                    if borne - position > SEUIL_PRECALCUL:
+                        self.meilleures[prefixe] = self._classer(self.cles[position:borne])
+                        suivantes.append((position, borne))
+                    position = borne
+            plages = suivantes
+            longueur += 1
+
+    def _plage(self, prefixe):
+        debut = bisect_left(self.cles, (prefixe,))
+        return debut, bisect_left(self.cles, (prefixe + _FIN,), debut)
+
+    def _classer(self, cles, limite=TAILLE_PRECALCUL):
+        """Références des meilleures entrées parmi des clés (sans doublon)"""
+        entrees = {(type, id) for _, type, id in cles}
+        return [
+            entree.reference
+            for entree in heapq.nsmallest(limite, (self.entrees[reference] for reference in entrees), key=_rang)
+        ]
+
+    def rechercher(self, texte, limite=10):
+        """Les noms commençant (ou dont un mot commence) par le texte, les plus populaires d'abord"""
+        prefixe = normaliser(texte)
+        if not prefixe:
+            return []
+        references = self.meilleures.get(prefixe)
+        if references is None:
+            debut, fin = self._plage(prefixe)
+            references = self._classer(self.cles[debut:fin], limite)
+        entrees = [self.entrees.get(reference) for reference in references[:limite]]
+        return [self.serialiser(entree) for entree in entrees if entree is not None]
+
+    def serialiser(self, entree):
+        if entree.type == PAYS:
+            return {'type': PAYS, 'id': entree.id, 'nom': entree.nom}
+        pays = self.entrees.get((PAYS, entree.pays))
+        return {
+            'type': LIEU,
+            'id': str(entree.id),
+            'nom': entree.nom,
+            'pays': entree.pays,
+            'pays_nom': pays.nom if pays else None,
+            'latitude': entree.latitude,
+            'longitude': entree.longitude,
+        }
+
+    def _mettre_a_jour_meilleures(self, entree, presente):
+        """Replace l'entrée dans les listes précalculées des préfixes de ses clés
+
+        Une liste qui perd un élément est recalculée sur sa plage ; une entrée devenue moins
+        populaire reste à sa place relative jusqu'au prochain rechargement.
+        """
+        for cle in entree.cles:
+            for longueur in range(1, len(cle) + 1):
+                prefixe = cle[:longueur]
+                liste = self.meilleures.get(prefixe)
+                if liste is None:
+                    debut, fin = self._plage(prefixe)
+                    if fin - debut <= SEUIL_PRECALCUL:
+                        break
+                    self.meilleures[prefixe] = self._classer(self.cles[debut:fin])
+                    continue
+                if entree.reference in liste:
+                    liste.remove(entree.reference)
+                if presente:
+                    liste.append(entree.reference)
+                    liste.sort(key=lambda reference: _rang(self.entrees[reference]))
+                    del liste[TAILLE_PRECALCUL:]
+                elif len(liste) < TAILLE_PRECALCUL:
+                    debut, fin = self._plage(prefixe)
+                    if fin - debut > SEUIL_PRECALCUL:
+                        self.meilleures[prefixe] = self._classer(self.cles[debut:fin])
+                    else:
+                        del self.meilleures[prefixe]
+
+    def ajouter(self, entree):
+        """Ajoute ou remplace une entrée (la popularité connue est conservée)"""
+        with self.verrou:
+            ancienne = self.entrees.get(entree.reference)
+            if ancienne is not None:
+                entree.popularite = ancienne.popularite
+                self._retirer(ancienne)
+            self.entrees[entree.reference] = entree
+            for cle in entree.cles:
+                insort(self.cles, (cle,) + entree.reference)
+            self._mettre_a_jour_meilleures(entree, presente=True)
+        return ancienne
+
+    def retirer(self, reference):
+        with self.verrou:
+            entree = self.entrees.get(reference)
+            if entree is not None:
+                self._retirer(entree)
+        return entree
+
+    def _retirer(self, entree):
+        for cle in entree.cles:
+            position = bisect_left(self.cles, (cle,) + entree.reference)
+            if position < len(self.cles) and self.cles[position] == (cle,) + entree.reference:
+                del self.cles[position]
+        del self.entrees[entree.reference]
+        self._mettre_a_jour_meilleures(entree, presente=False)
+
+    def ajuster_popularite(self, reference, delta):
+        with self.verrou:
+            entree = self.entrees.get(reference)
+            if entree is not None:
+                entree.popularite = max(0, entree.popularite + delta)
+                self._mettre_a_jour_meilleures(entree, presente=True)
+
+
+def construire_index():
+    """Lit les lieux, les pays et les favoris (trois requêtes) et construit l'index"""
+    from django.db.models import Count
+    from .models import Favori, Lieu, Pays
+
+    favoris = dict(Favori.objects.order_by().values('lieu_id').annotate(n=Count('id')).values_list('lieu_id', 'n'))
+    popularite_pays = {}
+    entrees = []
+    for pk, nom_ville, pays_id, latitude, longitude, nombre_voyages in Lieu.objects.values_list(
+        'id', 'nom_ville', 'pays_id', 'latitude', 'longitude', 'nombre_voyages'
+    ).iterator(chunk_size=2000):
+        popularite = nombre_voyages + favoris.get(pk, 0)
+        popularite_pays[pays_id] = popularite_pays.get(pays_id, 0) + popularite
+        entrees.append(Entree(LIEU, pk, nom_ville, pays_id, float(latitude), float(longitude), popularite))
+    for code_iso, nom in Pays.objects.values_list('code_iso', 'nom'):
+        entrees.append(Entree(PAYS, code_iso, nom, popularite=popularite_pays.get(code_iso, 0)))
+    return IndexAutocompletion(entrees)
+
+
+class IndexIndisponible(Exception):
+    """L'index n'a pas pu être chargé (erreur journalisée par _charger)"""
+
+
+_index = None
+_date_chargement = 0.0
+_chargement = threading.Lock()
+
+
+def _charger():
+    global _index, _date_chargement
+    try:
+        index = construire_index()
+        _index, _date_chargement = index, time.monotonic()
+        logger.info("Index d'autocomplétion chargé : %d noms", len(index.entrees))
+    except Exception:
+        logger.exception("Échec du chargement de l'index d'autocomplétion")
+    finally:
+        _chargement.release()
+
+
+def precharger():
+    """Lance le chargement de l'index en arrière-plan (démarrage du serveur)"""
+    if _chargement.acquire(blocking=False):
+        threading.Thread(target=_charger, name='autocomplete', daemon=True).start()
+
+
+def get_index():
+    """Index courant : chargé à la première requête, rechargé en arrière-plan une fois périmé
+
+    Lève IndexIndisponible si aucun index n'a pu être chargé.
+    """
+    if _index is None:
+        with _chargement:
+            pass  # attend un chargement en cours
+        if _index is None:
+            _chargement.acquire()
+            _charger()
+        if _index is None:
+            raise IndexIndisponible
+    elif time.monotonic() - _date_chargement > settings.AUTOCOMPLETE_TTL:
+        precharger()
+    return _index
+
+
+def _appliquer(operation):
+    """Applique une mise à jour à l'index chargé, une fois la transaction validée"""
+    if _index is not None:
+        transaction.on_commit(lambda: _index is not None and operation(_index))
+
+
+def lieu_modifie(lieu):
+    def operation(index):
+        ancienne = index.ajouter(Entree(
+            LIEU, lieu.pk, lieu.nom_ville, lieu.pays_id, float(lieu.latitude), float(lieu.longitude)
+        ))
+        if ancienne is not None and ancienne.pays != lieu.pays_id:
+            index.ajuster_popularite((PAYS, ancienne.pays), -ancienne.popularite)
+            index.ajuster_popularite((PAYS, lieu.pays_id), ancienne.popularite)
+    _appliquer(operation)
+
+
+def lieu_supprime(lieu_id):
+    def operation(index):
+        entree = index.retirer((LIEU, lieu_id))
+        if entree is not None:
+            index.ajuster_popularite((PAYS, entree.pays), -entree.popularite)
+    _appliquer(operation)
+
+
+def pays_modifie(pays):
+    _appliquer(lambda index: index.ajouter(Entree(PAYS, pays.pk, pays.nom)))
+
+
+def pays_supprime(code_iso):
+    _appliquer(lambda index: index.retirer((PAYS, code_iso)))
+
+
+def popularite_lieu_modifiee(lieu_id, delta):
+    """Un voyage ou un favori ajouté (delta=1) ou retiré (delta=-1) sur un lieu"""
+    def operation(index):
+        entree = index.entrees.get((LIEU, lieu_id))
+        index.ajuster_popularite((LIEU, lieu_id), delta)
+        if entree is not None:
+            index.ajuster_popularite((PAYS, entree.pays), delta)
+    _appliquer(operation)
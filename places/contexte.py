@@ -0,0 +1,78 @@
+from .models import Voyage, NoteActivite
+
+
+class ContexteVisiteur:
+    """Données de l'utilisateur courant chargées une seule fois par requête
+
+    Les lieux visités et les activités déjà notées sont chargés paresseusement
+    (une requête chacun au premier accès) puis consultés en O(1) par les
+    serializers, au lieu d'une requête exists() par activité sérialisée.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self._lieux_visites = None
+        self._activites_notees = None
+
+    @classmethod
+    def pour_requete(cls, request):
+        """Retourne le contexte attaché à la requête, en le créant au premier appel"""
+        if request is None:
+            return cls(None)
+        contexte = getattr(request, '_contexte_visiteur', None)
+        if contexte is None or contexte.user is not request.user:
+            contexte = cls(request.user)
+            request._contexte_visiteur = contexte
+        return contexte
+
+    @property
+    def est_authentifie(self):
+        return self.user is not None and self.user.is_authenticated
+
+    @property
+    def lieux_visites(self):
+        """Ensemble des IDs des lieux où l'utilisateur a au moins un voyage"""
+        if self._lieux_visites is None:
+            if self.est_authentifie:
+                self._lieux_visites = set(
+                    Voyage.objects.filter(utilisateur=self.user).order_by().values_list('lieu_id', flat=True).distinct()
+                )
+            else:
+                self._lieux_visites = set()
+        return self._lieux_visites
+
+    @property
+    def activites_notees(self):
+        """Ensemble des IDs des activités déjà notées par l'utilisateur"""
+        if self._activites_notees is None:
+            if self.est_authentifie:
+                self._activites_notees = set(
+                    NoteActivite.objects.filter(utilisateur=self.user).order_by().values_list('activite_id', flat=True)
+                )
+            else:
+                self._activites_notees = set()
+        return self._activites_notees
+
+    def a_visite(self, lieu_id):
+        """Vérifie si l'utilisateur a visité le lieu"""
+        return lieu_id in self.lieux_visites
+
+    def a_note(self, activite_id):
+        """Vérifie si l'utilisateur a déjà noté l'activité"""
+        return activite_id in self.activites_notees
+
+    def peut_noter(self, activite):
+        """Un utilisateur peut noter une activité qu'il n'a pas créée, dans un lieu visité, une seule fois"""
+        if not self.est_authentifie:
+            return False
+        if activite.cree_par_id == self.user.pk:
+            return False
+        return self.a_visite(activite.lieu_id) and not self.a_note(activite.pk)
+
+    def marquer_visite(self, lieu_id):
+        """Enregistre un voyage créé pendant la requête"""
+        self.lieux_visites.add(lieu_id)
+
+    def marquer_note(self, activite_id):
+        """Enregistre une note créée pendant la requête"""
+        self.activites_notees.add(activite_id)
@@ -0,0 +1,154 @@
+"""Recommandations « les voyageurs qui ont visité X ont aussi visité Y » (co-visitation)
+
+La commande build_covisitation lit les voyages et les favoris au fil de l'eau, construit la
+matrice creuse utilisateurs x lieux (scipy.sparse), en déduit les co-occurrences lieu x lieu
+normalisées en similarité cosinus, et écrit les VOISINS_PAR_LIEU meilleurs voisins de chaque
+lieu dans un jeu de tableaux projeté en mémoire (places/tableaux_disque.py) :
+
+- ids : identifiants des lieux (UUID sur 16 octets), triés pour la recherche par dichotomie
+- voisins : (lieux, K) rangs des voisins dans ids, -1 au-delà des voisins connus
+- scores : (lieux, K) similarités correspondantes, décroissantes
+
+Une recommandation additionne en mémoire les listes de voisins des lieux de l'utilisateur.
+"""
+import threading
+import uuid
+from array import array
+
+import numpy as np
+from django.conf import settings
+
+from .tableaux_disque import charger_tableaux, ecrire_tableaux, version_courante
+
+VOISINS_PAR_LIEU = 20
+FICHIERS = ('ids', 'voisins', 'scores')
+
+
+def _cles(identifiants):
+    return np.array([identifiant.bytes for identifiant in identifiants], dtype='S16')
+
+
+class VoisinsLieux:
+    """Listes de voisins de chaque lieu : ids (n,), voisins (n, K) et scores (n, K)"""
+
+    def __init__(self, ids, voisins, scores):
+        self.ids = ids
+        self.voisins = voisins
+        self.scores = scores
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _rangs(self, lieux_ids):
+        """Rangs dans ids des lieux connus de l'index"""
+        if not len(self) or not lieux_ids:
+            return np.empty(0, dtype=np.intp)
+        cles = _cles(lieux_ids)
+        rangs = np.minimum(np.searchsorted(self.ids, cles), len(self) - 1)
+        return np.unique(rangs[self.ids[rangs] == cles])
+
+    def _identifiant(self, rang):
+        # .tobytes() garde les octets nuls finaux qu'un élément de type S16 perdrait
+        return uuid.UUID(bytes=self.ids[rang:rang + 1].tobytes())
+
+    def recommander(self, lieux_ids, nombre):
+        """Les lieux les mieux notés par la somme des similarités avec les lieux donnés, hors de ceux-ci
+
+        Retourne une liste de (identifiant, score), par score décroissant puis identifiant.
+        """
+        rangs = self._rangs(lieux_ids)
+        if not len(rangs):
+            return []
+        voisins = np.asarray(self.voisins[rangs]).ravel()
+        scores = np.asarray(self.scores[rangs], dtype=np.float64).ravel()
+        connus = voisins >= 0
+        candidats, positions = np.unique(voisins[connus], return_inverse=True)
+        totaux = np.bincount(positions, weights=scores[connus], minlength=len(candidats))
+        totaux[np.isin(candidats, rangs)] = 0.0
+        meilleurs = np.lexsort((candidats, -totaux))[:nombre]
+        return [
+            (self._identifiant(int(candidats[i])), float(totaux[i]))
+            for i in meilleurs if totaux[i] > 0
+        ]
+
+
+def calculer_voisins(paires, k=VOISINS_PAR_LIEU, min_covisiteurs=1):
+    """Tableaux (ids, voisins, scores) à partir de [(utilisateur_id, lieu_id)] (doublons permis)"""
+    from scipy import sparse
+
+    utilisateurs, lieux = {}, {}
+    lignes, colonnes = array('i'), array('i')
+    for utilisateur_id, lieu_id in paires:
+        lignes.append(utilisateurs.setdefault(utilisateur_id, len(utilisateurs)))
+        colonnes.append(lieux.setdefault(lieu_id, len(lieux)))
+    n = len(lieux)
+    cles = _cles(lieux)
+    ordre = np.argsort(cles, kind='stable')
+    # rang[i] : position du lieu i (ordre de lecture) dans les ids triés
+    rang = np.empty(n, dtype=np.int32)
+    rang[ordre] = np.arange(n, dtype=np.int32)
+    voisins = np.full((n, k), -1, dtype=np.int32)
+    scores = np.zeros((n, k), dtype=np.float32)
+    if not n:
+        return cles, voisins, scores
+
+    visites = sparse.csr_matrix(
+        (np.ones(len(lignes)), (np.frombuffer(lignes, dtype=np.int32), np.frombuffer(colonnes, dtype=np.int32))),
+        shape=(len(utilisateurs), n),
+    )
+    visites.data[:] = 1.0  # un utilisateur compte une fois par lieu, voyages et favori confondus
+    covisites = (visites.T @ visites).tocsr()
+    visiteurs = covisites.diagonal()
+    covisites.setdiag(0)
+    if min_covisiteurs > 1:
+        covisites.data[covisites.data < min_covisiteurs] = 0
+    covisites.eliminate_zeros()
+    # Similarité cosinus : co-visiteurs / racine du produit des nombres de visiteurs
+    normes = sparse.diags(1.0 / np.sqrt(visiteurs))
+    similarites = (normes @ covisites @ normes).tocsr()
+    similarites.sort_indices()
+
+    for i in range(n):
+        debut, fin = similarites.indptr[i], similarites.indptr[i + 1]
+        if debut == fin:
+            continue
+        rangs_voisins = rang[similarites.indices[debut:fin]]
+        # Classement sur les valeurs stockées (float32) : les similarités égales aux arrondis près sont ex aequo
+        valeurs = similarites.data[debut:fin].astype(np.float32)
+        # Similarité décroissante, puis rang (ordre des identifiants) pour départager
+        choisis = np.lexsort((rangs_voisins, -valeurs))[:k]
+        voisins[rang[i], :len(choisis)] = rangs_voisins[choisis]
+        scores[rang[i], :len(choisis)] = valeurs[choisis]
+    return cles[ordre], voisins, scores
+
+
+def construire_voisins(k=VOISINS_PAR_LIEU, min_covisiteurs=1):
+    """Recalcule les voisins de tous les lieux depuis les voyages et les favoris ; retourne le nombre de lieux"""
+    from itertools import chain
+    from .models import Favori, Voyage
+
+    paires = chain(
+        Voyage.objects.order_by().values_list('utilisateur_id', 'lieu_id').iterator(chunk_size=10000),
+        Favori.objects.order_by().values_list('utilisateur_id', 'lieu_id').iterator(chunk_size=10000),
+    )
+    ids, voisins, scores = calculer_voisins(paires, k, min_covisiteurs)
+    ecrire_tableaux(settings.COVISITATION_DIR, {'ids': ids, 'voisins': voisins, 'scores': scores})
+    return len(ids)
+
+
+_voisins = None
+_cible = None
+_chargement = threading.Lock()
+
+
+def get_voisins():
+    """Voisins en service (rechargés quand ils ont été recalculés), None s'ils n'ont jamais été calculés"""
+    global _voisins, _cible
+    cible = version_courante(settings.COVISITATION_DIR)
+    if cible is None:
+        return None
+    if cible != _cible:
+        with _chargement:
+            if cible != _cible:
+                _voisins, _cible = VoisinsLieux(**charger_tableaux(cible, FICHIERS)), cible
+    return _voisins
@@ -0,0 +1,161 @@
+"""Géocodage inverse : ville du gazetteer la plus proche d'un point, sans appel externe
+
+L'index est un jeu de tableaux NumPy écrits sur disque (commande build_reverse_geocoder,
+relancée par import_gazetteer) : les vecteurs unitaires des villes en float32, rangés par
+cellule d'une grille de PAS_GRILLE degrés, leurs geoname_id dans le même ordre et le début
+de chaque cellule dans ces tableaux (format CSR). Les fichiers sont projetés en mémoire
+(mmap) : les processus d'un même serveur partagent les pages du cache système au lieu
+de charger chacun leur copie (places/tableaux_disque.py).
+"""
+import math
+import threading
+from array import array
+
+import numpy as np
+from django.conf import settings
+
+from .spatial import DEMI_CIRCONFERENCE_KM, RAYON_TERRE_KM, bbox_cercle
+from .tableaux_disque import charger_tableaux, ecrire_tableaux, version_courante
+
+# Côté des cellules de la grille, en degrés (180 / PAS_GRILLE lignes, 360 / PAS_GRILLE colonnes)
+PAS_GRILLE = 1.0
+# Rayon de la première recherche, multiplié par FACTEUR_RAYON tant qu'aucune ville n'y est trouvée
+RAYON_INITIAL_KM = 25.0
+FACTEUR_RAYON = 4
+FICHIERS = ('vecteurs', 'ids', 'debuts')
+
+
+def vecteur_unitaire(latitude, longitude):
+    """Point de la sphère unité correspondant aux coordonnées"""
+    phi, lam = math.radians(float(latitude)), math.radians(float(longitude))
+    return np.array([math.cos(phi) * math.cos(lam), math.cos(phi) * math.sin(lam), math.sin(phi)])
+
+
+class IndexGeocodageInverse:
+    """Villes rangées par cellule de grille : vecteurs (n, 3), ids (n,) et debuts (cellules + 1,)"""
+
+    def __init__(self, vecteurs, ids, debuts):
+        self.vecteurs = vecteurs
+        self.ids = ids
+        self.debuts = debuts
+        self.lignes = round(math.sqrt((len(debuts) - 1) / 2))
+        self.colonnes = 2 * self.lignes
+        self.pas = 180.0 / self.lignes
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _ligne(self, latitude):
+        return min(self.lignes - 1, max(0, int((latitude + 90.0) // self.pas)))
+
+    def _plages_colonnes(self, west, east):
+        """Intervalles de colonnes [début, fin] couvrant les longitudes, coupés à l'antiméridien"""
+        if east - west >= 360.0:
+            return [(0, self.colonnes - 1)]
+        debut = math.floor((west + 180.0) / self.pas) % self.colonnes
+        fin = math.floor((east + 180.0) / self.pas) % self.colonnes
+        if debut <= fin:
+            return [(debut, fin)]
+        return [(debut, self.colonnes - 1), (0, fin)]
+
+    def _candidats(self, south, west, north, east):
+        """Indices des villes des cellules couvrant la fenêtre (une tranche contiguë par ligne et plage)"""
+        tranches = []
+        for ligne in range(self._ligne(south), self._ligne(north) + 1):
+            for debut, fin in self._plages_colonnes(west, east):
+                a = int(self.debuts[ligne * self.colonnes + debut])
+                b = int(self.debuts[ligne * self.colonnes + fin + 1])
+                if a < b:
+                    tranches.append(np.arange(a, b))
+        return np.concatenate(tranches) if tranches else np.empty(0, dtype=np.intp)
+
+    def plus_proche(self, latitude, longitude, rayon_max_km):
+        """(distance_km, geoname_id) de la ville la plus proche à moins de rayon_max_km, None sinon
+
+        Le rayon grandit jusqu'à ce qu'une ville s'y trouve : toutes les villes du cercle sont
+        dans les cellules lues, la plus proche d'entre elles est donc la plus proche de toutes.
+        """
+        if not len(self):
+            return None
+        cible = vecteur_unitaire(latitude, longitude)
+        rayon_max_km = min(float(rayon_max_km), DEMI_CIRCONFERENCE_KM)
+        rayon = min(RAYON_INITIAL_KM, rayon_max_km)
+        while True:
+            indices = self._candidats(*bbox_cercle(latitude, longitude, rayon))
+            if len(indices):
+                # Corde au carré en float64 : précise au mètre, là où arccos du produit scalaire ne l'est pas
+                ecarts = self.vecteurs[indices].astype(np.float64) - cible
+                cordes = np.einsum('ij,ij->i', ecarts, ecarts)
+                meilleur = int(np.argmin(cordes))
+                distance = 2 * RAYON_TERRE_KM * math.asin(min(1.0, math.sqrt(cordes[meilleur]) / 2))
+                if distance <= rayon:
+                    return distance, int(self.ids[indices[meilleur]])
+            if rayon >= rayon_max_km:
+                return None
+            rayon = min(rayon * FACTEUR_RAYON, rayon_max_km)
+
+
+def construire_tableaux(points, pas=PAS_GRILLE):
+    """Tableaux de l'index à partir de [(geoname_id, latitude, longitude)]"""
+    ids, latitudes, longitudes = array('i'), array('d'), array('d')
+    for geoname_id, latitude, longitude in points:
+        ids.append(geoname_id)
+        latitudes.append(float(latitude))
+        longitudes.append(float(longitude))
+    ids = np.frombuffer(ids, dtype=np.int32) if ids else np.empty(0, dtype=np.int32)
+    latitudes = np.frombuffer(latitudes, dtype=np.float64) if latitudes else np.empty(0)
+    longitudes = np.frombuffer(longitudes, dtype=np.float64) if longitudes else np.empty(0)
+
+    lignes, colonnes = round(180.0 / pas), round(360.0 / pas)
+    cellules = (
+        np.clip(np.floor((latitudes + 90.0) / pas), 0, lignes - 1).astype(np.int64) * colonnes
+        + np.floor((longitudes + 180.0) / pas).astype(np.int64) % colonnes
+    )
+    ordre = np.lexsort((ids, cellules))
+    phi, lam = np.radians(latitudes[ordre]), np.radians(longitudes[ordre])
+    vecteurs = np.column_stack((np.cos(phi) * np.cos(lam), np.cos(phi) * np.sin(lam), np.sin(phi)))
+    debuts = np.searchsorted(cellules[ordre], np.arange(lignes * colonnes + 1)).astype(np.int64)
+    return vecteurs.astype(np.float32), ids[ordre], debuts
+
+
+def construire_index():
+    """Reconstruit l'index depuis le gazetteer ; retourne le nombre de villes indexées"""
+    from .models import VilleGazetteer
+
+    vecteurs, ids, debuts = construire_tableaux(
+        VilleGazetteer.objects.order_by().values_list('geoname_id', 'latitude', 'longitude').iterator(chunk_size=10000)
+    )
+    ecrire_tableaux(settings.GEOCODAGE_INDEX_DIR, {'vecteurs': vecteurs, 'ids': ids, 'debuts': debuts})
+    return len(ids)
+
+
+_index = None
+_cible = None
+_chargement = threading.Lock()
+
+
+def get_index():
+    """Index en service : rechargé quand il a été reconstruit, construit s'il n'existe pas encore"""
+    global _index, _cible
+    cible = version_courante(settings.GEOCODAGE_INDEX_DIR)
+    if cible is None or cible != _cible:
+        with _chargement:
+            if cible is None:
+                construire_index()
+                cible = version_courante(settings.GEOCODAGE_INDEX_DIR)
+            if cible != _cible:
+                _index, _cible = IndexGeocodageInverse(**charger_tableaux(cible, FICHIERS)), cible
+    return _index
+
+
+def ville_la_plus_proche(latitude, longitude, rayon_max_km):
+    """(distance_km, VilleGazetteer) la plus proche du point à moins de rayon_max_km, None sinon"""
+    from .models import VilleGazetteer
+
+    resultat = get_index().plus_proche(latitude, longitude, rayon_max_km)
+    if resultat is None:
+        return None
+    distance, geoname_id = resultat
+    ville = VilleGazetteer.objects.filter(pk=geoname_id).first()
+    # Ville supprimée depuis la construction de l'index
+    return (distance, ville) if ville is not None else None
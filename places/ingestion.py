@@ -0,0 +1,110 @@
+"""Médias joints à la création d'un voyage ou d'une activité (envoi multipart de plusieurs fichiers)
+
+Les fichiers sont écrits en parallèle dans le stockage des médias (adressé par contenu,
+places/stockage.py) par un pool de MEDIAS_INGESTION_WORKERS fils, avant l'ouverture de la
+transaction : hachage et écriture relâchent le GIL, et la durée d'un envoi est celle de son
+plus gros fichier plutôt que la somme de tous. La transaction crée ensuite l'objet parent
+et insère les lignes des médias en une requête (bulk_create).
+
+Chaque écriture valide sa propre référence au fichier, sur la connexion de son fil : si
+une écriture, l'objet parent ou l'insertion échoue, les références prises sont retirées
+et les fichiers qui n'en ont plus sont effacés. Rien n'est créé à moitié.
+"""
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from . import renditions, televersements
+
+_pool = None
+
+
+def _executeur():
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(
+            max_workers=settings.MEDIAS_INGESTION_WORKERS, thread_name_prefix='ingestion'
+        )
+    return _pool
+
+
+def _ecrire(champ, fichier):
+    try:
+        return champ.storage.save(champ.generate_filename(None, fichier.name), fichier, max_length=champ.max_length)
+    finally:
+        # Chaque fil a sa propre connexion : la fermer entre deux tâches
+        connection.close()
+
+
+def _liberer(stockage, nom):
+    try:
+        stockage.delete(nom)
+    finally:
+        connection.close()
+
+
+def ecrire(modele, fichiers):
+    """Écrit les fichiers en parallèle ; retourne leurs noms dans le stockage, dans l'ordre
+
+    Si une écriture échoue, celles qui ont abouti sont annulées avant de relever l'erreur.
+    """
+    champ = modele._meta.get_field('fichier')
+    taches = [_executeur().submit(_ecrire, champ, fichier) for fichier in fichiers]
+    wait(taches)
+    erreurs = [tache.exception() for tache in taches if tache.exception() is not None]
+    if erreurs:
+        annuler(modele, [tache.result() for tache in taches if tache.exception() is None])
+        raise erreurs[0]
+    return [tache.result() for tache in taches]
+
+
+def annuler(modele, noms):
+    """Retire les références prises par ecrire, hors de la transaction en cours (annulée)"""
+    stockage = modele._meta.get_field('fichier').storage
+    list(_executeur().map(lambda nom: _liberer(stockage, nom), noms))
+
+
+def creer(modele, fichiers, noms, **parent):
+    """Insère les médias des fichiers écrits en une requête, et planifie les déclinaisons des images
+
+    bulk_create n'envoie pas de signaux : les champs posés par preparer_media le sont ici.
+    """
+    medias = []
+    for i, (fichier, nom) in enumerate(zip(fichiers, noms)):
+        type_media = televersements.type_media(fichier.content_type)
+        medias.append(modele(
+            fichier=nom,
+            type_media=type_media,
+            titre=f"Média {i+1}",
+            description=f"Fichier {fichier.name}",
+            ordre=i,
+            taille_octets=fichier.size,
+            etat_renditions=renditions.ATTENTE if type_media == 'image' else renditions.SANS_OBJET,
+            **parent,
+        ))
+    modele.objects.bulk_create(medias)
+    for media in medias:
+        if media.etat_renditions == renditions.ATTENTE:
+            renditions.planifier(media)
+    return medias
+
+
+@contextmanager
+def medias_joints(modele, fichiers):
+    """Écrit les fichiers, puis ouvre la transaction de création ; donne la fonction qui crée les médias
+
+        with medias_joints(MediaVoyage, fichiers) as joindre:
+            voyage = Voyage.objects.create(...)
+            joindre(voyage=voyage)
+
+    Une exception dans le bloc annule la transaction et les écritures.
+    """
+    noms = ecrire(modele, fichiers)
+    try:
+        with transaction.atomic():
+            yield lambda **parent: creer(modele, fichiers, noms, **parent)
+    except BaseException:
+        annuler(modele, noms)
+        raise
@@ -0,0 +1,58 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from places.models import Lieu
+from places.spatial import distance_km, plus_proches
+
+
+class Command(BaseCommand):
+    help = 'Compare la recherche des plus proches lieux (index par cellules) à un parcours complet de la table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requetes', type=int, default=50, help='Nombre de points de recherche aléatoires')
+        parser.add_argument('--k', type=int, default=10, help='Nombre de voisins recherchés')
+        parser.add_argument('--radius-km', type=float, default=500.0, help='Rayon maximal de recherche')
+        parser.add_argument('--seed', type=int, default=0, help='Graine du générateur aléatoire')
+
+    def handle(self, *args, **options):
+        if options['requetes'] < 1:
+            raise CommandError('--requetes doit être positif')
+        k, rayon_max = options['k'], options['radius_km']
+        rng = random.Random(options['seed'])
+        points = [
+            (rng.uniform(-90, 90), rng.uniform(-180, 180))
+            for _ in range(options['requetes'])
+        ]
+        self.stdout.write(f'🔧 {len(points)} recherches de {k} voisins sur {Lieu.objects.count()} lieux...')
+
+        debut = time.perf_counter()
+        resultats_index = [plus_proches(Lieu.objects.all(), lat, lon, k, rayon_max) for lat, lon in points]
+        duree_index = time.perf_counter() - debut
+
+        debut = time.perf_counter()
+        resultats_complets = []
+        for lat, lon in points:
+            distances = sorted(
+                (distance_km(lat, lon, lieu_lat, lieu_lon), pk)
+                for pk, lieu_lat, lieu_lon in Lieu.objects.values_list('pk', 'latitude', 'longitude').iterator()
+            )
+            resultats_complets.append([(d, pk) for d, pk in distances[:k] if d <= rayon_max])
+        duree_complet = time.perf_counter() - debut
+
+        # Les égalités de distance peuvent être départagées différemment : on compare les distances
+        ecarts = sum(
+            1 for index, complet in zip(resultats_index, resultats_complets)
+            if [round(d, 9) for d, _ in index] != [round(d, 9) for d, _ in complet]
+        )
+
+        self.stdout.write(f'  📍 Index : {duree_index * 1000 / len(points):.2f} ms par recherche')
+        self.stdout.write(f'  🐢 Parcours complet : {duree_complet * 1000 / len(points):.2f} ms par recherche')
+        if ecarts:
+            self.stdout.write(self.style.ERROR(f'❌ {ecarts} recherches diffèrent du parcours complet'))
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'🎯 Résultats identiques, gain x{duree_complet / max(duree_index, 1e-9):.1f}'
+                )
+            )
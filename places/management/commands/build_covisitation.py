@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from places.covisitation import VOISINS_PAR_LIEU, construire_voisins
+
+
+class Command(BaseCommand):
+    help = 'Recalcule les voisins de co-visitation des lieux (suggestions « ont aussi visité ») à partir des voyages et des favoris'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--k', type=int, default=VOISINS_PAR_LIEU, help='Nombre de voisins conservés par lieu')
+        parser.add_argument(
+            '--min-covisiteurs', type=int, default=1,
+            help='Nombre minimal de voyageurs communs pour que deux lieux soient voisins'
+        )
+
+    def handle(self, *args, **options):
+        if options['k'] < 1 or options['min_covisiteurs'] < 1:
+            raise CommandError('--k et --min-covisiteurs doivent être positifs')
+        self.stdout.write('🔧 Calcul des voisins de co-visitation...')
+        
+        debut = time.perf_counter()
+        count_lieux = construire_voisins(options['k'], options['min_covisiteurs'])
+        
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'🎯 Voisins calculés ! {count_lieux} lieux en {time.perf_counter() - debut:.1f} s'
+            )
+        )
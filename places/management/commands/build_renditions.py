@@ -0,0 +1,49 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from places import renditions
+from places.models import MediaActivite, MediaVoyage
+
+
+def _generer(modele, media_id):
+    try:
+        return renditions.generer(modele, media_id)
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Produit les déclinaisons des images restées en attente ou en échec (thumb, card, full en WebP et JPEG)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.RENDITIONS_WORKERS, help='Nombre de fils de traitement'
+        )
+        parser.add_argument('--tous', action='store_true', help='Décline à nouveau toutes les images')
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError('--workers doit être positif')
+        etats = [renditions.ATTENTE, renditions.ECHEC, renditions.PRET] if options['tous'] else [renditions.ATTENTE, renditions.ECHEC]
+        taches = [
+            (modele, media_id)
+            for modele in (MediaVoyage, MediaActivite)
+            for media_id in modele.objects.filter(type_media='image', etat_renditions__in=etats).values_list('pk', flat=True)
+        ]
+        self.stdout.write(f'🔧 Déclinaison de {len(taches)} images...')
+
+        debut = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['workers']) as executeur:
+            resultats = list(executeur.map(lambda tache: _generer(*tache), taches))
+        count_echecs = resultats.count(renditions.ECHEC)
+
+        if count_echecs:
+            self.stdout.write(self.style.ERROR(f'❌ {count_echecs} images illisibles (état « échec »)'))
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'🎯 Déclinaisons terminées ! {resultats.count(renditions.PRET)} images en {time.perf_counter() - debut:.1f} s'
+            )
+        )
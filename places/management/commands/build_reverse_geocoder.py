@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from places.geocodage import construire_index
+
+
+class Command(BaseCommand):
+    help = "Reconstruit l'index de géocodage inverse (tableaux NumPy projetés en mémoire) à partir du gazetteer"
+
+    def handle(self, *args, **options):
+        self.stdout.write("🔧 Construction de l'index de géocodage inverse...")
+        
+        count_villes = construire_index()
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'🎯 Index construit ! {count_villes} villes indexées')
+        )
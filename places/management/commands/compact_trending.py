@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from places.models import TendanceLieu
+
+
+class Command(BaseCommand):
+    help = 'Compacte les scores des lieux tendance (repères ramenés au présent, scores négligeables supprimés) ; à lancer régulièrement'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recalculer', action='store_true',
+            help='Recalcule tous les scores depuis les voyages et les favoris au lieu de les compacter'
+        )
+
+    def handle(self, *args, **options):
+        if options['recalculer']:
+            self.stdout.write('🔧 Recalcul des scores de tendance...')
+            count_lignes = TendanceLieu.recalculer()
+            self.stdout.write(self.style.SUCCESS(f'🎯 Recalcul terminé ! {count_lignes} scores enregistrés'))
+            return
+
+        self.stdout.write('🔧 Compaction des scores de tendance...')
+        count_supprimes = TendanceLieu.compacter()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'🎯 Compaction terminée ! {count_supprimes} scores négligeables supprimés, '
+                f'{TendanceLieu.objects.count()} restants'
+            )
+        )
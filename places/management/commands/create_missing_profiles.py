@@ -1,36 +1,114 @@
-from django.core.management.base import BaseCommand
+import time
+
+from django.core.management.base import BaseCommand, CommandError
 from django.contrib.auth.models import User
-from places.models import UserProfile
+from django.db import connection, transaction
+from places.models import EffectifScore, UserProfile
+
+BIO_AUTOMATIQUE = 'Profil créé automatiquement'
 
 
 class Command(BaseCommand):
     help = 'Crée automatiquement les profils utilisateurs manquants avec score_total initialisé à 0'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk', type=int, default=2000, help='Nombre de profils créés par requête')
+        parser.add_argument('--progress', action='store_true', help='Affiche l\'avancement après chaque lot')
+        parser.add_argument(
+            '--benchmark', action='store_true',
+            help='Compare au parcours utilisateur par utilisateur, dans des transactions annulées (rien n\'est créé)'
+        )
+
     def handle(self, *args, **options):
-        self.stdout.write('🔧 Création des profils utilisateurs manquants...')
-        
+        if options['chunk'] < 1:
+            raise CommandError('--chunk doit être positif')
+        if options['benchmark']:
+            return self.comparer(options['chunk'])
+
+        count_manquants = User.objects.filter(profile__isnull=True).count()
+        self.stdout.write(f'🔧 Création des profils utilisateurs manquants ({count_manquants} à créer)...')
+
+        count_created = 0
+        for count_lot in self.creer_profils(options['chunk']):
+            count_created += count_lot
+            if options['progress']:
+                self.stdout.write(f'  🆕 {count_created}/{count_manquants} profils créés')
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'🎯 Migration terminée ! {count_created} profils créés, '
+                f'{User.objects.count() - count_created} profils existants'
+            )
+        )
+
+    def creer_profils(self, taille_lot):
+        """Crée les profils manquants par lots ; produit le nombre de profils créés par lot"""
+        # Anti-jointure (LEFT JOIN ... WHERE profil IS NULL) parcourue par curseur serveur
+        manquants = User.objects.filter(profile__isnull=True).order_by('pk').values_list('pk', flat=True)
+        lot = []
+        for utilisateur_id in manquants.iterator(chunk_size=taille_lot):
+            lot.append(utilisateur_id)
+            if len(lot) == taille_lot:
+                yield self.creer_lot(lot)
+                lot = []
+        if lot:
+            yield self.creer_lot(lot)
+
+    def creer_lot(self, utilisateur_ids):
+        """Crée les profils d'un lot d'utilisateurs, sans écraser ceux créés entre-temps"""
+        with transaction.atomic():
+            profils = UserProfile.objects.filter(utilisateur_id__in=utilisateur_ids)
+            count_avant = profils.count()
+            UserProfile.objects.bulk_create(
+                [UserProfile(utilisateur_id=utilisateur_id, bio=BIO_AUTOMATIQUE) for utilisateur_id in utilisateur_ids],
+                ignore_conflicts=True,
+            )
+            count_created = profils.count() - count_avant
+            # bulk_create ne déclenche pas post_save : compter les nouveaux profils (score 0) au cache de rang
+            if count_created:
+                EffectifScore.appliquer(0, 1, count_created)
+        return count_created
+
+    def boucle_par_utilisateur(self):
+        """Ancienne méthode : une lecture, et au besoin une création, par utilisateur"""
         count_created = 0
-        count_existing = 0
-        
         for user in User.objects.all():
             try:
-                # Vérifier si l'utilisateur a déjà un profil
-                profile = UserProfile.objects.get(utilisateur=user)
-                count_existing += 1
-                self.stdout.write(f'  ✅ {user.username} a déjà un profil (score: {profile.score_total})')
-                
+                UserProfile.objects.get(utilisateur=user)
             except UserProfile.DoesNotExist:
-                # Créer un nouveau profil
-                profile = UserProfile.objects.create(
-                    utilisateur=user,
-                    bio='Profil créé automatiquement',
-                    score_total=0
-                )
+                UserProfile.objects.create(utilisateur=user, bio=BIO_AUTOMATIQUE, score_total=0)
                 count_created += 1
-                self.stdout.write(f'  🆕 Profil créé pour {user.username} (score: {profile.score_total})')
-        
-        self.stdout.write(
-            self.style.SUCCESS(
-                f'🎯 Migration terminée ! {count_created} profils créés, {count_existing} profils existants'
+        return count_created
+
+    def mesurer(self, fonction):
+        """(résultat, durée en secondes, nombre de requêtes) d'une exécution annulée en fin de mesure"""
+        count_requetes = 0
+
+        def compter(execute, sql, params, many, context):
+            nonlocal count_requetes
+            count_requetes += 1
+            return execute(sql, params, many, context)
+
+        with transaction.atomic(), connection.execute_wrapper(compter):
+            debut = time.perf_counter()
+            resultat = fonction()
+            duree = time.perf_counter() - debut
+            transaction.set_rollback(True)
+        return resultat, duree, count_requetes
+
+    def comparer(self, taille_lot):
+        self.stdout.write(f'🔧 Comparaison sur {User.objects.count()} utilisateurs (transactions annulées)...')
+
+        count_lots, duree_lots, requetes_lots = self.mesurer(lambda: sum(self.creer_profils(taille_lot)))
+        count_boucle, duree_boucle, requetes_boucle = self.mesurer(self.boucle_par_utilisateur)
+
+        self.stdout.write(f'  📦 Anti-jointure et lots : {duree_lots:.2f} s, {requetes_lots} requêtes')
+        self.stdout.write(f'  🐢 Boucle par utilisateur : {duree_boucle:.2f} s, {requetes_boucle} requêtes')
+        if count_lots != count_boucle:
+            self.stdout.write(self.style.ERROR(f'❌ {count_lots} profils créés par lots, {count_boucle} par la boucle'))
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'🎯 {count_lots} profils créés des deux façons, gain x{duree_boucle / max(duree_lots, 1e-9):.1f}'
+                )
             )
-        ) 
\ No newline at end of file
@@ -0,0 +1,102 @@
+import io
+import zipfile
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from places.geocodage import construire_index
+from places.models import VilleGazetteer
+from places.search import normaliser
+
+# Colonnes utiles d'un export GeoNames (cities500.txt, cities15000.txt, FR.txt...)
+GEONAME_ID, NOM, NOM_ASCII, LATITUDE, LONGITUDE, CLASSE = 0, 1, 2, 4, 5, 6
+CODE_PAYS, CODE_ADMIN1, POPULATION, FUSEAU_HORAIRE = 8, 10, 14, 17
+NOMBRE_COLONNES = 19
+CHAMPS_MIS_A_JOUR = [
+    'nom', 'nom_ascii', 'nom_normalise', 'latitude', 'longitude',
+    'code_pays', 'code_admin1', 'population', 'fuseau_horaire',
+]
+
+
+class Command(BaseCommand):
+    help = "Importe un export GeoNames des villes (fichier .txt tabulé ou archive .zip) dans le gazetteer local"
+
+    def add_arguments(self, parser):
+        parser.add_argument('fichier', help='Chemin du fichier GeoNames (.txt ou .zip)')
+        parser.add_argument('--min-population', type=int, default=0, help='Ignore les villes moins peuplées')
+        parser.add_argument('--pays', default='', help="Codes pays à importer, séparés par des virgules (tous par défaut)")
+        parser.add_argument('--chunk', type=int, default=5000, help='Nombre de villes écrites par transaction')
+
+    def _ouvrir(self, chemin):
+        """Flux texte des lignes du fichier, lu au fil de l'eau (premier .txt d'une archive)"""
+        try:
+            if not zipfile.is_zipfile(chemin):
+                return open(chemin, encoding='utf-8')
+            archive = zipfile.ZipFile(chemin)
+            noms = [nom for nom in archive.namelist() if nom.endswith('.txt') and 'readme' not in nom.lower()]
+            if not noms:
+                raise CommandError(f"Aucun fichier .txt dans l'archive {chemin}")
+            return io.TextIOWrapper(archive.open(noms[0]), encoding='utf-8')
+        except OSError as e:
+            raise CommandError(f"Impossible d'ouvrir {chemin} : {e}")
+
+    def _villes(self, lignes, min_population, pays):
+        """Villes à importer ; compte les lignes ignorées dans self.ignorees"""
+        for ligne in lignes:
+            colonnes = ligne.rstrip('\n').split('\t')
+            if len(colonnes) < NOMBRE_COLONNES or colonnes[CLASSE] != 'P':
+                self.ignorees += 1
+                continue
+            try:
+                population = int(colonnes[POPULATION] or 0)
+                ville = VilleGazetteer(
+                    geoname_id=int(colonnes[GEONAME_ID]),
+                    nom=colonnes[NOM][:200],
+                    nom_ascii=colonnes[NOM_ASCII][:200],
+                    nom_normalise=normaliser(colonnes[NOM])[:200],
+                    latitude=round(float(colonnes[LATITUDE]), 6),
+                    longitude=round(float(colonnes[LONGITUDE]), 6),
+                    code_pays=colonnes[CODE_PAYS],
+                    code_admin1=colonnes[CODE_ADMIN1][:20],
+                    population=population,
+                    fuseau_horaire=colonnes[FUSEAU_HORAIRE][:40],
+                )
+            except ValueError:
+                self.ignorees += 1
+                continue
+            if population < min_population or len(ville.code_pays) != 2 or (pays and ville.code_pays not in pays):
+                self.ignorees += 1
+                continue
+            yield ville
+
+    def handle(self, *args, **options):
+        if options['chunk'] < 1:
+            raise CommandError('--chunk doit être positif')
+        pays = {code.strip().upper() for code in options['pays'].split(',') if code.strip()}
+        self.ignorees = 0
+        importees = 0
+
+        self.stdout.write(f"🔧 Import du gazetteer depuis {options['fichier']}...")
+        with self._ouvrir(options['fichier']) as lignes:
+            villes = self._villes(lignes, options['min_population'], pays)
+            while lot := list(islice(villes, options['chunk'])):
+                # Une transaction par lot : une interruption garde les lots écrits, relancer l'import les met à jour
+                with transaction.atomic():
+                    VilleGazetteer.objects.bulk_create(
+                        lot,
+                        update_conflicts=True,
+                        unique_fields=['geoname_id'],
+                        update_fields=CHAMPS_MIS_A_JOUR,
+                    )
+                importees += len(lot)
+                self.stdout.write(f'  📍 {importees} villes importées...')
+
+        self.stdout.write("  🧭 Reconstruction de l'index de géocodage inverse...")
+        indexees = construire_index()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'🎯 Import terminé ! {importees} villes importées ou mises à jour, {self.ignorees} lignes ignorées, '
+                f'{indexees} villes indexées'
+            )
+        )
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from places.models import MediaActivite, MediaVoyage
+from places.stockage import PREFIXE
+
+
+class Command(BaseCommand):
+    help = 'Range les fichiers des médias enregistrés avant le stockage adressé par contenu dans ce stockage (doublons fusionnés)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Compte les fichiers à ranger sans les déplacer')
+
+    def handle(self, *args, **options):
+        self.stdout.write('🔧 Rangement des médias dans le stockage adressé par contenu...')
+
+        count_ranges = 0
+        count_manquants = 0
+        for modele in (MediaVoyage, MediaActivite):
+            anciens = modele.objects.exclude(fichier='').exclude(fichier__startswith=PREFIXE + '/')
+            for media in anciens.only('pk', 'fichier').iterator(chunk_size=500):
+                stockage = media.fichier.storage
+                ancien_nom = media.fichier.name
+                if not stockage.exists(ancien_nom):
+                    count_manquants += 1
+                    self.stdout.write(f'  ⚠️  Fichier manquant : {ancien_nom}')
+                    continue
+                if options['dry_run']:
+                    count_ranges += 1
+                    continue
+                with transaction.atomic():
+                    with stockage.open(ancien_nom, 'rb') as fichier:
+                        nom = stockage.save(ancien_nom, fichier)
+                    modele.objects.filter(pk=media.pk).update(fichier=nom)
+                    # Ancien nom, hors du stockage adressé : supprimé directement
+                    transaction.on_commit(lambda ancien_nom=ancien_nom, stockage=stockage: stockage.delete(ancien_nom))
+                count_ranges += 1
+
+        verbe = 'à ranger' if options['dry_run'] else 'rangés'
+        self.stdout.write(
+            self.style.SUCCESS(f'🎯 Rangement terminé ! {count_ranges} fichiers {verbe}, {count_manquants} manquants')
+        )
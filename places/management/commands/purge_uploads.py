@@ -0,0 +1,42 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from places.models import TeleversementMedia
+from places.stockage import balayer_orphelins, stockage_medias
+
+
+class Command(BaseCommand):
+    help = 'Supprime les téléversements expirés, les fichiers partiels orphelins et les fichiers du stockage sans référence ; à lancer régulièrement'
+
+    def handle(self, *args, **options):
+        self.stdout.write('🔧 Purge des téléversements expirés...')
+
+        # La suppression de chaque session efface son fichier partiel (signal post_delete)
+        _, par_modele = TeleversementMedia.objects.filter(date_expiration__lte=timezone.now()).delete()
+        count_sessions = par_modele.get(TeleversementMedia._meta.label, 0)
+
+        # Fichiers partiels sans session (processus interrompu entre la création du fichier et celle de la ligne)
+        count_orphelins = 0
+        if os.path.isdir(settings.TELEVERSEMENTS_DIR):
+            # Lister avant de lire les sessions : un fichier créé entre-temps a déjà sa ligne
+            noms = os.listdir(settings.TELEVERSEMENTS_DIR)
+            sessions = {str(pk) for pk in TeleversementMedia.objects.values_list('pk', flat=True)}
+            for nom in noms:
+                if nom.endswith('.part') and nom[:-len('.part')] not in sessions:
+                    try:
+                        os.remove(os.path.join(settings.TELEVERSEMENTS_DIR, nom))
+                    except FileNotFoundError:
+                        continue
+                    count_orphelins += 1
+
+        # Fichiers rangés dans le stockage par une transaction annulée
+        count_stockage = balayer_orphelins(stockage_medias())
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'🎯 Purge terminée ! {count_sessions} sessions supprimées, {count_orphelins} fichiers orphelins, '
+                f'{count_stockage} fichiers sans référence dans le stockage'
+            )
+        )
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from places.models import EffectifScore, Lieu, ResumeNotesActivite
+from places.tuiles import vider_cache_tuiles
+
+
+class Command(BaseCommand):
+    help = 'Recalcule entièrement les agrégats stockés (lieux, résumés des notes d\'activités et cache de rang du classement) à partir des données sources'
+
+    def handle(self, *args, **options):
+        self.stdout.write('🔧 Recalcul des agrégats des lieux, des activités et du classement...')
+        
+        with transaction.atomic():
+            count_lieux = Lieu.recalculer_agregats()
+            count_activites = ResumeNotesActivite.recalculer()
+            count_profils = EffectifScore.recalculer()
+        # Les tuiles portent le nombre de voyages et la note moyenne des lieux
+        vider_cache_tuiles()
+        
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'🎯 Recalcul terminé ! {count_lieux} lieux, {count_activites} activités '
+                f'et {count_profils} profils classés mis à jour'
+            )
+        )
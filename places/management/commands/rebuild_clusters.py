@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from places.models import GroupeLieux
+
+
+class Command(BaseCommand):
+    help = 'Reconstruit les groupes de lieux de la carte (tous les niveaux de zoom) à partir des lieux'
+
+    def handle(self, *args, **options):
+        self.stdout.write('🔧 Reconstruction des groupes de lieux...')
+        
+        with transaction.atomic():
+            count_lieux = GroupeLieux.recalculer()
+        
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'🎯 Reconstruction terminée ! {count_lieux} lieux regroupés sur {GroupeLieux.objects.count()} cellules'
+            )
+        )
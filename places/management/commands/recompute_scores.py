@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+from places.models import UserProfile
+from places.scoring import recalculer_scores
+
+
+class Command(BaseCommand):
+    help = 'Recalcule le score de chaque profil depuis ses voyages, activités créées et notes selon le barème courant'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk', type=int, default=1000, help='Nombre de profils verrouillés et recalculés par transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Affiche les écarts sans corriger les scores')
+        parser.add_argument(
+            '--user', type=int, action='append', dest='utilisateurs', metavar='ID',
+            help='Limite le recalcul à cet utilisateur (option répétable)'
+        )
+
+    def handle(self, *args, **options):
+        if options['chunk'] < 1:
+            raise CommandError('--chunk doit être positif')
+        utilisateurs = options['utilisateurs']
+        if utilisateurs:
+            trouves = set(UserProfile.objects.filter(utilisateur_id__in=utilisateurs).values_list('utilisateur_id', flat=True))
+            manquants = sorted(set(utilisateurs) - trouves)
+            if manquants:
+                raise CommandError(f"Aucun profil pour les utilisateurs : {', '.join(map(str, manquants))}")
+        self.stdout.write('🔧 Recalcul des scores depuis les voyages, activités et notes...')
+
+        count_ecarts = 0
+        derive = 0
+        for ecarts in recalculer_scores(options['chunk'], appliquer=not options['dry_run'], utilisateurs=utilisateurs):
+            for utilisateur_id, score, registre, attendu in ecarts:
+                count_ecarts += 1
+                derive += abs(attendu - score)
+                self.stdout.write(
+                    f'  ⚠️  Utilisateur {utilisateur_id} : {score} en cache, {registre} au registre, {attendu} recalculés'
+                )
+
+        verbe = 'à corriger' if options['dry_run'] else 'corrigés'
+        self.stdout.write(
+            self.style.SUCCESS(f'🎯 Recalcul terminé ! {count_ecarts} scores {verbe}, dérive totale de {derive} points')
+        )
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+from places.scoring import reconcilier
+
+
+class Command(BaseCommand):
+    help = 'Ramène le score en cache de chaque profil (score_total) à la somme de son registre de points ; à lancer régulièrement'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk', type=int, default=1000, help='Nombre de profils verrouillés et vérifiés par transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Affiche les écarts sans corriger les scores')
+
+    def handle(self, *args, **options):
+        if options['chunk'] < 1:
+            raise CommandError('--chunk doit être positif')
+        self.stdout.write('🔧 Réconciliation des scores avec le registre des points...')
+
+        ecarts = reconcilier(options['chunk'], appliquer=not options['dry_run'])
+        for utilisateur_id, score, attendu in ecarts:
+            self.stdout.write(f'  ⚠️  Utilisateur {utilisateur_id} : {score} en cache, {attendu} au registre')
+
+        verbe = 'à corriger' if options['dry_run'] else 'corrigés'
+        self.stdout.write(self.style.SUCCESS(f'🎯 Réconciliation terminée ! {len(ecarts)} scores {verbe}'))
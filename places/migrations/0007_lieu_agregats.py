@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:07
+
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def calculer_agregats_lieux(apps, schema_editor):
+    Lieu = apps.get_model("places", "Lieu")
+    Voyage = apps.get_model("places", "Voyage")
+    voyages = Voyage.objects.filter(lieu_id=OuterRef("pk")).order_by().values("lieu_id")
+    notes = voyages.exclude(note__isnull=True)
+    Lieu.objects.update(
+        nombre_voyages=Coalesce(Subquery(voyages.annotate(n=Count("id")).values("n")), 0),
+        nombre_notes=Coalesce(Subquery(notes.annotate(n=Count("id")).values("n")), 0),
+        somme_notes=Coalesce(Subquery(notes.annotate(s=Sum("note")).values("s")), 0),
+        date_derniere_visite=Subquery(voyages.annotate(d=Max("date_debut")).values("d")),
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("places", "0006_userprofile_score_total"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="lieu",
+            name="date_derniere_visite",
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="lieu",
+            name="nombre_notes",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="lieu",
+            name="nombre_voyages",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="lieu",
+            name="somme_notes",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(calculer_agregats_lieux, migrations.RunPython.noop),
+    ]
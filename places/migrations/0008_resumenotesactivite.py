@@ -0,0 +1,97 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def creer_resumes_notes(apps, schema_editor):
+    Activite = apps.get_model("places", "Activite")
+    ResumeNotesActivite = apps.get_model("places", "ResumeNotesActivite")
+    poids, moyenne = 5, 3.0
+    resumes = []
+    activites = Activite.objects.annotate(
+        nombre=Count("notes"),
+        somme=Sum("notes__note", default=0),
+        **{f"n{etoiles}": Count("notes", filter=Q(notes__note=etoiles)) for etoiles in range(1, 6)},
+    )
+    for activite in activites.iterator(chunk_size=2000):
+        resumes.append(
+            ResumeNotesActivite(
+                activite_id=activite.pk,
+                nombre_notes=activite.nombre,
+                somme_notes=activite.somme,
+                notes_1=activite.n1,
+                notes_2=activite.n2,
+                notes_3=activite.n3,
+                notes_4=activite.n4,
+                notes_5=activite.n5,
+                score_bayesien=(poids * moyenne + activite.somme) / (poids + activite.nombre),
+            )
+        )
+        if len(resumes) >= 2000:
+            ResumeNotesActivite.objects.bulk_create(resumes)
+            resumes = []
+    ResumeNotesActivite.objects.bulk_create(resumes)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("places", "0007_lieu_agregats"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ResumeNotesActivite",
+            fields=[
+                (
+                    "activite",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="resume_notes",
+                        serialize=False,
+                        to="places.activite",
+                    ),
+                ),
+                ("nombre_notes", models.PositiveIntegerField(default=0)),
+                ("somme_notes", models.PositiveIntegerField(default=0)),
+                (
+                    "notes_1",
+                    models.PositiveIntegerField(
+                        default=0, help_text="Nombre de notes à 1 étoile"
+                    ),
+                ),
+                (
+                    "notes_2",
+                    models.PositiveIntegerField(
+                        default=0, help_text="Nombre de notes à 2 étoiles"
+                    ),
+                ),
+                (
+                    "notes_3",
+                    models.PositiveIntegerField(
+                        default=0, help_text="Nombre de notes à 3 étoiles"
+                    ),
+                ),
+                (
+                    "notes_4",
+                    models.PositiveIntegerField(
+                        default=0, help_text="Nombre de notes à 4 étoiles"
+                    ),
+                ),
+                (
+                    "notes_5",
+                    models.PositiveIntegerField(
+                        default=0, help_text="Nombre de notes à 5 étoiles"
+                    ),
+                ),
+                ("score_bayesien", models.FloatField(db_index=True, default=3.0)),
+            ],
+            options={
+                "verbose_name": "Résumé des notes d'activité",
+                "verbose_name_plural": "Résumés des notes d'activités",
+            },
+        ),
+        migrations.RunPython(creer_resumes_notes, migrations.RunPython.noop),
+    ]
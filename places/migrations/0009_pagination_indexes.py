@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("places", "0008_resumenotesactivite"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="activite",
+            index=models.Index(
+                fields=["-date_creation", "id"], name="activite_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="activite",
+            index=models.Index(
+                fields=["lieu", "-date_creation", "id"], name="activite_lieu_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="favori",
+            index=models.Index(
+                fields=["utilisateur", "-date_ajout", "id"], name="favori_user_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="lieu",
+            index=models.Index(fields=["nom_ville", "id"], name="lieu_nom_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="noteactivite",
+            index=models.Index(
+                fields=["utilisateur", "-date_creation", "id"],
+                name="note_user_date_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="voyage",
+            index=models.Index(
+                fields=["utilisateur", "-date_debut", "id"], name="voyage_user_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="voyage",
+            index=models.Index(
+                fields=["lieu", "-date_debut", "id"], name="voyage_lieu_date_idx"
+            ),
+        ),
+    ]
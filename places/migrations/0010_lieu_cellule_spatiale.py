@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:12
+
+from django.db import migrations, models
+
+from places.spatial import code_cellule
+
+
+def calculer_cellules(apps, schema_editor):
+    Lieu = apps.get_model("places", "Lieu")
+    lieux = []
+    for lieu in Lieu.objects.only("id", "latitude", "longitude").iterator(chunk_size=2000):
+        lieu.cellule_spatiale = code_cellule(lieu.latitude, lieu.longitude)
+        lieux.append(lieu)
+        if len(lieux) >= 2000:
+            Lieu.objects.bulk_update(lieux, ["cellule_spatiale"])
+            lieux = []
+    Lieu.objects.bulk_update(lieux, ["cellule_spatiale"])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("places", "0009_pagination_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="lieu",
+            name="cellule_spatiale",
+            field=models.BigIntegerField(
+                blank=True, db_index=True, editable=False, null=True
+            ),
+        ),
+        migrations.RunPython(calculer_cellules, migrations.RunPython.noop),
+    ]
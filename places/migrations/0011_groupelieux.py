@@ -0,0 +1,75 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:19
+
+from django.db import migrations, models
+
+from places.spatial import NIVEAU_MAX_GROUPES, cellule_mercator, regrouper
+
+
+def calculer_groupes(apps, schema_editor):
+    Lieu = apps.get_model("places", "Lieu")
+    GroupeLieux = apps.get_model("places", "GroupeLieux")
+    points = []
+    for latitude, longitude in Lieu.objects.values_list("latitude", "longitude").iterator(chunk_size=2000):
+        latitude, longitude = float(latitude), float(longitude)
+        points.append(cellule_mercator(latitude, longitude) + (latitude, longitude))
+    for niveau in range(NIVEAU_MAX_GROUPES + 1):
+        GroupeLieux.objects.bulk_create(
+            (
+                GroupeLieux(
+                    niveau=niveau,
+                    x=x,
+                    y=y,
+                    nombre=groupe[0],
+                    somme_latitude=groupe[1],
+                    somme_longitude=groupe[2],
+                    latitude_min=groupe[3],
+                    latitude_max=groupe[4],
+                    longitude_min=groupe[5],
+                    longitude_max=groupe[6],
+                )
+                for (x, y), groupe in regrouper(points, niveau).items()
+            ),
+            batch_size=2000,
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("places", "0010_lieu_cellule_spatiale"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="GroupeLieux",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("niveau", models.PositiveSmallIntegerField()),
+                ("x", models.PositiveIntegerField()),
+                ("y", models.PositiveIntegerField()),
+                ("nombre", models.PositiveIntegerField(default=0)),
+                ("somme_latitude", models.FloatField(default=0)),
+                ("somme_longitude", models.FloatField(default=0)),
+                ("latitude_min", models.FloatField()),
+                ("latitude_max", models.FloatField()),
+                ("longitude_min", models.FloatField()),
+                ("longitude_max", models.FloatField()),
+            ],
+            options={
+                "verbose_name_plural": "Groupes de lieux",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("niveau", "x", "y"), name="groupe_lieux_cellule_unique"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(calculer_groupes, migrations.RunPython.noop),
+    ]
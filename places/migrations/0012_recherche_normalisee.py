@@ -0,0 +1,77 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:26
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+from places.search import normaliser
+
+
+def normaliser_noms(apps, schema_editor):
+    Pays = apps.get_model("places", "Pays")
+    Lieu = apps.get_model("places", "Lieu")
+    pays = list(Pays.objects.only("code_iso", "nom"))
+    for p in pays:
+        p.nom_normalise = normaliser(p.nom)
+    Pays.objects.bulk_update(pays, ["nom_normalise"], batch_size=2000)
+    lieux = []
+    for lieu in Lieu.objects.only("id", "nom_ville").iterator(chunk_size=2000):
+        lieu.nom_normalise = normaliser(lieu.nom_ville)
+        lieux.append(lieu)
+        if len(lieux) >= 2000:
+            Lieu.objects.bulk_update(lieux, ["nom_normalise"])
+            lieux = []
+    Lieu.objects.bulk_update(lieux, ["nom_normalise"])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("places", "0011_groupelieux"),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name="lieu",
+            name="nom_normalise",
+            field=models.CharField(blank=True, editable=False, max_length=200),
+        ),
+        migrations.AddField(
+            model_name="pays",
+            name="nom_normalise",
+            field=models.CharField(blank=True, editable=False, max_length=100),
+        ),
+        migrations.RunPython(normaliser_noms, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="lieu",
+            index=models.Index(
+                fields=["nom_normalise"],
+                name="lieu_nom_prefixe_idx",
+                opclasses=["varchar_pattern_ops"],
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="lieu",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["nom_normalise"],
+                name="lieu_nom_trgm_idx",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="pays",
+            index=models.Index(
+                fields=["nom_normalise"],
+                name="pays_nom_prefixe_idx",
+                opclasses=["varchar_pattern_ops"],
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="pays",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["nom_normalise"],
+                name="pays_nom_trgm_idx",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ),
+    ]
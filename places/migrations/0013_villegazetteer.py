@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:42
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+from places.pays_reference import nom_pays
+from places.search import normaliser
+
+
+def nommer_pays(apps, schema_editor):
+    """Remplace les noms provisoires « Pays XX » par les noms du référentiel"""
+    Pays = apps.get_model("places", "Pays")
+    noms_pris = set(Pays.objects.values_list("nom", flat=True))
+    for pays in Pays.objects.filter(nom__startswith="Pays "):
+        nom = nom_pays(pays.code_iso)
+        if nom and nom not in noms_pris:
+            pays.nom, pays.nom_normalise = nom, normaliser(nom)
+            pays.save(update_fields=["nom", "nom_normalise"])
+            noms_pris.add(nom)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("places", "0012_recherche_normalisee"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="VilleGazetteer",
+            fields=[
+                ("geoname_id", models.IntegerField(primary_key=True, serialize=False)),
+                ("nom", models.CharField(max_length=200)),
+                ("nom_ascii", models.CharField(blank=True, max_length=200)),
+                (
+                    "nom_normalise",
+                    models.CharField(blank=True, editable=False, max_length=200),
+                ),
+                ("latitude", models.DecimalField(decimal_places=6, max_digits=9)),
+                ("longitude", models.DecimalField(decimal_places=6, max_digits=9)),
+                ("code_pays", models.CharField(db_index=True, max_length=2)),
+                ("code_admin1", models.CharField(blank=True, max_length=20)),
+                ("population", models.BigIntegerField(default=0)),
+                ("fuseau_horaire", models.CharField(blank=True, max_length=40)),
+            ],
+            options={
+                "verbose_name_plural": "Villes du gazetteer",
+                "ordering": ["-population", "geoname_id"],
+                "indexes": [
+                    models.Index(
+                        fields=["nom_normalise"],
+                        name="gazetteer_nom_prefixe_idx",
+                        opclasses=["varchar_pattern_ops"],
+                    ),
+                    django.contrib.postgres.indexes.GinIndex(
+                        fields=["nom_normalise"],
+                        name="gazetteer_nom_trgm_idx",
+                        opclasses=["gin_trgm_ops"],
+                    ),
+                ],
+            },
+        ),
+        migrations.RunPython(nommer_pays, migrations.RunPython.noop),
+    ]
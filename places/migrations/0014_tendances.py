@@ -0,0 +1,106 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:55
+
+from itertools import chain
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+from places.tendances import FENETRES, POIDS_FAVORI, POIDS_VOYAGE, SEUIL_SUPPRESSION, scores_fenetres
+
+
+def calculer_tendances(apps, schema_editor):
+    Voyage = apps.get_model("places", "Voyage")
+    Favori = apps.get_model("places", "Favori")
+    EpoqueTendance = apps.get_model("places", "EpoqueTendance")
+    TendanceLieu = apps.get_model("places", "TendanceLieu")
+    maintenant = timezone.now()
+    EpoqueTendance.objects.bulk_create(
+        EpoqueTendance(fenetre=fenetre, demi_vie=demi_vie, repere=maintenant) for fenetre, demi_vie in FENETRES.items()
+    )
+    evenements = chain(
+        (
+            (lieu_id, instant, POIDS_VOYAGE)
+            for lieu_id, instant in Voyage.objects.values_list("lieu_id", "date_creation")
+        ),
+        (
+            (lieu_id, instant, POIDS_FAVORI)
+            for lieu_id, instant in Favori.objects.values_list("lieu_id", "date_ajout")
+        ),
+    )
+    scores = scores_fenetres(evenements, {fenetre: (maintenant, demi_vie) for fenetre, demi_vie in FENETRES.items()})
+    TendanceLieu.objects.bulk_create(
+        (
+            TendanceLieu(lieu_id=lieu_id, fenetre=fenetre, score=score)
+            for (lieu_id, fenetre), score in scores.items()
+            if score >= SEUIL_SUPPRESSION
+        ),
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("places", "0013_villegazetteer"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EpoqueTendance",
+            fields=[
+                (
+                    "fenetre",
+                    models.CharField(max_length=8, primary_key=True, serialize=False),
+                ),
+                ("demi_vie", models.DurationField()),
+                ("repere", models.DateTimeField()),
+            ],
+            options={
+                "verbose_name_plural": "Époques des tendances",
+            },
+        ),
+        migrations.CreateModel(
+            name="TendanceLieu",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("fenetre", models.CharField(max_length=8)),
+                ("score", models.FloatField(default=0)),
+            ],
+            options={
+                "verbose_name_plural": "Tendances des lieux",
+            },
+        ),
+        migrations.AddIndex(
+            model_name="lieu",
+            index=models.Index(
+                fields=["-nombre_voyages", "nom_ville", "id"],
+                name="lieu_populaires_idx",
+            ),
+        ),
+        migrations.AddField(
+            model_name="tendancelieu",
+            name="lieu",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="tendances",
+                to="places.lieu",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="tendancelieu",
+            index=models.Index(fields=["fenetre", "-score", "lieu"], name="tendance_classement_idx"),
+        ),
+        migrations.AddConstraint(
+            model_name="tendancelieu",
+            constraint=models.UniqueConstraint(fields=("lieu", "fenetre"), name="tendance_lieu_fenetre_unique"),
+        ),
+        migrations.RunPython(calculer_tendances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:58
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+# EffectifScore.LARGEUR_TRANCHE
+LARGEUR_TRANCHE = 100
+
+
+def compter_scores(apps, schema_editor):
+    UserProfile = apps.get_model("places", "UserProfile")
+    EffectifScore = apps.get_model("places", "EffectifScore")
+    effectifs = dict(
+        UserProfile.objects.order_by().values("score_total").annotate(n=Count("id")).values_list("score_total", "n")
+    )
+    tranches = {}
+    for score, nombre in effectifs.items():
+        tranches[score // LARGEUR_TRANCHE] = tranches.get(score // LARGEUR_TRANCHE, 0) + nombre
+    EffectifScore.objects.bulk_create(
+        [EffectifScore(niveau=0, valeur=score, nombre=nombre) for score, nombre in effectifs.items()]
+        + [EffectifScore(niveau=1, valeur=tranche, nombre=nombre) for tranche, nombre in tranches.items()],
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("places", "0014_tendances"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EffectifScore",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("niveau", models.PositiveSmallIntegerField()),
+                ("valeur", models.PositiveIntegerField()),
+                ("nombre", models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                "verbose_name_plural": "Effectifs des scores",
+            },
+        ),
+        migrations.AddIndex(
+            model_name="userprofile",
+            index=models.Index(
+                fields=["-score_total", "id"], name="profil_classement_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="effectifscore",
+            constraint=models.UniqueConstraint(
+                fields=("niveau", "valeur"), name="effectif_score_unique"
+            ),
+        ),
+        migrations.RunPython(compter_scores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def reprendre_scores(apps, schema_editor):
+    """Un mouvement « reprise » par profil : le registre part des scores existants"""
+    UserProfile = apps.get_model("places", "UserProfile")
+    MouvementPoints = apps.get_model("places", "MouvementPoints")
+    MouvementPoints.objects.bulk_create(
+        (
+            MouvementPoints(utilisateur_id=utilisateur_id, points=score_total, motif="reprise")
+            for utilisateur_id, score_total in UserProfile.objects.exclude(score_total=0).values_list(
+                "utilisateur_id", "score_total"
+            )
+        ),
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("places", "0015_classement"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MouvementPoints",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("points", models.IntegerField()),
+                (
+                    "motif",
+                    models.CharField(
+                        choices=[
+                            ("creation_voyage", "Création de voyage"),
+                            ("creation_activite", "Création d'activité"),
+                            ("notation_activite", "Notation d'activité"),
+                            ("reprise", "Reprise du score existant"),
+                            ("correction", "Correction"),
+                        ],
+                        max_length=32,
+                    ),
+                ),
+                ("type_source", models.CharField(blank=True, max_length=64)),
+                ("source_id", models.CharField(blank=True, max_length=64)),
+                ("date_creation", models.DateTimeField(auto_now_add=True)),
+                (
+                    "utilisateur",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="mouvements_points",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Mouvement de points",
+                "verbose_name_plural": "Mouvements de points",
+                "ordering": ["-date_creation"],
+                "indexes": [
+                    models.Index(
+                        fields=["utilisateur", "-date_creation"],
+                        name="mouvement_points_user_idx",
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        condition=models.Q(("source_id", ""), _negated=True),
+                        fields=("motif", "type_source", "source_id"),
+                        name="mouvement_points_source_unique",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(reprendre_scores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:06
+
+from django.db import migrations, models
+
+
+def marquer_videos(apps, schema_editor):
+    """Les vidéos ne sont pas déclinées ; les images existantes restent en attente (commande build_renditions)"""
+    for nom in ("MediaVoyage", "MediaActivite"):
+        apps.get_model("places", nom).objects.exclude(type_media="image").update(etat_renditions="sans_objet")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("places", "0016_registre_points"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="mediaactivite",
+            name="etat_renditions",
+            field=models.CharField(
+                choices=[
+                    ("attente", "En attente"),
+                    ("pret", "Prêtes"),
+                    ("echec", "Échec"),
+                    ("sans_objet", "Sans objet"),
+                ],
+                default="attente",
+                editable=False,
+                max_length=16,
+            ),
+        ),
+        migrations.AddField(
+            model_name="mediaactivite",
+            name="hauteur",
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="mediaactivite",
+            name="largeur",
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="mediaactivite",
+            name="renditions",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name="mediaactivite",
+            name="taille_octets",
+            field=models.PositiveBigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="mediavoyage",
+            name="etat_renditions",
+            field=models.CharField(
+                choices=[
+                    ("attente", "En attente"),
+                    ("pret", "Prêtes"),
+                    ("echec", "Échec"),
+                    ("sans_objet", "Sans objet"),
+                ],
+                default="attente",
+                editable=False,
+                max_length=16,
+            ),
+        ),
+        migrations.AddField(
+            model_name="mediavoyage",
+            name="hauteur",
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="mediavoyage",
+            name="largeur",
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="mediavoyage",
+            name="renditions",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name="mediavoyage",
+            name="taille_octets",
+            field=models.PositiveBigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(marquer_videos, migrations.RunPython.noop),
+    ]
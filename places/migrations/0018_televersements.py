@@ -0,0 +1,113 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:09
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("places", "0017_renditions"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TeleversementMedia",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("nom_fichier", models.CharField(max_length=255)),
+                ("type_mime", models.CharField(max_length=100)),
+                ("taille", models.PositiveBigIntegerField()),
+                ("taille_morceau", models.PositiveIntegerField()),
+                ("sha256", models.CharField(blank=True, max_length=64)),
+                (
+                    "etat",
+                    models.CharField(
+                        choices=[("en_cours", "En cours"), ("termine", "Terminé")],
+                        default="en_cours",
+                        max_length=16,
+                    ),
+                ),
+                ("date_creation", models.DateTimeField(auto_now_add=True)),
+                ("date_expiration", models.DateTimeField(db_index=True)),
+                (
+                    "media_activite",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="places.mediaactivite",
+                    ),
+                ),
+                (
+                    "media_voyage",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="places.mediavoyage",
+                    ),
+                ),
+                (
+                    "utilisateur",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="televersements",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Téléversement de média",
+                "verbose_name_plural": "Téléversements de médias",
+            },
+        ),
+        migrations.CreateModel(
+            name="MorceauTeleversement",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("index", models.PositiveIntegerField()),
+                ("taille", models.PositiveIntegerField()),
+                ("sha256", models.CharField(max_length=64)),
+                ("date_reception", models.DateTimeField(auto_now=True)),
+                (
+                    "televersement",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="morceaux",
+                        to="places.televersementmedia",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Morceau de téléversement",
+                "verbose_name_plural": "Morceaux de téléversements",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("televersement", "index"),
+                        name="morceau_televersement_unique",
+                    )
+                ],
+            },
+        ),
+    ]
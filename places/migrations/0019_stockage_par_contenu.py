@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:12
+
+import places.stockage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("places", "0018_televersements"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FichierContenu",
+            fields=[
+                (
+                    "chemin",
+                    models.CharField(max_length=255, primary_key=True, serialize=False),
+                ),
+                ("taille", models.PositiveBigIntegerField()),
+                ("references", models.PositiveIntegerField(default=0)),
+                ("date_creation", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "verbose_name": "Fichier stocké",
+                "verbose_name_plural": "Fichiers stockés",
+            },
+        ),
+        migrations.AlterField(
+            model_name="mediaactivite",
+            name="fichier",
+            field=models.FileField(
+                storage=places.stockage.stockage_medias, upload_to="activites_medias/"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="mediavoyage",
+            name="fichier",
+            field=models.FileField(
+                storage=places.stockage.stockage_medias, upload_to="voyages_medias/"
+            ),
+        ),
+    ]
@@ -1,35 +1,125 @@
-from django.db import models
+from django.db import IntegrityError, connection, models, transaction
+from django.db.models import F, Q, Value, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.core.exceptions import ValidationError
+from django.contrib.postgres.indexes import GinIndex
+from django.utils import timezone
+from itertools import chain
+import os
 import uuid
 
+from . import autocomplete, renditions, suggestions, televersements
+from .pays_reference import nom_pays
+from .search import normaliser
+from .stockage import stockage_medias
+from .spatial import (
+    NIVEAU_MAX_GROUPES, cellule_mercator, code_cellule, distance_km, plages_cellules_mercator, regrouper,
+)
+from .tendances import (
+    EXPOSANT_MIN, FENETRES, POIDS_FAVORI, POIDS_VOYAGE, SEUIL_SUPPRESSION, contribution, scores_fenetres,
+)
+from .tuiles import invalider_tuiles
+
+class EtatAgregatsMixin:
+    """Mémorise les champs qui alimentent des agrégats pour calculer les deltas à la sauvegarde"""
+    champs_agregats = ()
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Conserve l'état chargé depuis la base (sauf si un des champs est différé)"""
+        instance = super().from_db(db, field_names, values)
+        if all(attname in instance.__dict__ for attname in cls._attnames_agregats()):
+            instance._etat_agregats = instance.get_etat_agregats()
+        return instance
+    
+    @classmethod
+    def _attnames_agregats(cls):
+        return [cls._meta.get_field(nom).attname for nom in cls.champs_agregats]
+    
+    def get_etat_agregats(self):
+        """Retourne les valeurs courantes des champs qui alimentent les agrégats"""
+        return tuple(getattr(self, attname) for attname in self._attnames_agregats())
+    
+    def charger_etat_agregats(self):
+        """Relit en base l'état précédent d'une instance qui n'a pas été chargée via from_db"""
+        return type(self).objects.filter(pk=self.pk).values_list(*self._attnames_agregats()).first()
+    
+    def save(self, *args, **kwargs):
+        """Sauvegarde l'instance et ses agrégats dérivés dans la même transaction"""
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
 class Pays(models.Model):
     """Country model - Référence géographique pour les lieux"""
     code_iso = models.CharField(max_length=3, primary_key=True)
     nom = models.CharField(max_length=100, unique=True)
+    # Nom sans accents ni majuscules (places/search.py), recalculé à chaque sauvegarde
+    nom_normalise = models.CharField(max_length=100, blank=True, editable=False)
     
     class Meta:
         verbose_name_plural = "Pays"
         ordering = ['nom']
+        indexes = [
+            models.Index(fields=['nom_normalise'], name='pays_nom_prefixe_idx', opclasses=['varchar_pattern_ops']),
+            GinIndex(fields=['nom_normalise'], name='pays_nom_trgm_idx', opclasses=['gin_trgm_ops']),
+        ]
     
     def __str__(self):
         return self.nom
+    
+    def save(self, *args, **kwargs):
+        """Recalcule la clé de recherche avant chaque sauvegarde"""
+        self.nom_normalise = normaliser(self.nom)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'nom' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'nom_normalise'}
+        super().save(*args, **kwargs)
+    
+    @classmethod
+    def depuis_code(cls, code_iso):
+        """Retourne (pays, créé) ; un pays créé prend le nom du référentiel, ou un nom provisoire"""
+        return cls.objects.get_or_create(
+            code_iso=code_iso, defaults={'nom': nom_pays(code_iso) or f"Pays {code_iso}"}
+        )
 
-class Lieu(models.Model):
+class Lieu(EtatAgregatsMixin, models.Model):
     """Place/City model - Ville ou lieu spécifique visitable"""
+    champs_agregats = ('latitude', 'longitude')
+    
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     nom_ville = models.CharField(max_length=200)
+    # Nom sans accents ni majuscules (places/search.py), recalculé à chaque sauvegarde
+    nom_normalise = models.CharField(max_length=200, blank=True, editable=False)
     pays = models.ForeignKey(Pays, on_delete=models.CASCADE, related_name='lieux')
     geoname_id = models.IntegerField(unique=True, null=True, blank=True)
     latitude = models.DecimalField(max_digits=9, decimal_places=6)
     longitude = models.DecimalField(max_digits=9, decimal_places=6)
     date_creation = models.DateTimeField(auto_now_add=True)
     
+    # Agrégats des voyages, maintenus incrémentalement (commande rebuild_aggregates pour les recalculer)
+    nombre_voyages = models.PositiveIntegerField(default=0, editable=False)
+    nombre_notes = models.PositiveIntegerField(default=0, editable=False)
+    somme_notes = models.PositiveIntegerField(default=0, editable=False)
+    date_derniere_visite = models.DateField(null=True, blank=True, editable=False)
+    
+    # Code de Morton de la position (voir places/spatial.py), indexé pour les requêtes par fenêtre
+    cellule_spatiale = models.BigIntegerField(null=True, blank=True, editable=False, db_index=True)
+    
     class Meta:
         verbose_name_plural = "Lieux"
         unique_together = ['nom_ville', 'pays']
         ordering = ['nom_ville']
+        indexes = [
+            # Clé de pagination keyset de la liste des lieux
+            models.Index(fields=['nom_ville', 'id'], name='lieu_nom_id_idx'),
+            # Recherche par préfixe (B-tree) et par sous-chaîne ou approchée (trigrammes)
+            models.Index(fields=['nom_normalise'], name='lieu_nom_prefixe_idx', opclasses=['varchar_pattern_ops']),
+            GinIndex(fields=['nom_normalise'], name='lieu_nom_trgm_idx', opclasses=['gin_trgm_ops']),
+            # Lieux les plus visités (suggestions, tendance sur toute la période)
+            models.Index(fields=['-nombre_voyages', 'nom_ville', 'id'], name='lieu_populaires_idx'),
+        ]
     
     def __str__(self):
         return f"{self.nom_ville}, {self.pays.nom}"
@@ -41,12 +131,289 @@ class Lieu(models.Model):
         if self.longitude < -180 or self.longitude > 180:
             raise ValidationError('Longitude must be between -180 and 180')
     
+    def save(self, *args, **kwargs):
+        """Recalcule la clé de recherche et la cellule spatiale avant chaque sauvegarde"""
+        self.nom_normalise = normaliser(self.nom_ville)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'nom_ville' in update_fields:
+            update_fields = kwargs['update_fields'] = set(update_fields) | {'nom_normalise'}
+        if self.latitude is not None and self.longitude is not None:
+            self.cellule_spatiale = code_cellule(self.latitude, self.longitude)
+            if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+                kwargs['update_fields'] = set(update_fields) | {'cellule_spatiale'}
+        super().save(*args, **kwargs)
+    
     def get_note_moyenne(self):
-        """Calcule la note moyenne des voyages pour ce lieu"""
-        voyages_notes = self.voyages.exclude(note__isnull=True)
-        if voyages_notes.exists():
-            return voyages_notes.aggregate(models.Avg('note'))['note__avg']
+        """Retourne la note moyenne des voyages pour ce lieu à partir des agrégats stockés"""
+        if self.nombre_notes:
+            return self.somme_notes / self.nombre_notes
         return None
+    
+    @classmethod
+    def appliquer_voyage(cls, lieu_id, signe, note, date_debut):
+        """Ajoute (signe=1) ou retire (signe=-1) la contribution d'un voyage aux agrégats de son lieu"""
+        champs = {'nombre_voyages': Greatest(F('nombre_voyages') + signe, Value(0))}
+        if note is not None:
+            champs['nombre_notes'] = Greatest(F('nombre_notes') + signe, Value(0))
+            champs['somme_notes'] = Greatest(F('somme_notes') + signe * note, Value(0))
+        if signe > 0:
+            champs['date_derniere_visite'] = Greatest(
+                Coalesce(F('date_derniere_visite'), Value(date_debut)), Value(date_debut)
+            )
+        else:
+            # Le maximum ne se décrémente pas : on relit la date la plus récente restante
+            champs['date_derniere_visite'] = Subquery(
+                Voyage.objects.filter(lieu_id=OuterRef('pk'))
+                .order_by('-date_debut')
+                .values('date_debut')[:1]
+            )
+        cls.objects.filter(pk=lieu_id).update(**champs)
+        invalider_tuiles(cls.objects.filter(pk=lieu_id).values_list('latitude', 'longitude'))
+        autocomplete.popularite_lieu_modifiee(lieu_id, signe)
+    
+    @classmethod
+    def recalculer_agregats(cls, queryset=None):
+        """Recalcule entièrement les agrégats des lieux en une seule requête UPDATE"""
+        voyages = Voyage.objects.filter(lieu_id=OuterRef('pk')).order_by().values('lieu_id')
+        notes = voyages.exclude(note__isnull=True)
+        queryset = cls.objects.all() if queryset is None else queryset
+        return queryset.update(
+            nombre_voyages=Coalesce(Subquery(voyages.annotate(n=models.Count('id')).values('n')), 0),
+            nombre_notes=Coalesce(Subquery(notes.annotate(n=models.Count('id')).values('n')), 0),
+            somme_notes=Coalesce(Subquery(notes.annotate(s=models.Sum('note')).values('s')), 0),
+            date_derniere_visite=Subquery(voyages.annotate(d=models.Max('date_debut')).values('d')),
+        )
+
+class GroupeLieux(models.Model):
+    """Regroupement des lieux d'une cellule de la grille Web Mercator d'un niveau de zoom
+
+    Une ligne par cellule non vide et par niveau (0 à NIVEAU_MAX_GROUPES), maintenue
+    incrémentalement à la création, au déplacement et à la suppression des lieux
+    (commande rebuild_clusters pour tout recalculer). Après un retrait, l'emprise
+    reste celle, plus large, des lieux qui y ont été comptés.
+    """
+    niveau = models.PositiveSmallIntegerField()
+    x = models.PositiveIntegerField()
+    y = models.PositiveIntegerField()
+    nombre = models.PositiveIntegerField(default=0)
+    somme_latitude = models.FloatField(default=0)
+    somme_longitude = models.FloatField(default=0)
+    latitude_min = models.FloatField()
+    latitude_max = models.FloatField()
+    longitude_min = models.FloatField()
+    longitude_max = models.FloatField()
+    
+    class Meta:
+        verbose_name_plural = "Groupes de lieux"
+        constraints = [
+            models.UniqueConstraint(fields=['niveau', 'x', 'y'], name='groupe_lieux_cellule_unique'),
+        ]
+    
+    def __str__(self):
+        return f"Niveau {self.niveau} ({self.x}, {self.y}) : {self.nombre} lieux"
+    
+    def get_centre(self):
+        """Retourne le barycentre (latitude, longitude) des lieux du groupe"""
+        return self.somme_latitude / self.nombre, self.somme_longitude / self.nombre
+    
+    @classmethod
+    def dans_fenetre(cls, south, west, north, east, niveau):
+        """Groupes d'un niveau dont la cellule intersecte la fenêtre"""
+        filtre = Q()
+        for (x_min, x_max), (y_min, y_max) in plages_cellules_mercator(south, west, north, east, niveau):
+            filtre |= Q(x__range=(x_min, x_max), y__range=(y_min, y_max))
+        return cls.objects.filter(filtre, niveau=niveau)
+    
+    @classmethod
+    def appliquer_lieu(cls, latitude, longitude, signe):
+        """Ajoute (signe=1) ou retire (signe=-1) un lieu des groupes de tous les niveaux"""
+        latitude, longitude = float(latitude), float(longitude)
+        x, y = cellule_mercator(latitude, longitude)
+        cellules = [
+            (niveau, x >> (NIVEAU_MAX_GROUPES - niveau), y >> (NIVEAU_MAX_GROUPES - niveau))
+            for niveau in range(NIVEAU_MAX_GROUPES + 1)
+        ]
+        if signe > 0:
+            # Un seul INSERT ... ON CONFLICT pour tous les niveaux (l'ORM ne sait pas incrémenter à l'upsert)
+            table = connection.ops.quote_name(cls._meta.db_table)
+            lignes = ', '.join(['(%s, %s, %s, 1, %s, %s, %s, %s, %s, %s)'] * len(cellules))
+            parametres = []
+            for niveau, cx, cy in cellules:
+                parametres += [niveau, cx, cy, latitude, longitude, latitude, latitude, longitude, longitude]
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"""
+                    INSERT INTO {table} (niveau, x, y, nombre, somme_latitude, somme_longitude,
+                                         latitude_min, latitude_max, longitude_min, longitude_max)
+                    VALUES {lignes}
+                    ON CONFLICT (niveau, x, y) DO UPDATE SET
+                        nombre = {table}.nombre + 1,
+                        somme_latitude = {table}.somme_latitude + EXCLUDED.somme_latitude,
+                        somme_longitude = {table}.somme_longitude + EXCLUDED.somme_longitude,
+                        latitude_min = LEAST({table}.latitude_min, EXCLUDED.latitude_min),
+                        latitude_max = GREATEST({table}.latitude_max, EXCLUDED.latitude_max),
+                        longitude_min = LEAST({table}.longitude_min, EXCLUDED.longitude_min),
+                        longitude_max = GREATEST({table}.longitude_max, EXCLUDED.longitude_max)
+                    """,
+                    parametres,
+                )
+        else:
+            filtre = Q()
+            for niveau, cx, cy in cellules:
+                filtre |= Q(niveau=niveau, x=cx, y=cy)
+            cls.objects.filter(filtre).update(
+                nombre=Greatest(F('nombre') - 1, Value(0)),
+                somme_latitude=F('somme_latitude') - latitude,
+                somme_longitude=F('somme_longitude') - longitude,
+            )
+            cls.objects.filter(filtre, nombre=0).delete()
+    
+    @classmethod
+    def recalculer(cls):
+        """Reconstruit tous les groupes à partir des lieux (un seul parcours de la table)"""
+        points = []
+        for latitude, longitude in Lieu.objects.values_list('latitude', 'longitude').iterator(chunk_size=2000):
+            latitude, longitude = float(latitude), float(longitude)
+            points.append(cellule_mercator(latitude, longitude) + (latitude, longitude))
+        cls.objects.all().delete()
+        for niveau in range(NIVEAU_MAX_GROUPES + 1):
+            cls.objects.bulk_create(
+                (
+                    cls(
+                        niveau=niveau, x=x, y=y, nombre=nombre,
+                        somme_latitude=somme_lat, somme_longitude=somme_lon,
+                        latitude_min=lat_min, latitude_max=lat_max,
+                        longitude_min=lon_min, longitude_max=lon_max,
+                    )
+                    for (x, y), (nombre, somme_lat, somme_lon, lat_min, lat_max, lon_min, lon_max)
+                    in regrouper(points, niveau).items()
+                ),
+                batch_size=2000,
+            )
+        return len(points)
+
+class VilleGazetteer(models.Model):
+    """Ville du gazetteer GeoNames chargé localement (commande import_gazetteer)
+
+    Référence de géocodage : les lieux créés par les utilisateurs y retrouvent leur
+    geoname_id et leurs coordonnées sans appel à l'API GeoNames.
+    """
+    geoname_id = models.IntegerField(primary_key=True)
+    nom = models.CharField(max_length=200)
+    nom_ascii = models.CharField(max_length=200, blank=True)
+    # Nom sans accents ni majuscules (places/search.py), calculé à l'import
+    nom_normalise = models.CharField(max_length=200, blank=True, editable=False)
+    latitude = models.DecimalField(max_digits=9, decimal_places=6)
+    longitude = models.DecimalField(max_digits=9, decimal_places=6)
+    code_pays = models.CharField(max_length=2, db_index=True)
+    code_admin1 = models.CharField(max_length=20, blank=True)
+    population = models.BigIntegerField(default=0)
+    fuseau_horaire = models.CharField(max_length=40, blank=True)
+    
+    class Meta:
+        verbose_name_plural = "Villes du gazetteer"
+        ordering = ['-population', 'geoname_id']
+        indexes = [
+            models.Index(fields=['nom_normalise'], name='gazetteer_nom_prefixe_idx', opclasses=['varchar_pattern_ops']),
+            GinIndex(fields=['nom_normalise'], name='gazetteer_nom_trgm_idx', opclasses=['gin_trgm_ops']),
+        ]
+    
+    def __str__(self):
+        return f"{self.nom} ({self.code_pays})"
+    
+    def save(self, *args, **kwargs):
+        """Recalcule la clé de recherche avant chaque sauvegarde"""
+        self.nom_normalise = normaliser(self.nom)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'nom' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'nom_normalise'}
+        super().save(*args, **kwargs)
+    
+    @classmethod
+    def resoudre(cls, nom, code_pays, latitude=None, longitude=None):
+        """Ville du gazetteer portant ce nom dans ce pays : la plus proche des coordonnées si
+        elles sont connues, sinon la plus peuplée (None si aucune)"""
+        villes = list(cls.objects.filter(nom_normalise=normaliser(nom), code_pays=code_pays.upper())[:20])
+        if not villes:
+            return None
+        if latitude is None or longitude is None:
+            return villes[0]
+        return min(villes, key=lambda ville: distance_km(latitude, longitude, ville.latitude, ville.longitude))
+    
+    def obtenir_lieu(self):
+        """Retourne (lieu, créé) : le lieu de cette ville, retrouvé par geoname_id ou par nom
+        et pays (il reçoit alors le geoname_id s'il n'en avait pas), créé sinon"""
+        lieu = Lieu.objects.filter(geoname_id=self.geoname_id).first()
+        if lieu is not None:
+            return lieu, False
+        pays, _ = Pays.depuis_code(self.code_pays)
+        lieu = Lieu.objects.filter(nom_ville=self.nom, pays=pays).first()
+        if lieu is not None:
+            if lieu.geoname_id is None:
+                lieu.geoname_id = self.geoname_id
+                lieu.save(update_fields=['geoname_id'])
+            return lieu, False
+        try:
+            with transaction.atomic():
+                return Lieu.objects.create(
+                    nom_ville=self.nom, pays=pays, geoname_id=self.geoname_id,
+                    latitude=self.latitude, longitude=self.longitude,
+                ), True
+        except IntegrityError:
+            # Créé entre-temps par une requête concurrente
+            lieu = Lieu.objects.filter(Q(geoname_id=self.geoname_id) | Q(nom_ville=self.nom, pays=pays)).first()
+            if lieu is None:
+                raise
+            return lieu, False
+
+class FichierContenu(models.Model):
+    """Fichier du stockage adressé par contenu (places/stockage.py) et nombre de médias qui le rattachent
+
+    Les originaux et les déclinaisons identiques ne sont stockés qu'une fois ; le fichier est
+    effacé quand sa dernière référence disparaît.
+    """
+    chemin = models.CharField(max_length=255, primary_key=True)
+    taille = models.PositiveBigIntegerField()
+    references = models.PositiveIntegerField(default=0)
+    date_creation = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = "Fichier stocké"
+        verbose_name_plural = "Fichiers stockés"
+    
+    def __str__(self):
+        return f"{self.chemin} ({self.references} références)"
+    
+    @classmethod
+    def referencer(cls, chemin, taille):
+        """Ajoute une référence au fichier, enregistré à sa première référence ; retourne le nombre de références"""
+        table = connection.ops.quote_name(cls._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {table} (chemin, taille, "references", date_creation) VALUES (%s, %s, 1, %s)
+                ON CONFLICT (chemin) DO UPDATE SET "references" = {table}."references" + 1
+                RETURNING "references"
+                """,
+                [chemin, taille, timezone.now()],
+            )
+            return cursor.fetchone()[0]
+    
+    @classmethod
+    def dereferencer(cls, chemin):
+        """Retire une référence au fichier ; retourne le nombre restant (0 : ligne supprimée), None s'il est inconnu"""
+        table = connection.ops.quote_name(cls._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {table} SET "references" = GREATEST("references" - 1, 0) WHERE chemin = %s RETURNING "references"',
+                [chemin],
+            )
+            ligne = cursor.fetchone()
+        if ligne is None:
+            return None
+        if ligne[0] == 0:
+            cls.objects.filter(chemin=chemin, references=0).delete()
+        return ligne[0]
 
 class MediaVoyage(models.Model):
     """Media model for voyage images and videos"""
@@ -57,13 +424,22 @@ class MediaVoyage(models.Model):
     
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     voyage = models.ForeignKey('Voyage', on_delete=models.CASCADE, related_name='medias')
-    fichier = models.FileField(upload_to='voyages_medias/')
+    fichier = models.FileField(upload_to='voyages_medias/', storage=stockage_medias)
     type_media = models.CharField(max_length=10, choices=MEDIA_TYPES)
     titre = models.CharField(max_length=200, blank=True)
     description = models.TextField(blank=True)
     date_upload = models.DateTimeField(auto_now_add=True)
     ordre = models.PositiveIntegerField(default=0, help_text="Ordre d'affichage")
     
+    # Original et déclinaisons des images (places/renditions.py), renseignés après le téléversement
+    largeur = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    hauteur = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    taille_octets = models.PositiveBigIntegerField(null=True, blank=True, editable=False)
+    etat_renditions = models.CharField(
+        max_length=16, choices=renditions.ETAT_CHOICES, default=renditions.ATTENTE, editable=False
+    )
+    renditions = models.JSONField(default=dict, blank=True, editable=False)
+    
     class Meta:
         verbose_name = "Média de voyage"
         verbose_name_plural = "Médias de voyage"
@@ -85,13 +461,22 @@ class MediaActivite(models.Model):
     
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     activite = models.ForeignKey('Activite', on_delete=models.CASCADE, related_name='medias')
-    fichier = models.FileField(upload_to='activites_medias/')
+    fichier = models.FileField(upload_to='activites_medias/', storage=stockage_medias)
     type_media = models.CharField(max_length=10, choices=MEDIA_TYPES)
     titre = models.CharField(max_length=200, blank=True)
     description = models.TextField(blank=True)
     date_upload = models.DateTimeField(auto_now_add=True)
     ordre = models.PositiveIntegerField(default=0, help_text="Ordre d'affichage")
     
+    # Original et déclinaisons des images (places/renditions.py), renseignés après le téléversement
+    largeur = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    hauteur = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    taille_octets = models.PositiveBigIntegerField(null=True, blank=True, editable=False)
+    etat_renditions = models.CharField(
+        max_length=16, choices=renditions.ETAT_CHOICES, default=renditions.ATTENTE, editable=False
+    )
+    renditions = models.JSONField(default=dict, blank=True, editable=False)
+    
     class Meta:
         verbose_name = "Média d'activité"
         verbose_name_plural = "Médias d'activités"
@@ -104,8 +489,78 @@ class MediaActivite(models.Model):
         """Retourne l'URL du fichier"""
         return self.fichier.url if self.fichier else None
 
-class Voyage(models.Model):
+class TeleversementMedia(models.Model):
+    """Session de téléversement d'un média par morceaux, reprenable (places/televersements.py)"""
+    EN_COURS = 'en_cours'
+    TERMINE = 'termine'
+    ETAT_CHOICES = [
+        (EN_COURS, 'En cours'),
+        (TERMINE, 'Terminé'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    utilisateur = models.ForeignKey(User, on_delete=models.CASCADE, related_name='televersements')
+    nom_fichier = models.CharField(max_length=255)
+    type_mime = models.CharField(max_length=100)
+    taille = models.PositiveBigIntegerField()
+    taille_morceau = models.PositiveIntegerField()
+    # Empreinte SHA-256 du fichier entier annoncée par le client, vérifiée à la finalisation
+    sha256 = models.CharField(max_length=64, blank=True)
+    etat = models.CharField(max_length=16, choices=ETAT_CHOICES, default=EN_COURS)
+    # Média créé à la finalisation, renvoyé si le client la répète
+    media_voyage = models.ForeignKey(MediaVoyage, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    media_activite = models.ForeignKey(MediaActivite, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    date_creation = models.DateTimeField(auto_now_add=True)
+    date_expiration = models.DateTimeField(db_index=True)
+    
+    class Meta:
+        verbose_name = "Téléversement de média"
+        verbose_name_plural = "Téléversements de médias"
+    
+    def __str__(self):
+        return f"{self.nom_fichier} ({self.get_etat_display()})"
+    
+    @property
+    def nombre_morceaux(self):
+        return max(-(-self.taille // self.taille_morceau), 1)
+    
+    def attacher(self, voyage=None, activite=None, **champs):
+        """Crée le média du fichier complet sur le voyage ou l'activité ; le fichier partiel y est lié sans copie"""
+        with open(televersements.chemin_partiel(self), 'rb') as fichier:
+            contenu = televersements.FichierAssemble(fichier, name=self.nom_fichier, content_type=self.type_mime)
+            champs['type_media'] = televersements.type_media(self.type_mime)
+            if voyage is not None:
+                self.media_voyage = MediaVoyage.objects.create(voyage=voyage, fichier=contenu, **champs)
+            else:
+                self.media_activite = MediaActivite.objects.create(activite=activite, fichier=contenu, **champs)
+        # Fichier partiel gardé jusqu'à la validation : une finalisation annulée peut être rejouée
+        televersements.supprimer_fichier(self)
+        self.etat = self.TERMINE
+        self.save(update_fields=['etat', 'media_voyage', 'media_activite'])
+        return self.media_voyage or self.media_activite
+
+class MorceauTeleversement(models.Model):
+    """Morceau reçu d'un téléversement, avec son empreinte"""
+    televersement = models.ForeignKey(TeleversementMedia, on_delete=models.CASCADE, related_name='morceaux')
+    index = models.PositiveIntegerField()
+    taille = models.PositiveIntegerField()
+    sha256 = models.CharField(max_length=64)
+    date_reception = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Morceau de téléversement"
+        verbose_name_plural = "Morceaux de téléversements"
+        constraints = [
+            models.UniqueConstraint(fields=['televersement', 'index'], name='morceau_televersement_unique'),
+        ]
+    
+    def __str__(self):
+        return f"{self.televersement_id} #{self.index}"
+
+class Voyage(EtatAgregatsMixin, models.Model):
     """Trip model - Enregistrement d'une visite d'un lieu par un utilisateur"""
+    champs_agregats = ('lieu', 'note', 'date_debut')
+    
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     utilisateur = models.ForeignKey(User, on_delete=models.CASCADE, related_name='voyages')
     lieu = models.ForeignKey(Lieu, on_delete=models.CASCADE, related_name='voyages')
@@ -122,6 +577,11 @@ class Voyage(models.Model):
     class Meta:
         verbose_name_plural = "Voyages"
         ordering = ['-date_debut']
+        indexes = [
+            # Clés de pagination keyset : voyages d'un utilisateur et voyages d'un lieu
+            models.Index(fields=['utilisateur', '-date_debut', 'id'], name='voyage_user_date_idx'),
+            models.Index(fields=['lieu', '-date_debut', 'id'], name='voyage_lieu_date_idx'),
+        ]
     
     def __str__(self):
         return f"{self.utilisateur.username} - {self.lieu.nom_ville}"
@@ -149,12 +609,143 @@ class Favori(models.Model):
         verbose_name_plural = "Favoris"
         unique_together = ['utilisateur', 'lieu']
         ordering = ['-date_ajout']
+        indexes = [
+            models.Index(fields=['utilisateur', '-date_ajout', 'id'], name='favori_user_date_idx'),
+        ]
     
     def __str__(self):
         return f"{self.utilisateur.username} - {self.lieu.nom_ville}"
 
-class NoteActivite(models.Model):
+class EpoqueTendance(models.Model):
+    """Repère et demi-vie d'une fenêtre de tendance (places/tendances.py)
+    
+    Les contributions aux scores de la fenêtre sont exprimées par rapport au repère ; la
+    commande compact_trending le ramène au présent. Les écritures de scores verrouillent la
+    ligne en partage, la compaction en exclusif : un score n'est jamais ajouté avec un repère périmé.
+    """
+    fenetre = models.CharField(max_length=8, primary_key=True)
+    demi_vie = models.DurationField()
+    repere = models.DateTimeField()
+    
+    class Meta:
+        verbose_name_plural = "Époques des tendances"
+    
+    def __str__(self):
+        return f"{self.fenetre} (demi-vie {self.demi_vie}, repère {self.repere:%Y-%m-%d %H:%M})"
+
+class TendanceLieu(models.Model):
+    """Score de popularité à décroissance exponentielle d'un lieu pour une fenêtre (places/tendances.py)"""
+    lieu = models.ForeignKey(Lieu, on_delete=models.CASCADE, related_name='tendances')
+    fenetre = models.CharField(max_length=8)
+    score = models.FloatField(default=0)
+    
+    class Meta:
+        verbose_name_plural = "Tendances des lieux"
+        constraints = [
+            models.UniqueConstraint(fields=['lieu', 'fenetre'], name='tendance_lieu_fenetre_unique'),
+        ]
+        indexes = [
+            # Classement d'une fenêtre : les K premiers sont les K premières entrées de l'index
+            models.Index(fields=['fenetre', '-score', 'lieu'], name='tendance_classement_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.lieu_id} ({self.fenetre}) : {self.score:.3g}"
+    
+    @classmethod
+    def appliquer(cls, lieu_id, poids, instant):
+        """Ajoute (poids > 0) ou retire (poids < 0) une contribution datée aux scores de toutes les fenêtres
+
+        Une seule requête, qui lit le repère de chaque fenêtre en le verrouillant en partage. Un
+        retrait ne crée pas de ligne : celle d'un lieu en cours de suppression a pu disparaître.
+        """
+        table = connection.ops.quote_name(cls._meta.db_table)
+        epoques = connection.ops.quote_name(EpoqueTendance._meta.db_table)
+        valeur = """%s * power(2.0, GREATEST(
+            extract(epoch FROM %s - epoque.repere) / extract(epoch FROM epoque.demi_vie), %s
+        )::double precision)"""
+        if poids > 0:
+            requete = f"""
+                INSERT INTO {table} (lieu_id, fenetre, score)
+                SELECT %s, epoque.fenetre, {valeur}
+                FROM {epoques} epoque
+                FOR SHARE
+                ON CONFLICT (lieu_id, fenetre) DO UPDATE SET score = {table}.score + EXCLUDED.score
+            """
+            parametres = [lieu_id, poids, instant, EXPOSANT_MIN]
+        else:
+            requete = f"""
+                WITH epoque AS (SELECT fenetre, repere, demi_vie FROM {epoques} FOR SHARE)
+                UPDATE {table} SET score = {table}.score + {valeur}
+                FROM epoque
+                WHERE {table}.fenetre = epoque.fenetre AND {table}.lieu_id = %s
+            """
+            parametres = [poids, instant, EXPOSANT_MIN, lieu_id]
+        with connection.cursor() as cursor:
+            cursor.execute(requete, parametres)
+    
+    @classmethod
+    def compacter(cls, maintenant=None):
+        """Ramène le repère de chaque fenêtre au présent et supprime les scores négligeables
+    
+        Crée les fenêtres ajoutées à FENETRES et retire celles qui n'y sont plus. Retourne le
+        nombre de lignes supprimées.
+        """
+        maintenant = maintenant or timezone.now()
+        supprimes = 0
+        with transaction.atomic():
+            epoques = {epoque.fenetre: epoque for epoque in EpoqueTendance.objects.select_for_update()}
+            for fenetre, demi_vie in FENETRES.items():
+                epoque = epoques.get(fenetre)
+                if epoque is None:
+                    EpoqueTendance.objects.create(fenetre=fenetre, demi_vie=demi_vie, repere=maintenant)
+                    continue
+                scores = cls.objects.filter(fenetre=fenetre)
+                # Seuil exprimé dans l'échelle du repère actuel : la mise à l'échelle ne peut pas sous-déborder
+                supprimes += scores.filter(
+                    score__lt=contribution(SEUIL_SUPPRESSION, maintenant, epoque.repere, epoque.demi_vie)
+                ).delete()[0]
+                scores.update(score=F('score') * contribution(1.0, epoque.repere, maintenant, epoque.demi_vie))
+                epoque.repere, epoque.demi_vie = maintenant, demi_vie
+                epoque.save()
+            supprimes += cls.objects.exclude(fenetre__in=FENETRES).delete()[0]
+            EpoqueTendance.objects.exclude(fenetre__in=FENETRES).delete()
+        return supprimes
+    
+    @classmethod
+    def recalculer(cls, maintenant=None):
+        """Recalcule tous les scores depuis les voyages et les favoris, repères au présent ; retourne le nombre de lignes"""
+        maintenant = maintenant or timezone.now()
+        evenements = chain(
+            ((lieu_id, instant, POIDS_VOYAGE) for lieu_id, instant in
+             Voyage.objects.order_by().values_list('lieu_id', 'date_creation').iterator(chunk_size=10000)),
+            ((lieu_id, instant, POIDS_FAVORI) for lieu_id, instant in
+             Favori.objects.order_by().values_list('lieu_id', 'date_ajout').iterator(chunk_size=10000)),
+        )
+        with transaction.atomic():
+            # Les écritures de scores concurrentes attendent la fin du recalcul
+            list(EpoqueTendance.objects.select_for_update())
+            EpoqueTendance.objects.exclude(fenetre__in=FENETRES).delete()
+            for fenetre, demi_vie in FENETRES.items():
+                EpoqueTendance.objects.update_or_create(
+                    fenetre=fenetre, defaults={'demi_vie': demi_vie, 'repere': maintenant}
+                )
+            cls.objects.all().delete()
+            reperes = {fenetre: (maintenant, demi_vie) for fenetre, demi_vie in FENETRES.items()}
+            scores = scores_fenetres(evenements, reperes)
+            cls.objects.bulk_create(
+                (
+                    cls(lieu_id=lieu_id, fenetre=fenetre, score=score)
+                    for (lieu_id, fenetre), score in scores.items() if score >= SEUIL_SUPPRESSION
+                ),
+                batch_size=2000,
+            )
+        return sum(score >= SEUIL_SUPPRESSION for score in scores.values())
+
+class NoteActivite(EtatAgregatsMixin, models.Model):
     """Activity rating model - Notes données aux activités"""
+    champs_agregats = ('activite', 'note')
+    
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     activite = models.ForeignKey('Activite', on_delete=models.CASCADE, related_name='notes')
     utilisateur = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notes_activites')
@@ -169,6 +760,9 @@ class NoteActivite(models.Model):
         verbose_name_plural = "Notes d'activités"
         unique_together = ['activite', 'utilisateur']  # Un utilisateur ne peut noter qu'une fois
         ordering = ['-date_creation']
+        indexes = [
+            models.Index(fields=['utilisateur', '-date_creation', 'id'], name='note_user_date_idx'),
+        ]
     
     def __str__(self):
         return f"{self.utilisateur.username} - {self.activite.titre} - {self.note}/5"
@@ -230,24 +824,37 @@ class Activite(models.Model):
     class Meta:
         verbose_name_plural = "Activités"
         ordering = ['-date_creation']
+        indexes = [
+            # Clés de pagination keyset : toutes les activités et activités d'un lieu
+            models.Index(fields=['-date_creation', 'id'], name='activite_date_idx'),
+            models.Index(fields=['lieu', '-date_creation', 'id'], name='activite_lieu_date_idx'),
+        ]
     
     def __str__(self):
         return f"{self.titre} - {self.lieu.nom_ville}"
     
+    def get_resume_notes(self):
+        """Retourne le résumé des notes de l'activité (None si aucun résumé n'existe encore)"""
+        try:
+            return self.resume_notes
+        except ResumeNotesActivite.DoesNotExist:
+            return None
+    
     def get_note_moyenne(self):
-        """Calcule la note moyenne de l'activité"""
-        notes = self.notes.all()
-        if notes.exists():
-            return notes.aggregate(models.Avg('note'))['note__avg']
-        return None
+        """Retourne la note moyenne de l'activité à partir du résumé stocké"""
+        resume = self.get_resume_notes()
+        return resume.get_note_moyenne() if resume else None
     
     def get_nombre_notes(self):
         """Retourne le nombre de notes pour cette activité"""
-        return self.notes.count()
+        resume = self.get_resume_notes()
+        return resume.nombre_notes if resume else 0
     
-    def can_user_create_activity(self, user):
-        """Vérifie si l'utilisateur peut créer une activité dans ce lieu"""
-        return user.voyages.filter(lieu=self.lieu).exists()
+    def can_user_create_activity(self, user, contexte=None):
+        """Vérifie si l'utilisateur peut créer une activité dans ce lieu (en O(1) si un ContexteVisiteur est fourni)"""
+        if contexte is not None and contexte.user is user:
+            return contexte.a_visite(self.lieu_id)
+        return user.voyages.filter(lieu_id=self.lieu_id).exists()
     
     def get_medias_images(self):
         """Retourne les images de l'activité"""
@@ -267,6 +874,83 @@ class Activite(models.Model):
         """Retourne le nom lisible du type d'activité"""
         return dict(self.TYPE_ACTIVITE_CHOICES).get(self.type_activite, 'Autre')
 
+class ResumeNotesActivite(models.Model):
+    """Activity rating summary - Agrégats des notes d'une activité, maintenus à chaque écriture de NoteActivite"""
+    # A priori du score bayésien : une activité sans note vaut PRIOR_MOYENNE, avec le poids de PRIOR_POIDS notes
+    PRIOR_MOYENNE = 3.0
+    PRIOR_POIDS = 5
+    
+    activite = models.OneToOneField(Activite, on_delete=models.CASCADE, primary_key=True, related_name='resume_notes')
+    nombre_notes = models.PositiveIntegerField(default=0)
+    somme_notes = models.PositiveIntegerField(default=0)
+    notes_1 = models.PositiveIntegerField(default=0, help_text="Nombre de notes à 1 étoile")
+    notes_2 = models.PositiveIntegerField(default=0, help_text="Nombre de notes à 2 étoiles")
+    notes_3 = models.PositiveIntegerField(default=0, help_text="Nombre de notes à 3 étoiles")
+    notes_4 = models.PositiveIntegerField(default=0, help_text="Nombre de notes à 4 étoiles")
+    notes_5 = models.PositiveIntegerField(default=0, help_text="Nombre de notes à 5 étoiles")
+    score_bayesien = models.FloatField(default=PRIOR_MOYENNE, db_index=True)
+    
+    class Meta:
+        verbose_name = "Résumé des notes d'activité"
+        verbose_name_plural = "Résumés des notes d'activités"
+    
+    def __str__(self):
+        return f"{self.activite_id} - {self.nombre_notes} notes"
+    
+    def get_note_moyenne(self):
+        """Retourne la note moyenne brute"""
+        if self.nombre_notes:
+            return self.somme_notes / self.nombre_notes
+        return None
+    
+    def get_histogramme(self):
+        """Retourne la répartition des notes par nombre d'étoiles"""
+        return {str(etoiles): getattr(self, f'notes_{etoiles}') for etoiles in range(1, 6)}
+    
+    @classmethod
+    def expression_score(cls, nombre, somme):
+        """Moyenne bayésienne : (poids * moyenne a priori + somme) / (poids + nombre)"""
+        return (Value(cls.PRIOR_POIDS * cls.PRIOR_MOYENNE) + somme) / (Value(cls.PRIOR_POIDS) + nombre)
+    
+    @classmethod
+    def appliquer_note(cls, activite_id, signe, note):
+        """Ajoute (signe=1) ou retire (signe=-1) une note au résumé de son activité"""
+        nombre = Greatest(F('nombre_notes') + signe, Value(0))
+        somme = Greatest(F('somme_notes') + signe * note, Value(0))
+        champ_histogramme = f'notes_{note}'
+        champs = {
+            'nombre_notes': nombre,
+            'somme_notes': somme,
+            champ_histogramme: Greatest(F(champ_histogramme) + signe, Value(0)),
+            'score_bayesien': cls.expression_score(nombre, somme),
+        }
+        if not cls.objects.filter(pk=activite_id).update(**champs) and signe > 0:
+            # Résumé absent (activité antérieure aux résumés) : on le crée puis on applique la note
+            cls.objects.get_or_create(activite_id=activite_id)
+            cls.objects.filter(pk=activite_id).update(**champs)
+    
+    @classmethod
+    def recalculer(cls):
+        """Recrée les résumés manquants puis recalcule tous les résumés à partir des notes"""
+        cls.objects.bulk_create(
+            [cls(activite_id=pk) for pk in Activite.objects.filter(resume_notes__isnull=True).values_list('pk', flat=True)],
+            ignore_conflicts=True,
+        )
+        notes = NoteActivite.objects.filter(activite_id=OuterRef('pk')).order_by().values('activite_id')
+        
+        def compter(queryset):
+            return Coalesce(Subquery(queryset.annotate(n=models.Count('id')).values('n')), 0)
+        
+        nombre = compter(notes)
+        somme = Coalesce(Subquery(notes.annotate(s=models.Sum('note')).values('s')), 0)
+        champs = {f'notes_{etoiles}': compter(notes.filter(note=etoiles)) for etoiles in range(1, 6)}
+        return cls.objects.update(
+            nombre_notes=nombre,
+            somme_notes=somme,
+            score_bayesien=cls.expression_score(nombre, somme),
+            **champs
+        )
+
 # Méthodes utilitaires pour User
 def get_lieux_visites(self):
     """Retourne les lieux visités par l'utilisateur"""
@@ -293,7 +977,8 @@ class UserProfile(models.Model):
         blank=True,
         help_text="Image de profil de l'utilisateur"
     )
-    score_total = models.PositiveIntegerField(default=0, help_text="Score total de l'utilisateur")  # NOUVEAU CHAMP
+    # Somme du registre MouvementPoints, modifiée uniquement par places/scoring.py
+    score_total = models.PositiveIntegerField(default=0, help_text="Score total de l'utilisateur")
     date_creation = models.DateTimeField(auto_now_add=True)
     date_modification = models.DateTimeField(auto_now=True)
     
@@ -301,10 +986,23 @@ class UserProfile(models.Model):
         verbose_name = "Profil utilisateur"
         verbose_name_plural = "Profils utilisateurs"
         ordering = ['-date_modification']
+        indexes = [
+            # Clé de pagination keyset du classement
+            models.Index(fields=['-score_total', 'id'], name='profil_classement_idx'),
+        ]
     
     def __str__(self):
         return f"Profil de {self.utilisateur.username}"
     
+    def save(self, *args, **kwargs):
+        """Une mise à jour n'écrit pas score_total : une valeur lue avant une attribution de points l'écraserait"""
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'score_total'
+            ]
+        super().save(*args, **kwargs)
+    
     def get_profile_image_url(self):
         """Retourne l'URL de l'image de profil ou une image par défaut"""
         if self.profile_image:
@@ -319,13 +1017,192 @@ class UserProfile(models.Model):
         """Retourne la bio ou un message par défaut"""
         return self.bio if self.bio else "Aucune biographie renseignée"
 
+class EffectifScore(models.Model):
+    """Nombre de profils par score (niveau 0) et par tranche de LARGEUR_TRANCHE points (niveau 1)
+
+    Cache de rang du classement : le rang d'un score est 1 + le nombre de profils mieux notés,
+    soit la somme des tranches supérieures et des scores supérieurs de sa tranche, quelques
+    centaines de lignes au plus quel que soit le nombre de profils. Maintenu à la création et
+    à la suppression des profils (signaux) et à chaque changement de score (places/scoring.py),
+    recalculable avec la commande rebuild_aggregates.
+    """
+    LARGEUR_TRANCHE = 100
+    
+    niveau = models.PositiveSmallIntegerField()
+    valeur = models.PositiveIntegerField()
+    nombre = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        verbose_name_plural = "Effectifs des scores"
+        constraints = [
+            models.UniqueConstraint(fields=['niveau', 'valeur'], name='effectif_score_unique'),
+        ]
+    
+    def __str__(self):
+        return f"Niveau {self.niveau}, {self.valeur} : {self.nombre} profils"
+    
+    @classmethod
+    def appliquer(cls, score, signe, nombre=1):
+        """Ajoute (signe=1) ou retire (signe=-1) des profils (un par défaut) du score donné"""
+        cls._reporter({(0, score): signe * nombre, (1, score // cls.LARGEUR_TRANCHE): signe * nombre})
+    
+    @classmethod
+    def deplacer(cls, changements):
+        """Reporte un lot de changements de score [(ancien, nouveau)] en trois requêtes au plus
+
+        Seules les cellules dont l'effectif change sont touchées : un score qui reste dans sa
+        tranche ne verrouille pas la ligne de la tranche.
+        """
+        deltas = {}
+        for ancien, nouveau in changements:
+            if ancien == nouveau:
+                continue
+            for score, signe in ((ancien, -1), (nouveau, 1)):
+                for cellule in ((0, score), (1, score // cls.LARGEUR_TRANCHE)):
+                    deltas[cellule] = deltas.get(cellule, 0) + signe
+        cls._reporter(deltas)
+    
+    @classmethod
+    def _reporter(cls, deltas):
+        """Applique les écarts {(niveau, valeur): delta} aux effectifs
+
+        Les cellules sont verrouillées dans l'ordre (niveau, valeur) par la première requête,
+        qui traite ses lignes dans l'ordre donné : deux reports concurrents attendent l'un
+        l'autre sans pouvoir s'interbloquer.
+        """
+        cellules = sorted((cellule, delta) for cellule, delta in deltas.items() if delta)
+        if not cellules:
+            return
+        retraits = [(niveau, valeur, -delta) for (niveau, valeur), delta in cellules if delta < 0]
+        table = connection.ops.quote_name(cls._meta.db_table)
+        with connection.cursor() as cursor:
+            # Ajouts appliqués ; les cellules quittées sont verrouillées sans changer (nombre + 0)
+            cursor.execute(
+                f"""
+                INSERT INTO {table} (niveau, valeur, nombre) VALUES {', '.join(['(%s, %s, %s)'] * len(cellules))}
+                ON CONFLICT (niveau, valeur) DO UPDATE SET nombre = {table}.nombre + EXCLUDED.nombre
+                """,
+                [champ for (niveau, valeur), delta in cellules for champ in (niveau, valeur, max(delta, 0))],
+            )
+            if retraits:
+                cursor.execute(
+                    f"""
+                    UPDATE {table} SET nombre = GREATEST({table}.nombre - v.retrait, 0)
+                    FROM (VALUES {', '.join(['(%s, %s, %s)'] * len(retraits))}) AS v (niveau, valeur, retrait)
+                    WHERE {table}.niveau = v.niveau AND {table}.valeur = v.valeur
+                    """,
+                    [champ for retrait in retraits for champ in retrait],
+                )
+                cursor.execute(
+                    f"""
+                    DELETE FROM {table} USING (VALUES {', '.join(['(%s, %s)'] * len(retraits))}) AS v (niveau, valeur)
+                    WHERE {table}.niveau = v.niveau AND {table}.valeur = v.valeur AND {table}.nombre = 0
+                    """,
+                    [champ for niveau, valeur, _ in retraits for champ in (niveau, valeur)],
+                )
+    
+    @classmethod
+    def rangs(cls, scores):
+        """{score: rang} des scores donnés (1 + nombre de profils mieux notés), en deux requêtes au plus"""
+        scores = sorted(set(scores), reverse=True)
+        if not scores:
+            return {}
+        haut = scores[0]
+        tranche = haut // cls.LARGEUR_TRANCHE
+        mieux_notes = cls.objects.filter(
+            Q(niveau=1, valeur__gt=tranche)
+            | Q(niveau=0, valeur__gt=haut, valeur__lt=(tranche + 1) * cls.LARGEUR_TRANCHE)
+        ).aggregate(n=models.Sum('nombre'))['n'] or 0
+        # Les scores plus bas ajoutent les profils notés entre eux et le plus haut
+        effectifs = iter(
+            cls.objects.filter(niveau=0, valeur__gt=scores[-1], valeur__lte=haut)
+            .order_by('-valeur').values_list('valeur', 'nombre')
+            if len(scores) > 1 else ()
+        )
+        rangs = {}
+        effectif = next(effectifs, None)
+        for score in scores:
+            while effectif is not None and effectif[0] > score:
+                mieux_notes += effectif[1]
+                effectif = next(effectifs, None)
+            rangs[score] = mieux_notes + 1
+        return rangs
+    
+    @classmethod
+    def rang(cls, score):
+        return cls.rangs([score])[score]
+    
+    @classmethod
+    def recalculer(cls):
+        """Recompte les profils par score et par tranche ; retourne le nombre de profils"""
+        effectifs = dict(
+            UserProfile.objects.order_by().values('score_total').annotate(n=models.Count('id'))
+            .values_list('score_total', 'n')
+        )
+        tranches = {}
+        for score, nombre in effectifs.items():
+            tranches[score // cls.LARGEUR_TRANCHE] = tranches.get(score // cls.LARGEUR_TRANCHE, 0) + nombre
+        cls.objects.all().delete()
+        cls.objects.bulk_create(
+            [cls(niveau=0, valeur=score, nombre=nombre) for score, nombre in effectifs.items()]
+            + [cls(niveau=1, valeur=tranche, nombre=nombre) for tranche, nombre in tranches.items()],
+            batch_size=2000,
+        )
+        return sum(effectifs.values())
+
+class MouvementPoints(models.Model):
+    """Registre des points : une ligne par événement qui rapporte (ou retire) des points
+
+    UserProfile.score_total en est la somme, tenue à jour à chaque mouvement (places/scoring.py)
+    et réconciliée par la commande reconcile_scores. Un objet source ne rapporte des points
+    qu'une fois par motif (contrainte d'unicité).
+    """
+    CREATION_VOYAGE = 'creation_voyage'
+    CREATION_ACTIVITE = 'creation_activite'
+    NOTATION_ACTIVITE = 'notation_activite'
+    REPRISE = 'reprise'
+    CORRECTION = 'correction'
+    MOTIF_CHOICES = [
+        (CREATION_VOYAGE, 'Création de voyage'),
+        (CREATION_ACTIVITE, "Création d'activité"),
+        (NOTATION_ACTIVITE, "Notation d'activité"),
+        (REPRISE, 'Reprise du score existant'),
+        (CORRECTION, 'Correction'),
+    ]
+    
+    utilisateur = models.ForeignKey(User, on_delete=models.CASCADE, related_name='mouvements_points')
+    points = models.IntegerField()
+    motif = models.CharField(max_length=32, choices=MOTIF_CHOICES)
+    # Objet à l'origine des points (« places.voyage » et sa clé primaire), vide pour une reprise ou une correction
+    type_source = models.CharField(max_length=64, blank=True)
+    source_id = models.CharField(max_length=64, blank=True)
+    date_creation = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = "Mouvement de points"
+        verbose_name_plural = "Mouvements de points"
+        ordering = ['-date_creation']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['motif', 'type_source', 'source_id'],
+                condition=~Q(source_id=''),
+                name='mouvement_points_source_unique',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['utilisateur', '-date_creation'], name='mouvement_points_user_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.utilisateur_id} : {self.points:+d} ({self.motif})"
+
 # Ajout des méthodes au modèle User
 User.add_to_class('get_lieux_visites', get_lieux_visites)
 User.add_to_class('get_pays_visites', get_pays_visites)
 User.add_to_class('get_score_total', get_score_total)
 
 # Signaux pour créer/supprimer automatiquement le profil utilisateur
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
 
 @receiver(post_save, sender=User)
@@ -340,11 +1217,165 @@ def save_user_profile(sender, instance, **kwargs):
     if hasattr(instance, 'profile'):
         instance.profile.save()
 
-@receiver(post_delete, sender=User)
-def delete_user_profile(sender, instance, **kwargs):
-    """Supprime automatiquement le profil utilisateur quand l'utilisateur est supprimé"""
-    try:
-        if hasattr(instance, 'profile'):
-            instance.profile.delete()
-    except UserProfile.DoesNotExist:
-        pass
+@receiver(pre_save, sender=Lieu)
+@receiver(pre_save, sender=Voyage)
+@receiver(pre_save, sender=NoteActivite)
+def capturer_etat_agregats(sender, instance, raw=False, **kwargs):
+    """Récupère l'état précédent d'une instance modifiée s'il n'a pas été chargé depuis la base"""
+    if raw or instance._state.adding or hasattr(instance, '_etat_agregats'):
+        return
+    instance._etat_agregats = instance.charger_etat_agregats()
+
+@receiver(post_save, sender=Lieu)
+def mettre_a_jour_carte_lieu(sender, instance, created, raw=False, **kwargs):
+    """Répercute la création ou le déplacement d'un lieu sur les groupes et les tuiles de la carte"""
+    if raw:
+        return
+    nouvel_etat = instance.get_etat_agregats()
+    ancien_etat = None if created else getattr(instance, '_etat_agregats', None)
+    if ancien_etat != nouvel_etat:
+        if ancien_etat is not None:
+            GroupeLieux.appliquer_lieu(ancien_etat[0], ancien_etat[1], -1)
+        GroupeLieux.appliquer_lieu(nouvel_etat[0], nouvel_etat[1], 1)
+    # Les tuiles portent aussi le nom du lieu : elles sont effacées à chaque sauvegarde
+    invalider_tuiles([etat for etat in (ancien_etat, nouvel_etat) if etat is not None])
+    instance._etat_agregats = nouvel_etat
+
+@receiver(post_delete, sender=Lieu)
+def retirer_carte_lieu(sender, instance, **kwargs):
+    """Retire un lieu supprimé des groupes et des tuiles de la carte"""
+    latitude, longitude = getattr(instance, '_etat_agregats', None) or instance.get_etat_agregats()
+    GroupeLieux.appliquer_lieu(latitude, longitude, -1)
+    invalider_tuiles([(latitude, longitude)])
+
+@receiver(post_save, sender=Voyage)
+def mettre_a_jour_agregats_voyage(sender, instance, created, raw=False, **kwargs):
+    """Répercute la création ou la modification d'un voyage sur les agrégats du lieu"""
+    if raw:
+        return
+    nouvel_etat = instance.get_etat_agregats()
+    ancien_etat = None if created else getattr(instance, '_etat_agregats', None)
+    if ancien_etat != nouvel_etat:
+        if ancien_etat is not None:
+            Lieu.appliquer_voyage(ancien_etat[0], -1, ancien_etat[1], ancien_etat[2])
+        Lieu.appliquer_voyage(nouvel_etat[0], 1, nouvel_etat[1], nouvel_etat[2])
+    # La tendance ne dépend que du lieu : la contribution est datée de la création du voyage
+    if ancien_etat is None or ancien_etat[0] != nouvel_etat[0]:
+        if ancien_etat is not None:
+            TendanceLieu.appliquer(ancien_etat[0], -POIDS_VOYAGE, instance.date_creation)
+        TendanceLieu.appliquer(nouvel_etat[0], POIDS_VOYAGE, instance.date_creation)
+    instance._etat_agregats = nouvel_etat
+
+@receiver(post_delete, sender=Voyage)
+def retirer_agregats_voyage(sender, instance, **kwargs):
+    """Retire un voyage supprimé des agrégats et de la tendance de son lieu"""
+    lieu_id, note, date_debut = getattr(instance, '_etat_agregats', None) or instance.get_etat_agregats()
+    Lieu.appliquer_voyage(lieu_id, -1, note, date_debut)
+    TendanceLieu.appliquer(lieu_id, -POIDS_VOYAGE, instance.date_creation)
+
+@receiver(post_save, sender=Activite)
+def creer_resume_notes(sender, instance, created, raw=False, **kwargs):
+    """Crée le résumé des notes vide d'une nouvelle activité"""
+    if created and not raw:
+        ResumeNotesActivite.objects.get_or_create(activite=instance)
+
+@receiver(post_save, sender=NoteActivite)
+def mettre_a_jour_resume_note(sender, instance, created, raw=False, **kwargs):
+    """Répercute la création ou la modification d'une note sur le résumé de son activité"""
+    if raw:
+        return
+    nouvel_etat = instance.get_etat_agregats()
+    ancien_etat = None if created else getattr(instance, '_etat_agregats', None)
+    if ancien_etat != nouvel_etat:
+        if ancien_etat is not None:
+            ResumeNotesActivite.appliquer_note(ancien_etat[0], -1, ancien_etat[1])
+        ResumeNotesActivite.appliquer_note(nouvel_etat[0], 1, nouvel_etat[1])
+    instance._etat_agregats = nouvel_etat
+
+@receiver(post_delete, sender=NoteActivite)
+def retirer_resume_note(sender, instance, **kwargs):
+    """Retire une note supprimée du résumé de son activité"""
+    activite_id, note = getattr(instance, '_etat_agregats', None) or instance.get_etat_agregats()
+    ResumeNotesActivite.appliquer_note(activite_id, -1, note)
+
+@receiver(post_save, sender=Lieu)
+def indexer_lieu(sender, instance, raw=False, **kwargs):
+    """Ajoute ou met à jour le lieu dans l'index d'autocomplétion"""
+    if not raw:
+        autocomplete.lieu_modifie(instance)
+
+@receiver(post_delete, sender=Lieu)
+def desindexer_lieu(sender, instance, **kwargs):
+    autocomplete.lieu_supprime(instance.pk)
+
+@receiver(post_save, sender=Pays)
+def indexer_pays(sender, instance, raw=False, **kwargs):
+    """Ajoute ou met à jour le pays dans l'index d'autocomplétion"""
+    if not raw:
+        autocomplete.pays_modifie(instance)
+
+@receiver(post_delete, sender=Pays)
+def desindexer_pays(sender, instance, **kwargs):
+    autocomplete.pays_supprime(instance.pk)
+
+@receiver(post_save, sender=Favori)
+def compter_favori(sender, instance, created, raw=False, **kwargs):
+    """Un favori ajouté rend le lieu plus populaire dans l'autocomplétion et les tendances"""
+    if created and not raw:
+        autocomplete.popularite_lieu_modifiee(instance.lieu_id, 1)
+        TendanceLieu.appliquer(instance.lieu_id, POIDS_FAVORI, instance.date_ajout)
+
+@receiver(post_delete, sender=Favori)
+def decompter_favori(sender, instance, **kwargs):
+    autocomplete.popularite_lieu_modifiee(instance.lieu_id, -1)
+    TendanceLieu.appliquer(instance.lieu_id, -POIDS_FAVORI, instance.date_ajout)
+
+@receiver(post_save, sender=Favori)
+@receiver(post_delete, sender=Favori)
+@receiver(post_save, sender=Voyage)
+@receiver(post_delete, sender=Voyage)
+def invalider_suggestions(sender, instance, raw=False, **kwargs):
+    """Les suggestions dépendent des favoris et des lieux visités de l'utilisateur"""
+    if not raw:
+        suggestions.invalider(instance.utilisateur_id)
+
+@receiver(post_save, sender=UserProfile)
+def compter_profil_score(sender, instance, created, raw=False, **kwargs):
+    """Ajoute un nouveau profil au cache de rang (les changements de score passent par places/scoring.py)"""
+    if created and not raw:
+        EffectifScore.appliquer(instance.score_total, 1)
+
+@receiver(post_delete, sender=UserProfile)
+def retirer_profil_score(sender, instance, **kwargs):
+    """Retire un profil supprimé (avec son utilisateur, par cascade) du cache de rang"""
+    EffectifScore.appliquer(instance.score_total, -1)
+
+@receiver(pre_save, sender=MediaVoyage)
+@receiver(pre_save, sender=MediaActivite)
+def preparer_media(sender, instance, raw=False, **kwargs):
+    """Seules les images sont déclinées ; la taille de l'original est connue dès le téléversement"""
+    if raw or not instance._state.adding:
+        return
+    if instance.type_media != 'image':
+        instance.etat_renditions = renditions.SANS_OBJET
+    if instance.taille_octets is None and instance.fichier:
+        instance.taille_octets = instance.fichier.size
+
+@receiver(post_save, sender=MediaVoyage)
+@receiver(post_save, sender=MediaActivite)
+def decliner_media(sender, instance, created, raw=False, **kwargs):
+    """Déclinaisons produites hors de la requête, après validation de la transaction"""
+    if created and not raw and instance.etat_renditions == renditions.ATTENTE:
+        renditions.planifier(instance)
+
+@receiver(post_delete, sender=MediaVoyage)
+@receiver(post_delete, sender=MediaActivite)
+def liberer_fichiers_media(sender, instance, **kwargs):
+    """Retire les références du média à son original et à ses déclinaisons (places/stockage.py)"""
+    if instance.fichier:
+        instance.fichier.storage.delete(instance.fichier.name)
+    renditions.supprimer(instance)
+
+@receiver(post_delete, sender=TeleversementMedia)
+def supprimer_fichier_partiel(sender, instance, **kwargs):
+    televersements.supprimer_fichier(instance)
@@ -0,0 +1,152 @@
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from uuid import UUID
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Pagination par curseur opaque sur une clé ordonnée (keyset)
+
+    Chaque page est lue avec un filtre « après la dernière ligne vue » sur les colonnes
+    de tri, au lieu d'un OFFSET : une page profonde coûte autant que la première tant
+    qu'un index couvre l'ordre de tri. L'ordre est déclaré par la vue
+    (attribut `pagination_ordering`) et doit se terminer par une colonne unique.
+    """
+    cursor_query_param = 'cursor'
+    limit_query_param = 'limit'
+    default_ordering = ('pk',)
+
+    def __init__(self):
+        rest_settings = getattr(settings, 'REST_FRAMEWORK', {})
+        self.page_size = rest_settings.get('PAGE_SIZE') or 50
+        self.max_page_size = rest_settings.get('MAX_PAGE_SIZE') or 200
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering = tuple(getattr(view, 'pagination_ordering', None) or self.default_ordering)
+        self.limit = self.get_limit(request)
+        valeurs, self.reverse = self.decode_cursor(request)
+
+        ordering = self.ordering
+        if self.reverse:
+            ordering = tuple(self._inverser(champ) for champ in ordering)
+        queryset = queryset.order_by(*ordering)
+        if valeurs is not None:
+            queryset = queryset.filter(self._filtre_apres(ordering, valeurs))
+
+        # Une ligne de plus pour savoir s'il existe une page suivante
+        results = list(queryset[:self.limit + 1])
+        self.has_more = len(results) > self.limit
+        results = results[:self.limit]
+        if self.reverse:
+            results.reverse()
+
+        self.has_next = self.has_more if not self.reverse else True
+        self.has_previous = (valeurs is not None) if not self.reverse else self.has_more
+        self.page = results
+        return results
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_limit(self, request):
+        """Taille de page demandée (?limit=), bornée par MAX_PAGE_SIZE"""
+        try:
+            limit = int(request.query_params[self.limit_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(limit, self.max_page_size))
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self._lien(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self._lien(self.page[0], reverse=True)
+
+    def decode_cursor(self, request):
+        """Décode le curseur opaque : valeurs de la clé de tri de la dernière ligne vue et sens de lecture"""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            padding = '=' * (-len(encoded) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(encoded + padding).decode('utf-8'))
+            valeurs = payload['v']
+            if not isinstance(valeurs, list) or len(valeurs) != len(self.ordering):
+                raise ValueError
+            return valeurs, bool(payload.get('r'))
+        except (TypeError, ValueError, KeyError, UnicodeDecodeError):
+            raise NotFound('Curseur invalide')
+
+    def encode_cursor(self, valeurs, reverse):
+        payload = {'v': [self._serialiser(valeur) for valeur in valeurs]}
+        if reverse:
+            payload['r'] = 1
+        encoded = base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode('utf-8'))
+        return encoded.decode('ascii').rstrip('=')
+
+    def _lien(self, instance, reverse):
+        valeurs = [self._valeur(instance, champ) for champ in self.ordering]
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.cursor_query_param, self.encode_cursor(valeurs, reverse))
+        if self.limit == self.page_size:
+            url = remove_query_param(url, self.limit_query_param)
+        return url
+
+    @staticmethod
+    def _valeur(instance, champ):
+        valeur = instance
+        for attribut in champ.lstrip('-').split('__'):
+            valeur = getattr(valeur, 'pk' if attribut == 'pk' else attribut)
+        return valeur
+
+    @staticmethod
+    def _serialiser(valeur):
+        if isinstance(valeur, (datetime, date)):
+            return valeur.isoformat()
+        if isinstance(valeur, (UUID, Decimal)):
+            return str(valeur)
+        return valeur
+
+    @staticmethod
+    def _inverser(champ):
+        return champ[1:] if champ.startswith('-') else f'-{champ}'
+
+    @staticmethod
+    def _filtre_apres(ordering, valeurs):
+        """(a > x) OR (a = x AND b > y) OR ... selon le sens de chaque colonne"""
+        filtre = Q()
+        egalites = {}
+        for champ, valeur in zip(ordering, valeurs):
+            nom = champ.lstrip('-')
+            lookup = 'lt' if champ.startswith('-') else 'gt'
+            filtre |= Q(**egalites, **{f'{nom}__{lookup}': valeur})
+            egalites[nom] = valeur
+        return filtre
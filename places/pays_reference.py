@@ -0,0 +1,287 @@
+"""Référentiel des pays : code ISO 3166-1 alpha-2 → (alpha-3, nom français, continent)
+
+Les codes pays des lieux (Pays.code_iso) et du gazetteer sont ceux de GeoNames, en alpha-2
+(XK pour le Kosovo). Les continents suivent GeoNames : AF, AN, AS, EU, NA, OC, SA.
+"""
+
+PAYS = {
+    'AD': ('AND', 'Andorre', 'EU'),
+    'AE': ('ARE', 'Émirats arabes unis', 'AS'),
+    'AF': ('AFG', 'Afghanistan', 'AS'),
+    'AG': ('ATG', 'Antigua-et-Barbuda', 'NA'),
+    'AI': ('AIA', 'Anguilla', 'NA'),
+    'AL': ('ALB', 'Albanie', 'EU'),
+    'AM': ('ARM', 'Arménie', 'AS'),
+    'AO': ('AGO', 'Angola', 'AF'),
+    'AQ': ('ATA', 'Antarctique', 'AN'),
+    'AR': ('ARG', 'Argentine', 'SA'),
+    'AS': ('ASM', 'Samoa américaines', 'OC'),
+    'AT': ('AUT', 'Autriche', 'EU'),
+    'AU': ('AUS', 'Australie', 'OC'),
+    'AW': ('ABW', 'Aruba', 'NA'),
+    'AX': ('ALA', 'Îles Åland', 'EU'),
+    'AZ': ('AZE', 'Azerbaïdjan', 'AS'),
+    'BA': ('BIH', 'Bosnie-Herzégovine', 'EU'),
+    'BB': ('BRB', 'Barbade', 'NA'),
+    'BD': ('BGD', 'Bangladesh', 'AS'),
+    'BE': ('BEL', 'Belgique', 'EU'),
+    'BF': ('BFA', 'Burkina Faso', 'AF'),
+    'BG': ('BGR', 'Bulgarie', 'EU'),
+    'BH': ('BHR', 'Bahreïn', 'AS'),
+    'BI': ('BDI', 'Burundi', 'AF'),
+    'BJ': ('BEN', 'Bénin', 'AF'),
+    'BL': ('BLM', 'Saint-Barthélemy', 'NA'),
+    'BM': ('BMU', 'Bermudes', 'NA'),
+    'BN': ('BRN', 'Brunei', 'AS'),
+    'BO': ('BOL', 'Bolivie', 'SA'),
+    'BQ': ('BES', 'Pays-Bas caribéens', 'NA'),
+    'BR': ('BRA', 'Brésil', 'SA'),
+    'BS': ('BHS', 'Bahamas', 'NA'),
+    'BT': ('BTN', 'Bhoutan', 'AS'),
+    'BV': ('BVT', 'Île Bouvet', 'AN'),
+    'BW': ('BWA', 'Botswana', 'AF'),
+    'BY': ('BLR', 'Biélorussie', 'EU'),
+    'BZ': ('BLZ', 'Belize', 'NA'),
+    'CA': ('CAN', 'Canada', 'NA'),
+    'CC': ('CCK', 'Îles Cocos', 'AS'),
+    'CD': ('COD', 'République démocratique du Congo', 'AF'),
+    'CF': ('CAF', 'République centrafricaine', 'AF'),
+    'CG': ('COG', 'République du Congo', 'AF'),
+    'CH': ('CHE', 'Suisse', 'EU'),
+    'CI': ('CIV', "Côte d'Ivoire", 'AF'),
+    'CK': ('COK', 'Îles Cook', 'OC'),
+    'CL': ('CHL', 'Chili', 'SA'),
+    'CM': ('CMR', 'Cameroun', 'AF'),
+    'CN': ('CHN', 'Chine', 'AS'),
+    'CO': ('COL', 'Colombie', 'SA'),
+    'CR': ('CRI', 'Costa Rica', 'NA'),
+    'CU': ('CUB', 'Cuba', 'NA'),
+    'CV': ('CPV', 'Cap-Vert', 'AF'),
+    'CW': ('CUW', 'Curaçao', 'NA'),
+    'CX': ('CXR', 'Île Christmas', 'OC'),
+    'CY': ('CYP', 'Chypre', 'EU'),
+    'CZ': ('CZE', 'Tchéquie', 'EU'),
+    'DE': ('DEU', 'Allemagne', 'EU'),
+    'DJ': ('DJI', 'Djibouti', 'AF'),
+    'DK': ('DNK', 'Danemark', 'EU'),
+    'DM': ('DMA', 'Dominique', 'NA'),
+    'DO': ('DOM', 'République dominicaine', 'NA'),
+    'DZ': ('DZA', 'Algérie', 'AF'),
+    'EC': ('ECU', 'Équateur', 'SA'),
+    'EE': ('EST', 'Estonie', 'EU'),
+    'EG': ('EGY', 'Égypte', 'AF'),
+    'EH': ('ESH', 'Sahara occidental', 'AF'),
+    'ER': ('ERI', 'Érythrée', 'AF'),
+    'ES': ('ESP', 'Espagne', 'EU'),
+    'ET': ('ETH', 'Éthiopie', 'AF'),
+    'FI': ('FIN', 'Finlande', 'EU'),
+    'FJ': ('FJI', 'Fidji', 'OC'),
+    'FK': ('FLK', 'Îles Malouines', 'SA'),
+    'FM': ('FSM', 'Micronésie', 'OC'),
+    'FO': ('FRO', 'Îles Féroé', 'EU'),
+    'FR': ('FRA', 'France', 'EU'),
+    'GA': ('GAB', 'Gabon', 'AF'),
+    'GB': ('GBR', 'Royaume-Uni', 'EU'),
+    'GD': ('GRD', 'Grenade', 'NA'),
+    'GE': ('GEO', 'Géorgie', 'AS'),
+    'GF': ('GUF', 'Guyane', 'SA'),
+    'GG': ('GGY', 'Guernesey', 'EU'),
+    'GH': ('GHA', 'Ghana', 'AF'),
+    'GI': ('GIB', 'Gibraltar', 'EU'),
+    'GL': ('GRL', 'Groenland', 'NA'),
+    'GM': ('GMB', 'Gambie', 'AF'),
+    'GN': ('GIN', 'Guinée', 'AF'),
+    'GP': ('GLP', 'Guadeloupe', 'NA'),
+    'GQ': ('GNQ', 'Guinée équatoriale', 'AF'),
+    'GR': ('GRC', 'Grèce', 'EU'),
+    'GS': ('SGS', 'Géorgie du Sud-et-les îles Sandwich du Sud', 'AN'),
+    'GT': ('GTM', 'Guatemala', 'NA'),
+    'GU': ('GUM', 'Guam', 'OC'),
+    'GW': ('GNB', 'Guinée-Bissau', 'AF'),
+    'GY': ('GUY', 'Guyana', 'SA'),
+    'HK': ('HKG', 'Hong Kong', 'AS'),
+    'HM': ('HMD', 'Îles Heard-et-MacDonald', 'AN'),
+    'HN': ('HND', 'Honduras', 'NA'),
+    'HR': ('HRV', 'Croatie', 'EU'),
+    'HT': ('HTI', 'Haïti', 'NA'),
+    'HU': ('HUN', 'Hongrie', 'EU'),
+    'ID': ('IDN', 'Indonésie', 'AS'),
+    'IE': ('IRL', 'Irlande', 'EU'),
+    'IL': ('ISR', 'Israël', 'AS'),
+    'IM': ('IMN', 'Île de Man', 'EU'),
+    'IN': ('IND', 'Inde', 'AS'),
+    'IO': ('IOT', "Territoire britannique de l'océan Indien", 'AS'),
+    'IQ': ('IRQ', 'Irak', 'AS'),
+    'IR': ('IRN', 'Iran', 'AS'),
+    'IS': ('ISL', 'Islande', 'EU'),
+    'IT': ('ITA', 'Italie', 'EU'),
+    'JE': ('JEY', 'Jersey', 'EU'),
+    'JM': ('JAM', 'Jamaïque', 'NA'),
+    'JO': ('JOR', 'Jordanie', 'AS'),
+    'JP': ('JPN', 'Japon', 'AS'),
+    'KE': ('KEN', 'Kenya', 'AF'),
+    'KG': ('KGZ', 'Kirghizistan', 'AS'),
+    'KH': ('KHM', 'Cambodge', 'AS'),
+    'KI': ('KIR', 'Kiribati', 'OC'),
+    'KM': ('COM', 'Comores', 'AF'),
+    'KN': ('KNA', 'Saint-Christophe-et-Niévès', 'NA'),
+    'KP': ('PRK', 'Corée du Nord', 'AS'),
+    'KR': ('KOR', 'Corée du Sud', 'AS'),
+    'KW': ('KWT', 'Koweït', 'AS'),
+    'KY': ('CYM', 'Îles Caïmans', 'NA'),
+    'KZ': ('KAZ', 'Kazakhstan', 'AS'),
+    'LA': ('LAO', 'Laos', 'AS'),
+    'LB': ('LBN', 'Liban', 'AS'),
+    'LC': ('LCA', 'Sainte-Lucie', 'NA'),
+    'LI': ('LIE', 'Liechtenstein', 'EU'),
+    'LK': ('LKA', 'Sri Lanka', 'AS'),
+    'LR': ('LBR', 'Liberia', 'AF'),
+    'LS': ('LSO', 'Lesotho', 'AF'),
+    'LT': ('LTU', 'Lituanie', 'EU'),
+    'LU': ('LUX', 'Luxembourg', 'EU'),
+    'LV': ('LVA', 'Lettonie', 'EU'),
+    'LY': ('LBY', 'Libye', 'AF'),
+    'MA': ('MAR', 'Maroc', 'AF'),
+    'MC': ('MCO', 'Monaco', 'EU'),
+    'MD': ('MDA', 'Moldavie', 'EU'),
+    'ME': ('MNE', 'Monténégro', 'EU'),
+    'MF': ('MAF', 'Saint-Martin', 'NA'),
+    'MG': ('MDG', 'Madagascar', 'AF'),
+    'MH': ('MHL', 'Îles Marshall', 'OC'),
+    'MK': ('MKD', 'Macédoine du Nord', 'EU'),
+    'ML': ('MLI', 'Mali', 'AF'),
+    'MM': ('MMR', 'Birmanie', 'AS'),
+    'MN': ('MNG', 'Mongolie', 'AS'),
+    'MO': ('MAC', 'Macao', 'AS'),
+    'MP': ('MNP', 'Îles Mariannes du Nord', 'OC'),
+    'MQ': ('MTQ', 'Martinique', 'NA'),
+    'MR': ('MRT', 'Mauritanie', 'AF'),
+    'MS': ('MSR', 'Montserrat', 'NA'),
+    'MT': ('MLT', 'Malte', 'EU'),
+    'MU': ('MUS', 'Maurice', 'AF'),
+    'MV': ('MDV', 'Maldives', 'AS'),
+    'MW': ('MWI', 'Malawi', 'AF'),
+    'MX': ('MEX', 'Mexique', 'NA'),
+    'MY': ('MYS', 'Malaisie', 'AS'),
+    'MZ': ('MOZ', 'Mozambique', 'AF'),
+    'NA': ('NAM', 'Namibie', 'AF'),
+    'NC': ('NCL', 'Nouvelle-Calédonie', 'OC'),
+    'NE': ('NER', 'Niger', 'AF'),
+    'NF': ('NFK', 'Île Norfolk', 'OC'),
+    'NG': ('NGA', 'Nigeria', 'AF'),
+    'NI': ('NIC', 'Nicaragua', 'NA'),
+    'NL': ('NLD', 'Pays-Bas', 'EU'),
+    'NO': ('NOR', 'Norvège', 'EU'),
+    'NP': ('NPL', 'Népal', 'AS'),
+    'NR': ('NRU', 'Nauru', 'OC'),
+    'NU': ('NIU', 'Niue', 'OC'),
+    'NZ': ('NZL', 'Nouvelle-Zélande', 'OC'),
+    'OM': ('OMN', 'Oman', 'AS'),
+    'PA': ('PAN', 'Panama', 'NA'),
+    'PE': ('PER', 'Pérou', 'SA'),
+    'PF': ('PYF', 'Polynésie française', 'OC'),
+    'PG': ('PNG', 'Papouasie-Nouvelle-Guinée', 'OC'),
+    'PH': ('PHL', 'Philippines', 'AS'),
+    'PK': ('PAK', 'Pakistan', 'AS'),
+    'PL': ('POL', 'Pologne', 'EU'),
+    'PM': ('SPM', 'Saint-Pierre-et-Miquelon', 'NA'),
+    'PN': ('PCN', 'Îles Pitcairn', 'OC'),
+    'PR': ('PRI', 'Porto Rico', 'NA'),
+    'PS': ('PSE', 'Palestine', 'AS'),
+    'PT': ('PRT', 'Portugal', 'EU'),
+    'PW': ('PLW', 'Palaos', 'OC'),
+    'PY': ('PRY', 'Paraguay', 'SA'),
+    'QA': ('QAT', 'Qatar', 'AS'),
+    'RE': ('REU', 'La Réunion', 'AF'),
+    'RO': ('ROU', 'Roumanie', 'EU'),
+    'RS': ('SRB', 'Serbie', 'EU'),
+    'RU': ('RUS', 'Russie', 'EU'),
+    'RW': ('RWA', 'Rwanda', 'AF'),
+    'SA': ('SAU', 'Arabie saoudite', 'AS'),
+    'SB': ('SLB', 'Îles Salomon', 'OC'),
+    'SC': ('SYC', 'Seychelles', 'AF'),
+    'SD': ('SDN', 'Soudan', 'AF'),
+    'SE': ('SWE', 'Suède', 'EU'),
+    'SG': ('SGP', 'Singapour', 'AS'),
+    'SH': ('SHN', 'Sainte-Hélène', 'AF'),
+    'SI': ('SVN', 'Slovénie', 'EU'),
+    'SJ': ('SJM', 'Svalbard et Jan Mayen', 'EU'),
+    'SK': ('SVK', 'Slovaquie', 'EU'),
+    'SL': ('SLE', 'Sierra Leone', 'AF'),
+    'SM': ('SMR', 'Saint-Marin', 'EU'),
+    'SN': ('SEN', 'Sénégal', 'AF'),
+    'SO': ('SOM', 'Somalie', 'AF'),
+    'SR': ('SUR', 'Suriname', 'SA'),
+    'SS': ('SSD', 'Soudan du Sud', 'AF'),
+    'ST': ('STP', 'Sao Tomé-et-Principe', 'AF'),
+    'SV': ('SLV', 'Salvador', 'NA'),
+    'SX': ('SXM', 'Saint-Martin (partie néerlandaise)', 'NA'),
+    'SY': ('SYR', 'Syrie', 'AS'),
+    'SZ': ('SWZ', 'Eswatini', 'AF'),
+    'TC': ('TCA', 'Îles Turques-et-Caïques', 'NA'),
+    'TD': ('TCD', 'Tchad', 'AF'),
+    'TF': ('ATF', 'Terres australes et antarctiques françaises', 'AN'),
+    'TG': ('TGO', 'Togo', 'AF'),
+    'TH': ('THA', 'Thaïlande', 'AS'),
+    'TJ': ('TJK', 'Tadjikistan', 'AS'),
+    'TK': ('TKL', 'Tokelau', 'OC'),
+    'TL': ('TLS', 'Timor oriental', 'OC'),
+    'TM': ('TKM', 'Turkménistan', 'AS'),
+    'TN': ('TUN', 'Tunisie', 'AF'),
+    'TO': ('TON', 'Tonga', 'OC'),
+    'TR': ('TUR', 'Turquie', 'AS'),
+    'TT': ('TTO', 'Trinité-et-Tobago', 'NA'),
+    'TV': ('TUV', 'Tuvalu', 'OC'),
+    'TW': ('TWN', 'Taïwan', 'AS'),
+    'TZ': ('TZA', 'Tanzanie', 'AF'),
+    'UA': ('UKR', 'Ukraine', 'EU'),
+    'UG': ('UGA', 'Ouganda', 'AF'),
+    'UM': ('UMI', 'Îles mineures éloignées des États-Unis', 'OC'),
+    'US': ('USA', 'États-Unis', 'NA'),
+    'UY': ('URY', 'Uruguay', 'SA'),
+    'UZ': ('UZB', 'Ouzbékistan', 'AS'),
+    'VA': ('VAT', 'Vatican', 'EU'),
+    'VC': ('VCT', 'Saint-Vincent-et-les-Grenadines', 'NA'),
+    'VE': ('VEN', 'Venezuela', 'SA'),
+    'VG': ('VGB', 'Îles Vierges britanniques', 'NA'),
+    'VI': ('VIR', 'Îles Vierges des États-Unis', 'NA'),
+    'VN': ('VNM', 'Viêt Nam', 'AS'),
+    'VU': ('VUT', 'Vanuatu', 'OC'),
+    'WF': ('WLF', 'Wallis-et-Futuna', 'OC'),
+    'WS': ('WSM', 'Samoa', 'OC'),
+    'XK': ('XKX', 'Kosovo', 'EU'),
+    'YE': ('YEM', 'Yémen', 'AS'),
+    'YT': ('MYT', 'Mayotte', 'AF'),
+    'ZA': ('ZAF', 'Afrique du Sud', 'AF'),
+    'ZM': ('ZMB', 'Zambie', 'AF'),
+    'ZW': ('ZWE', 'Zimbabwe', 'AF'),
+}
+
+# Codes alpha-3 des pays créés avant l'adoption de l'alpha-2
+ALPHA2_PAR_ALPHA3 = {alpha3: alpha2 for alpha2, (alpha3, _, _) in PAYS.items()}
+
+# Codes (alpha-2 et alpha-3) des pays de chaque continent
+CODES_PAR_CONTINENT = {
+    continent: frozenset(
+        code for alpha2, (alpha3, _, continent_code) in PAYS.items() if continent_code == continent
+        for code in (alpha2, alpha3)
+    )
+    for continent in {continent for _, _, continent in PAYS.values()}
+}
+
+
+def nom_pays(code):
+    """Nom français d'un pays (code alpha-2 ou alpha-3), None si le code est inconnu"""
+    reference = PAYS.get(ALPHA2_PAR_ALPHA3.get(code, code))
+    return reference[1] if reference else None
+
+
+def continent_pays(code):
+    """Code du continent d'un pays (code alpha-2 ou alpha-3), None si le code est inconnu"""
+    reference = PAYS.get(ALPHA2_PAR_ALPHA3.get(code, code))
+    return reference[2] if reference else None
+
+
+def codes_continent(continent):
+    """Codes alpha-2 et alpha-3 des pays d'un continent (ensemble vide si le code est inconnu)"""
+    return CODES_PAR_CONTINENT.get(continent, frozenset())
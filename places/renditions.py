@@ -0,0 +1,190 @@
+"""Déclinaisons des images de voyages et d'activités (miniature, carte, plein écran)
+
+Chaque image téléversée est déclinée en TAILLES (plus grand côté, sans agrandissement),
+en WebP et en JPEG pour les clients qui ne lisent pas le WebP. Le traitement a lieu dans
+un pool de RENDITIONS_WORKERS fils, soumis après la validation de la transaction qui crée
+le média : la requête de téléversement n'attend pas Pillow, qui relâche le GIL pendant le
+décodage, le redimensionnement et l'encodage. Les fichiers sont écrits dans le stockage
+des médias (adressé par contenu, places/stockage.py), et la ligne du média reçoit les
+dimensions de l'original et la description des déclinaisons (champ renditions).
+
+Un média reste « en attente » si son processus s'arrête avant le traitement : la commande
+build_renditions reprend les médias en attente ou en échec.
+"""
+import logging
+import os
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+# Plus grand côté de chaque déclinaison, en pixels
+TAILLES = {
+    'thumb': 320,
+    'card': 800,
+    'full': 1920,
+}
+# Format : (format Pillow, extension, options d'encodage)
+FORMATS = {
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+# Balise EXIF d'orientation, et ses valeurs qui font pivoter l'image d'un quart de tour
+ORIENTATION = 0x0112
+ROTATIONS_QUART = (5, 6, 7, 8)
+
+ATTENTE = 'attente'
+PRET = 'pret'
+ECHEC = 'echec'
+SANS_OBJET = 'sans_objet'
+ETAT_CHOICES = [
+    (ATTENTE, 'En attente'),
+    (PRET, 'Prêtes'),
+    (ECHEC, 'Échec'),
+    (SANS_OBJET, 'Sans objet'),
+]
+
+_pool = None
+
+
+def _executeur():
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(
+            max_workers=settings.RENDITIONS_WORKERS, thread_name_prefix='renditions'
+        )
+    return _pool
+
+
+def dossier(media):
+    """Dossier des déclinaisons d'un média, à côté de son original"""
+    return posixpath.join(media._meta.get_field('fichier').upload_to.rstrip('/'), 'renditions', str(media.pk))
+
+
+def decliner(image, dossier_sortie, stockage):
+    """Écrit les déclinaisons d'une image Pillow ; retourne {taille: {format: {chemin, largeur, hauteur, octets}}}"""
+    from PIL import Image, ImageOps
+
+    # Décodage JPEG directement à l'échelle utile (réduction par 2, 4 ou 8 dans le décodeur)
+    cote_max = max(TAILLES.values())
+    image.draft('RGB', (cote_max, cote_max))
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+
+    renditions = {}
+    # Du plus grand au plus petit : chaque déclinaison part de la précédente
+    source = image
+    try:
+        for taille, cote in sorted(TAILLES.items(), key=lambda item: -item[1]):
+            source = source.copy()
+            source.thumbnail((cote, cote), Image.Resampling.LANCZOS)
+            opaque = source
+            if source.mode == 'RGBA':
+                opaque = Image.new('RGB', source.size, (255, 255, 255))
+                opaque.paste(source, mask=source.getchannel('A'))
+            renditions[taille] = {}
+            for nom, (format_pil, extension, options) in FORMATS.items():
+                tampon = BytesIO()
+                (source if format_pil == 'WEBP' else opaque).save(tampon, format_pil, **options)
+                chemin = stockage.save(posixpath.join(dossier_sortie, f'{taille}.{extension}'), ContentFile(tampon.getvalue()))
+                renditions[taille][nom] = {
+                    'chemin': chemin, 'largeur': source.width, 'hauteur': source.height, 'octets': tampon.tell(),
+                }
+    except Exception:
+        # Déclinaisons déjà écrites : leurs références ne seraient rattachées à aucun média
+        liberer(stockage, _chemins(renditions))
+        raise
+    return renditions
+
+
+def generer(modele, media_id):
+    """Décline l'image d'un média et enregistre le résultat sur sa ligne ; retourne l'état obtenu"""
+    from PIL import Image
+
+    media = modele.objects.filter(pk=media_id).first()
+    if media is None or media.type_media != 'image' or not media.fichier:
+        return None
+    stockage = media.fichier.storage
+    try:
+        with media.fichier.open('rb') as fichier, Image.open(fichier) as image:
+            # Taille lue sur le fichier ouvert : son nom peut disparaître si le média est supprimé entre-temps
+            taille_octets = os.fstat(fichier.fileno()).st_size
+            largeur, hauteur = image.size
+            if image.getexif().get(ORIENTATION) in ROTATIONS_QUART:
+                largeur, hauteur = hauteur, largeur
+            renditions = decliner(image, dossier(media), stockage)
+    except Exception:
+        logger.exception('Déclinaisons impossibles pour %s %s', modele._meta.label, media_id)
+        modele.objects.filter(pk=media_id).update(etat_renditions=ECHEC)
+        return ECHEC
+    try:
+        with transaction.atomic():
+            modifies = modele.objects.filter(pk=media_id).update(
+                largeur=largeur, hauteur=hauteur, taille_octets=taille_octets,
+                renditions=renditions, etat_renditions=PRET,
+            )
+            # Références des déclinaisons remplacées, ou des nouvelles si le média a été supprimé entre-temps
+            liberer(stockage, _chemins(media.renditions if modifies else renditions))
+    except Exception:
+        liberer(stockage, _chemins(renditions))
+        raise
+    return PRET
+
+
+def _generer_en_arriere_plan(modele, media_id):
+    try:
+        generer(modele, media_id)
+    except Exception:
+        logger.exception('Déclinaisons interrompues pour %s %s', modele._meta.label, media_id)
+    finally:
+        # Chaque fil a sa propre connexion : la fermer entre deux tâches
+        connection.close()
+
+
+def planifier(media):
+    """Soumet les déclinaisons d'un média au pool, une fois sa création validée"""
+    modele, media_id = type(media), media.pk
+    transaction.on_commit(lambda: _executeur().submit(_generer_en_arriere_plan, modele, media_id))
+
+
+def _chemins(renditions):
+    """Fichiers des déclinaisons, une fois par référence (deux tailles identiques partagent un fichier)"""
+    return [variante['chemin'] for formats in (renditions or {}).values() for variante in formats.values()]
+
+
+def liberer(stockage, chemins):
+    """Retire les références aux fichiers de déclinaisons ; le stockage les efface après validation"""
+    for chemin in chemins:
+        try:
+            stockage.delete(chemin)
+        except OSError:
+            logger.warning('Déclinaison %s non supprimée', chemin)
+
+
+def supprimer(media):
+    """Libère les fichiers des déclinaisons d'un média supprimé"""
+    liberer(media.fichier.storage, _chemins(media.renditions))
+
+
+def urls(media, construire_url=None):
+    """{taille: {format: url, largeur, hauteur}} des déclinaisons prêtes, {} sinon"""
+    if media.etat_renditions != PRET or not media.renditions:
+        return {}
+    stockage = media.fichier.storage
+    resultat = {}
+    for taille, formats in media.renditions.items():
+        variantes = {}
+        for nom, variante in formats.items():
+            url = stockage.url(variante['chemin'])
+            variantes[nom] = construire_url(url) if construire_url else url
+            variantes['largeur'] = variante['largeur']
+            variantes['hauteur'] = variante['hauteur']
+        resultat[taille] = variantes
+    return resultat
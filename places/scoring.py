@@ -0,0 +1,161 @@
+"""Points des utilisateurs : registre MouvementPoints et score en cache UserProfile.score_total
+
+Chaque attribution inscrit une ligne au registre puis ajoute ses points au profil par un
+UPDATE atomique (score_total = score_total + n ... RETURNING) : pas de lecture-modification-
+écriture du profil, donc aucun incrément perdu sous charge, et date_modification n'est pas
+touchée. L'unicité (motif, source) du registre rend l'attribution idempotente.
+
+Le registre fait foi : reconcilier() (commande reconcile_scores) ramène chaque score en
+cache à la somme de ses mouvements. Après un incident ou un changement de barème,
+recalculer_scores() (commande recompute_scores) repart des voyages, activités et notes.
+"""
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import Activite, EffectifScore, MouvementPoints, NoteActivite, UserProfile, Voyage
+
+BAREME = {
+    MouvementPoints.CREATION_VOYAGE: 3,
+    MouvementPoints.CREATION_ACTIVITE: 2,
+    MouvementPoints.NOTATION_ACTIVITE: 1,
+}
+
+# Objets qui rapportent les points de chaque motif : (modèle, champ de l'utilisateur)
+SOURCES = {
+    MouvementPoints.CREATION_VOYAGE: (Voyage, 'utilisateur'),
+    MouvementPoints.CREATION_ACTIVITE: (Activite, 'cree_par'),
+    MouvementPoints.NOTATION_ACTIVITE: (NoteActivite, 'utilisateur'),
+}
+
+
+def attribuer_points(utilisateur_id, motif, source=None, points=None):
+    """Inscrit un mouvement au registre et l'ajoute au score du profil ; retourne le nouveau score
+
+    Retourne None si la source a déjà rapporté des points pour ce motif, ou si l'utilisateur
+    n'a pas de profil (le mouvement reste inscrit, la réconciliation le reportera).
+    """
+    points = BAREME[motif] if points is None else points
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                MouvementPoints.objects.create(
+                    utilisateur_id=utilisateur_id, points=points, motif=motif,
+                    type_source=source._meta.label_lower if source is not None else '',
+                    source_id=str(source.pk) if source is not None else '',
+                )
+        except IntegrityError:
+            return None
+        table = connection.ops.quote_name(UserProfile._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {table} SET score_total = score_total + %s WHERE utilisateur_id = %s RETURNING score_total",
+                [points, utilisateur_id],
+            )
+            ligne = cursor.fetchone()
+        if ligne is None:
+            return None
+        score = ligne[0]
+        # L'UPDATE direct ne passe pas par les signaux : reporter le changement sur le cache de rang
+        EffectifScore.deplacer([(score - points, score)])
+    return score
+
+
+def reconcilier(taille_lot=1000, appliquer=True):
+    """Ramène les scores en cache à la somme du registre, par lots de profils verrouillés
+
+    Retourne la liste des écarts (utilisateur_id, score en cache, somme du registre) ;
+    avec appliquer=False, les scores ne sont pas modifiés.
+    """
+    ecarts = []
+    dernier = 0
+    while True:
+        with transaction.atomic():
+            # Verrouiller les profils du lot avant de sommer : une attribution concurrente
+            # attend la fin du lot, ou l'a précédé et son mouvement est visible
+            profils = list(
+                UserProfile.objects.select_for_update().filter(pk__gt=dernier).order_by('pk')
+                .values_list('pk', 'utilisateur_id', 'score_total')[:taille_lot]
+            )
+            if not profils:
+                break
+            dernier = profils[-1][0]
+            sommes = dict(
+                MouvementPoints.objects.filter(utilisateur_id__in=[utilisateur_id for _, utilisateur_id, _ in profils])
+                .order_by().values('utilisateur_id').annotate(somme=Sum('points')).values_list('utilisateur_id', 'somme')
+            )
+            changements = []
+            for profil_id, utilisateur_id, score in profils:
+                attendu = max(sommes.get(utilisateur_id, 0), 0)
+                if attendu == score:
+                    continue
+                ecarts.append((utilisateur_id, score, attendu))
+                if appliquer:
+                    UserProfile.objects.filter(pk=profil_id).update(score_total=attendu)
+                    changements.append((score, attendu))
+            EffectifScore.deplacer(changements)
+    return ecarts
+
+
+def _par_utilisateur(queryset, champ, agregat):
+    """Sous-requête corrélée : agrégat des lignes rattachées à l'utilisateur du profil, 0 sans ligne"""
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{champ: OuterRef('utilisateur_id')}).order_by()
+            .values(champ).annotate(valeur=agregat).values('valeur')
+        ),
+        0,
+    )
+
+
+def recalculer_scores(taille_lot=1000, appliquer=True, utilisateurs=None):
+    """Recalcule les scores depuis les voyages, activités créées et notes selon le BAREME courant
+
+    Parcourt les profils (ou ceux des utilisateurs donnés) par lots verrouillés, en mémoire
+    constante : une requête d'agrégats par lot compte les sources de chaque profil et somme
+    son registre. Un registre divergent est soldé par un mouvement 'correction', puis les
+    scores en cache sont réécrits par bulk_update. Produit les écarts de chaque lot
+    [(utilisateur_id, score en cache, somme du registre, score recalculé)] ; avec
+    appliquer=False, rien n'est modifié.
+    """
+    profils = UserProfile.objects.order_by('pk')
+    if utilisateurs is not None:
+        profils = profils.filter(utilisateur_id__in=utilisateurs)
+    score_recalcule = sum(
+        (BAREME[motif] * _par_utilisateur(modele.objects.all(), champ, Count('pk'))
+         for motif, (modele, champ) in SOURCES.items()),
+        Value(0),
+    )
+    somme_registre = _par_utilisateur(MouvementPoints.objects.all(), 'utilisateur', Sum('points'))
+
+    dernier = 0
+    while True:
+        with transaction.atomic():
+            # Verrouiller avant d'agréger, comme reconcilier()
+            ids = list(profils.select_for_update().filter(pk__gt=dernier).values_list('pk', flat=True)[:taille_lot])
+            if not ids:
+                break
+            dernier = ids[-1]
+            lot = UserProfile.objects.filter(pk__in=ids).only('pk', 'utilisateur_id', 'score_total').annotate(
+                score_recalcule=score_recalcule, somme_registre=somme_registre,
+            )
+            ecarts, corrections, modifies, changements = [], [], [], []
+            for profil in lot:
+                attendu = profil.score_recalcule
+                if profil.somme_registre == attendu and profil.score_total == attendu:
+                    continue
+                ecarts.append((profil.utilisateur_id, profil.score_total, profil.somme_registre, attendu))
+                if profil.somme_registre != attendu:
+                    corrections.append(MouvementPoints(
+                        utilisateur_id=profil.utilisateur_id, points=attendu - profil.somme_registre,
+                        motif=MouvementPoints.CORRECTION,
+                    ))
+                if profil.score_total != attendu:
+                    changements.append((profil.score_total, attendu))
+                    profil.score_total = attendu
+                    modifies.append(profil)
+            if appliquer:
+                MouvementPoints.objects.bulk_create(corrections)
+                UserProfile.objects.bulk_update(modifies, ['score_total'])
+                EffectifScore.deplacer(changements)
+        yield ecarts
@@ -0,0 +1,107 @@
+"""Recherche de lieux et de pays sur une clé normalisée (sans accents, en minuscules)
+
+Les noms sont repliés par normaliser() dans les colonnes nom_normalise, indexées en
+trigrammes (pg_trgm) pour les recherches par sous-chaîne et approchées, et en B-tree
+pour les préfixes. Le classement place les préfixes devant les débuts de mot, puis
+les sous-chaînes et les correspondances approchées ; la popularité départage.
+"""
+import re
+import unicodedata
+
+# Lettres que la décomposition Unicode ne sépare pas de leur diacritique
+_LIGATURES = str.maketrans({'œ': 'oe', 'æ': 'ae', 'ø': 'o', 'đ': 'd', 'ł': 'l', 'ı': 'i'})
+_SEPARATEURS = re.compile(r'[\W_]+')
+
+# Bonus de pertinence par type de correspondance ; la similarité trigramme (0 à 1) s'y ajoute
+PERTINENCE_PREFIXE = 3.0
+PERTINENCE_MOT = 2.0
+PERTINENCE_SOUS_CHAINE = 1.0
+# Poids de ln(1 + nombre de voyages) : départage des résultats d'un même niveau
+POIDS_POPULARITE = 0.1
+# En dessous de cette longueur, les trigrammes ne filtrent rien : préfixes et débuts de mot seulement
+LONGUEUR_MIN_TRIGRAMMES = 3
+
+
+def normaliser(texte):
+    """Clé de recherche : minuscules sans accents, mots séparés par une seule espace"""
+    texte = unicodedata.normalize('NFKD', (texte or '').casefold().translate(_LIGATURES))
+    texte = ''.join(caractere for caractere in texte if not unicodedata.combining(caractere))
+    return _SEPARATEURS.sub(' ', texte).strip()
+
+
+def _filtre_et_pertinence(texte, champ='nom_normalise'):
+    """Filtre des noms correspondants et expression de pertinence associée"""
+    from django.contrib.postgres.search import TrigramWordSimilarity
+    from django.db.models import Case, FloatField, Q, Value, When
+
+    filtre = Q(**{f'{champ}__startswith': texte}) | Q(**{f'{champ}__contains': f' {texte}'})
+    pertinence = Case(
+        When(**{f'{champ}__startswith': texte}, then=Value(PERTINENCE_PREFIXE)),
+        When(**{f'{champ}__contains': f' {texte}'}, then=Value(PERTINENCE_MOT)),
+        When(**{f'{champ}__contains': texte}, then=Value(PERTINENCE_SOUS_CHAINE)),
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+    if len(texte) >= LONGUEUR_MIN_TRIGRAMMES:
+        approchee = Q(**{f'{champ}__trigram_word_similar': texte})
+        filtre |= Q(**{f'{champ}__contains': texte}) | approchee
+        # Sous le seuil de pg_trgm, la similarité n'est que du bruit : elle ne compte que pour les correspondances approchées
+        pertinence = pertinence + Case(
+            When(approchee, then=TrigramWordSimilarity(texte, champ)),
+            default=Value(0.0),
+            output_field=FloatField(),
+        )
+    return filtre, pertinence
+
+
+def rechercher_pays(requete, queryset=None):
+    """Pays correspondant à la requête, annotés par `pertinence` (tri à appliquer par l'appelant)"""
+    from .models import Pays
+
+    queryset = Pays.objects.all() if queryset is None else queryset
+    texte = normaliser(requete)
+    if not texte:
+        return queryset.none()
+    filtre, pertinence = _filtre_et_pertinence(texte)
+    return queryset.filter(filtre).annotate(pertinence=pertinence)
+
+
+def rechercher_lieux(requete, queryset=None):
+    """Lieux dont le nom ou le pays correspond à la requête, annotés par `pertinence`
+
+    Un lieu trouvé par le seul nom de son pays vaut une correspondance de sous-chaîne ;
+    le nombre de voyages départage les lieux d'un même niveau.
+    """
+    from django.db.models import Case, F, FloatField, Q, Value, When
+    from django.db.models.functions import Ln
+    from .models import Lieu
+
+    queryset = Lieu.objects.all() if queryset is None else queryset
+    texte = normaliser(requete)
+    if not texte:
+        return queryset.none()
+    filtre, pertinence = _filtre_et_pertinence(texte)
+    # Les pays sont peu nombreux : leurs clés sont résolues à part pour garder l'index sur pays_id
+    pays_ids = list(rechercher_pays(requete).values_list('pk', flat=True))
+    if pays_ids:
+        filtre |= Q(pays_id__in=pays_ids)
+        pertinence = pertinence + Case(
+            When(pays_id__in=pays_ids, then=Value(PERTINENCE_SOUS_CHAINE)),
+            default=Value(0.0),
+            output_field=FloatField(),
+        )
+    pertinence = pertinence + POIDS_POPULARITE * Ln(F('nombre_voyages') + 1)
+    return queryset.filter(filtre).annotate(pertinence=pertinence)
+
+
+def rechercher_villes(requete, queryset=None):
+    """Villes du gazetteer correspondant à la requête, annotées par `pertinence` ;
+    la population départage les villes d'un même niveau (tri à appliquer par l'appelant)"""
+    from .models import VilleGazetteer
+
+    queryset = VilleGazetteer.objects.all() if queryset is None else queryset
+    texte = normaliser(requete)
+    if not texte:
+        return queryset.none()
+    filtre, pertinence = _filtre_et_pertinence(texte)
+    return queryset.filter(filtre).annotate(pertinence=pertinence)
@@ -1,7 +1,17 @@
+import re
+
 from rest_framework import serializers
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.contrib.auth.password_validation import validate_password
-from .models import Pays, Lieu, Voyage, Favori, MediaVoyage, Activite, NoteActivite, MediaActivite, UserProfile
+from django.db.models import Prefetch
+from django.utils import timezone
+from .contexte import ContexteVisiteur
+from .pays_reference import nom_pays
+from . import ingestion, renditions, televersements
+from .scoring import attribuer_points
+from .tendances import FENETRE_DEFAUT, FENETRES, TOUT
+from .models import Pays, Lieu, VilleGazetteer, Voyage, Favori, MediaVoyage, Activite, NoteActivite, MediaActivite, UserProfile, ResumeNotesActivite, EffectifScore, MouvementPoints, TeleversementMedia
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -38,6 +48,23 @@ class UserProfileSerializer(serializers.ModelSerializer):
         data['date_joined'] = instance.utilisateur.date_joined
         return data
 
+class ClassementSerializer(serializers.ModelSerializer):
+    """Ligne du classement des utilisateurs ; les rangs sont fournis par la vue (contexte `rangs`)"""
+    user_id = serializers.IntegerField(source='utilisateur_id', read_only=True)
+    username = serializers.CharField(source='utilisateur.username', read_only=True)
+    profile_image_url = serializers.SerializerMethodField()
+    rang = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = UserProfile
+        fields = ('rang', 'user_id', 'username', 'profile_image_url', 'score_total')
+    
+    def get_profile_image_url(self, obj):
+        return obj.get_profile_image_url()
+    
+    def get_rang(self, obj):
+        return self.context['rangs'][obj.score_total]
+
 class UserPublicProfileSerializer(serializers.ModelSerializer):
     """Serializer pour le profil public des autres utilisateurs"""
     username = serializers.CharField(source='utilisateur.username', read_only=True)
@@ -50,12 +77,13 @@ class UserPublicProfileSerializer(serializers.ModelSerializer):
     nombre_voyages = serializers.SerializerMethodField()
     nombre_activites_creees = serializers.SerializerMethodField()
     pays_visites = serializers.SerializerMethodField()
+    rang = serializers.SerializerMethodField()
     
     class Meta:
         model = UserProfile
         fields = (
             'id', 'username', 'first_name', 'last_name', 'bio', 
-            'profile_image_url', 'date_joined', 'score_total',
+            'profile_image_url', 'date_joined', 'score_total', 'rang',
             'nombre_voyages', 'nombre_activites_creees', 'pays_visites'
         )
         read_only_fields = ('id', 'username', 'first_name', 'last_name', 'date_joined', 'score_total')
@@ -64,6 +92,10 @@ class UserPublicProfileSerializer(serializers.ModelSerializer):
         """Retourne l'URL de l'image de profil"""
         return obj.get_profile_image_url()
     
+    def get_rang(self, obj):
+        """Rang de l'utilisateur au classement, lu dans le cache de rang"""
+        return EffectifScore.rang(obj.score_total)
+    
     def get_nombre_voyages(self, obj):
         """Retourne le nombre total de voyages de l'utilisateur"""
         return obj.utilisateur.voyages.count()
@@ -140,47 +172,108 @@ class LieuSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Lieu
-        fields = ('id', 'nom_ville', 'pays', 'pays_code', 'geoname_id', 'latitude', 'longitude', 'date_creation', 'note_moyenne')
-        read_only_fields = ('id', 'date_creation')
+        fields = ('id', 'nom_ville', 'pays', 'pays_code', 'geoname_id', 'latitude', 'longitude', 'date_creation',
+                  'note_moyenne', 'nombre_notes', 'nombre_voyages', 'date_derniere_visite')
+        read_only_fields = ('id', 'date_creation', 'nombre_notes', 'nombre_voyages', 'date_derniere_visite')
     
     def get_note_moyenne(self, obj):
-        """Calcule la note moyenne du lieu"""
+        """Retourne la note moyenne du lieu (agrégats stockés, sans requête)"""
         return obj.get_note_moyenne()
     
     def create(self, validated_data):
-        """Crée un lieu en utilisant le code pays, et crée le pays s'il n'existe pas"""
+        """Crée un lieu en utilisant le code pays, et crée le pays s'il n'existe pas
+        
+        Sans geoname_id fourni, la ville est recherchée dans le gazetteer local (même nom,
+        même pays, la plus proche des coordonnées).
+        """
         pays_code = validated_data.pop('pays_code')
         
-        # Essayer de récupérer le pays existant, sinon le créer
-        try:
-            pays = Pays.objects.get(code_iso=pays_code)
-        except Pays.DoesNotExist:
-            # Créer le pays avec un nom par défaut (sera mis à jour plus tard si nécessaire)
-            pays = Pays.objects.create(
-                code_iso=pays_code,
-                nom=f"Pays {pays_code}"  # Nom temporaire
-            )
+        # Récupérer le pays existant, sinon le créer
+        pays, cree = Pays.depuis_code(pays_code)
+        if cree:
             print(f"Pays créé automatiquement: {pays_code}")
         
+        if validated_data.get('geoname_id') is None:
+            ville = VilleGazetteer.resoudre(
+                validated_data['nom_ville'], pays_code, validated_data.get('latitude'), validated_data.get('longitude')
+            )
+            if ville is not None and not Lieu.objects.filter(geoname_id=ville.geoname_id).exists():
+                validated_data['geoname_id'] = ville.geoname_id
+        
         validated_data['pays'] = pays
         return super().create(validated_data)
 
 class LieuListSerializer(serializers.ModelSerializer):
     """Serializer simplifié pour la liste des lieux"""
     pays = PaysSerializer(read_only=True)
+    note_moyenne = serializers.SerializerMethodField()
     
     class Meta:
         model = Lieu
-        fields = ('id', 'nom_ville', 'pays', 'latitude', 'longitude')
+        fields = ('id', 'nom_ville', 'pays', 'latitude', 'longitude', 'note_moyenne', 'nombre_voyages')
+    
+    def get_note_moyenne(self, obj):
+        """Retourne la note moyenne du lieu (agrégats stockés, sans requête)"""
+        return obj.get_note_moyenne()
+
+class LieuTendanceSerializer(LieuListSerializer):
+    """Lieu tendance avec son score courant (places/tendances.py)"""
+    score = serializers.FloatField(source='score_tendance', read_only=True)
+    
+    class Meta(LieuListSerializer.Meta):
+        fields = LieuListSerializer.Meta.fields + ('score',)
+
+class TrendingSerializer(serializers.Serializer):
+    """Paramètres du classement des lieux tendance"""
+    window = serializers.ChoiceField(choices=[*FENETRES, TOUT], default=FENETRE_DEFAUT)
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=10)
+
+class BboxSerializer(serializers.Serializer):
+    """Paramètres d'une fenêtre de carte (l'ouest peut être à l'est de l'est si la fenêtre traverse l'antiméridien)"""
+    south = serializers.FloatField(min_value=-90, max_value=90)
+    west = serializers.FloatField(min_value=-540, max_value=540)
+    north = serializers.FloatField(min_value=-90, max_value=90)
+    east = serializers.FloatField(min_value=-540, max_value=540)
+    limit = serializers.IntegerField(min_value=1, max_value=5000, default=1000)
+    
+    def validate(self, attrs):
+        if attrs['south'] > attrs['north']:
+            raise serializers.ValidationError("south doit être inférieur ou égal à north")
+        return attrs
+
+class ClustersSerializer(BboxSerializer):
+    """Paramètres de la carte regroupée : zoom de la carte et fenêtre visible"""
+    zoom = serializers.IntegerField(min_value=0, max_value=22)
+
+class NearbySerializer(serializers.Serializer):
+    """Paramètres de la recherche des lieux les plus proches d'un point"""
+    lat = serializers.FloatField(min_value=-90, max_value=90)
+    lon = serializers.FloatField(min_value=-180, max_value=180)
+    k = serializers.IntegerField(min_value=1, max_value=100, default=10)
+    radius_km = serializers.FloatField(min_value=0.001, max_value=20016, default=100)
+
+class GeocodeSerializer(serializers.Serializer):
+    """Paramètres du géocodage d'un nom de ville sur le gazetteer local"""
+    q = serializers.CharField(max_length=200)
+    pays = serializers.CharField(min_length=2, max_length=2, required=False)
+    limit = serializers.IntegerField(min_value=1, max_value=50, default=10)
+
+class ReverseGeocodeSerializer(serializers.Serializer):
+    """Paramètres du géocodage inverse d'un point"""
+    lat = serializers.FloatField(min_value=-90, max_value=90)
+    lon = serializers.FloatField(min_value=-180, max_value=180)
+    radius_km = serializers.FloatField(min_value=0.001, max_value=20016, default=200)
 
 class MediaVoyageSerializer(serializers.ModelSerializer):
     """Serializer pour les médias de voyage"""
     fichier_url = serializers.SerializerMethodField()
+    renditions_urls = serializers.SerializerMethodField()
     
     class Meta:
         model = MediaVoyage
-        fields = ('id', 'fichier', 'fichier_url', 'type_media', 'titre', 'description', 'ordre')
-        read_only_fields = ('id', 'fichier_url')
+        fields = ('id', 'fichier', 'fichier_url', 'type_media', 'titre', 'description', 'ordre',
+                 'largeur', 'hauteur', 'taille_octets', 'etat_renditions', 'renditions_urls')
+        read_only_fields = ('id', 'fichier_url', 'largeur', 'hauteur', 'taille_octets', 'etat_renditions', 'renditions_urls')
     
     def get_fichier_url(self, obj):
         """Retourne l'URL du fichier"""
@@ -189,15 +282,22 @@ class MediaVoyageSerializer(serializers.ModelSerializer):
             if request:
                 return request.build_absolute_uri(obj.fichier.url)
         return None
+    
+    def get_renditions_urls(self, obj):
+        """URLs des déclinaisons par taille (thumb, card, full) et par format (webp, jpeg), vide tant qu'elles ne sont pas prêtes"""
+        request = self.context.get('request')
+        return renditions.urls(obj, request.build_absolute_uri if request else None)
 
 class MediaActiviteSerializer(serializers.ModelSerializer):
     """Serializer pour les médias d'activités"""
     fichier_url = serializers.SerializerMethodField()
+    renditions_urls = serializers.SerializerMethodField()
     
     class Meta:
         model = MediaActivite
-        fields = ('id', 'fichier', 'fichier_url', 'type_media', 'titre', 'description', 'ordre')
-        read_only_fields = ('id', 'fichier_url')
+        fields = ('id', 'fichier', 'fichier_url', 'type_media', 'titre', 'description', 'ordre',
+                 'largeur', 'hauteur', 'taille_octets', 'etat_renditions', 'renditions_urls')
+        read_only_fields = ('id', 'fichier_url', 'largeur', 'hauteur', 'taille_octets', 'etat_renditions', 'renditions_urls')
     
     def get_fichier_url(self, obj):
         """Retourne l'URL du fichier"""
@@ -206,6 +306,73 @@ class MediaActiviteSerializer(serializers.ModelSerializer):
             if request:
                 return request.build_absolute_uri(obj.fichier.url)
         return None
+    
+    def get_renditions_urls(self, obj):
+        """URLs des déclinaisons par taille (thumb, card, full) et par format (webp, jpeg), vide tant qu'elles ne sont pas prêtes"""
+        request = self.context.get('request')
+        return renditions.urls(obj, request.build_absolute_uri if request else None)
+
+class TeleversementSerializer(serializers.ModelSerializer):
+    """Session de téléversement par morceaux : annonce du fichier, puis état pour la reprise"""
+    nombre_morceaux = serializers.IntegerField(read_only=True)
+    morceaux_recus = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = TeleversementMedia
+        fields = ('id', 'nom_fichier', 'type_mime', 'taille', 'sha256', 'taille_morceau', 'nombre_morceaux',
+                  'morceaux_recus', 'etat', 'date_expiration')
+        read_only_fields = ('id', 'taille_morceau', 'etat', 'date_expiration')
+    
+    def get_morceaux_recus(self, obj):
+        """Index des morceaux déjà reçus, à ne pas renvoyer après une coupure"""
+        return sorted(obj.morceaux.values_list('index', flat=True))
+    
+    def validate_sha256(self, value):
+        value = value.lower()
+        if value and not re.fullmatch(r'[0-9a-f]{64}', value):
+            raise serializers.ValidationError("Empreinte SHA-256 hexadécimale attendue")
+        return value
+    
+    def validate(self, attrs):
+        if televersements.type_media(attrs['type_mime']) is None:
+            raise serializers.ValidationError(f"Type de fichier {attrs['type_mime']} non supporté")
+        if attrs['taille'] < 1:
+            raise serializers.ValidationError("Le fichier est vide")
+        taille_max = televersements.taille_max(attrs['type_mime'])
+        if attrs['taille'] > taille_max:
+            raise serializers.ValidationError(f"Le fichier {attrs['nom_fichier']} dépasse {taille_max // (1024 * 1024)}MB")
+        return attrs
+    
+    def create(self, validated_data):
+        validated_data['utilisateur'] = self.context['request'].user
+        validated_data['taille_morceau'] = settings.TELEVERSEMENT_TAILLE_MORCEAU
+        validated_data['date_expiration'] = timezone.now() + settings.TELEVERSEMENT_DUREE
+        televersement = super().create(validated_data)
+        televersements.creer_fichier(televersement)
+        return televersement
+
+class FinalisationTeleversementSerializer(serializers.Serializer):
+    """Rattachement d'un téléversement complet à un voyage ou à une activité de l'utilisateur"""
+    voyage_id = serializers.UUIDField(required=False)
+    activite_id = serializers.UUIDField(required=False)
+    titre = serializers.CharField(max_length=200, required=False, allow_blank=True, default='')
+    description = serializers.CharField(required=False, allow_blank=True, default='')
+    ordre = serializers.IntegerField(min_value=0, required=False, default=0)
+    
+    def validate(self, attrs):
+        user = self.context['request'].user
+        voyage_id, activite_id = attrs.pop('voyage_id', None), attrs.pop('activite_id', None)
+        if (voyage_id is None) == (activite_id is None):
+            raise serializers.ValidationError("Indiquer voyage_id ou activite_id")
+        if voyage_id is not None:
+            attrs['voyage'] = Voyage.objects.filter(id=voyage_id, utilisateur=user).first()
+            if attrs['voyage'] is None:
+                raise serializers.ValidationError({'voyage_id': "Ce voyage n'existe pas"})
+        else:
+            attrs['activite'] = Activite.objects.filter(id=activite_id, cree_par=user).first()
+            if attrs['activite'] is None:
+                raise serializers.ValidationError({'activite_id': "Cette activité n'existe pas"})
+        return attrs
 
 class VoyageSerializer(serializers.ModelSerializer):
     """Serializer pour le modèle Voyage avec lieu et utilisateur imbriqués"""
@@ -229,7 +396,9 @@ class VoyageSerializer(serializers.ModelSerializer):
         
         validated_data['lieu'] = lieu
         validated_data['utilisateur'] = self.context['request'].user
-        return super().create(validated_data)
+        voyage = super().create(validated_data)
+        ContexteVisiteur.pour_requete(self.context['request']).marquer_visite(voyage.lieu_id)
+        return voyage
 
 class VoyageCreateSerializer(serializers.ModelSerializer):
     """Serializer pour la création de voyage (plus simple)"""
@@ -271,10 +440,7 @@ class VoyageCreateWithMediaSerializer(serializers.ModelSerializer):
     def validate_medias(self, value):
         """Valide les fichiers médias"""
         if value:
-            print(f"🔍 DEBUG: Validation de {len(value)} médias")
-            for i, media in enumerate(value):
-                print(f"🔍 DEBUG: Média {i+1}: {media.name} - {media.content_type} - {media.size} bytes")
-                
+            for media in value:
                 # Vérifier la taille du fichier (max 10MB)
                 if media.size > 10 * 1024 * 1024:
                     raise serializers.ValidationError(f"Le fichier {media.name} dépasse 10MB")
@@ -293,69 +459,21 @@ class VoyageCreateWithMediaSerializer(serializers.ModelSerializer):
         medias = validated_data.pop('medias', [])
         lieu_id = validated_data.pop('lieu_id')
         
-        print(f"🔍 DEBUG: Création voyage avec {len(medias)} médias")
-        print(f"🔍 DEBUG: Données voyage: {validated_data}")
-        
         try:
             lieu = Lieu.objects.get(id=lieu_id)
-            print(f"🔍 DEBUG: Lieu trouvé: {lieu.nom_ville}, {lieu.pays.nom}")
         except Lieu.DoesNotExist:
             raise serializers.ValidationError(f"Lieu avec l'ID {lieu_id} n'existe pas")
         
         validated_data['lieu'] = lieu
         validated_data['utilisateur'] = self.context['request'].user
         
-        # Créer le voyage
-        voyage = super().create(validated_data)
-        print(f"✅ DEBUG: Voyage créé avec ID: {voyage.id}")
-        
-        # Créer les médias associés
-        if medias:
-            print(f"🔍 DEBUG: Création de {len(medias)} médias...")
-            for i, media_file in enumerate(medias):
-                print(f"🔍 DEBUG: Traitement média {i+1}: {media_file.name} ({media_file.content_type})")
-                
-                # Déterminer le type de média
-                if media_file.content_type.startswith('image/'):
-                    media_type = 'image'
-                elif media_file.content_type.startswith('video/'):
-                    media_type = 'video'
-                else:
-                    print(f"⚠️  Type de média non reconnu: {media_file.content_type}")
-                    continue
-                
-                try:
-                    # Créer le média avec plus de détails
-                    media_obj = MediaVoyage.objects.create(
-                        voyage=voyage,
-                        fichier=media_file,
-                        type_media=media_type,
-                        titre=f"Média {i+1}",
-                        description=f"Fichier {media_file.name}",
-                        ordre=i
-                    )
-                    print(f"✅ Média créé: {media_obj.id} - {media_obj.fichier.name} - Type: {media_obj.type_media}")
-                    print(f"✅ Chemin fichier: {media_obj.fichier.path}")
-                    print(f"✅ URL fichier: {media_obj.fichier.url}")
-                except Exception as e:
-                    print(f"❌ Erreur création média: {e}")
-                    print(f"❌ Type d'erreur: {type(e).__name__}")
-                    import traceback
-                    traceback.print_exc()
-        else:
-            print("ℹ️  Aucun média à traiter")
-        
-        # 🎯 SYSTÈME DE SCORE : +3 points pour création de voyage
-        try:
-            user = self.context['request'].user
-            if hasattr(user, 'profile'):
-                user.profile.score_total += 3
-                user.profile.save()
-                print(f"🎯 Score +3 points ajouté pour {user.username} (création voyage). Nouveau score: {user.profile.score_total}")
-            else:
-                print(f"⚠️  Profil utilisateur non trouvé pour {user.username}")
-        except Exception as e:
-            print(f"❌ Erreur lors de l'ajout des points: {e}")
+        # Fichiers écrits en parallèle, puis voyage et médias créés dans une seule transaction
+        with ingestion.medias_joints(MediaVoyage, medias) as joindre:
+            voyage = super().create(validated_data)
+            joindre(voyage=voyage)
+            # 🎯 SYSTÈME DE SCORE : +3 points pour création de voyage (registre des points)
+            attribuer_points(voyage.utilisateur_id, MouvementPoints.CREATION_VOYAGE, voyage)
+        ContexteVisiteur.pour_requete(self.context['request']).marquer_visite(voyage.lieu_id)
         
         return voyage
 
@@ -394,6 +512,20 @@ class FavoriCreateSerializer(serializers.Serializer):
             raise serializers.ValidationError("Ce lieu n'existe pas")
         return value
 
+# Résumé des notes d'activités (lu depuis ResumeNotesActivite, sans agrégat par ligne)
+
+def get_histogramme_notes(activite):
+    """Retourne la répartition des notes 1 à 5 étoiles d'une activité"""
+    resume = activite.get_resume_notes()
+    if resume is None:
+        return {str(etoiles): 0 for etoiles in range(1, 6)}
+    return resume.get_histogramme()
+
+def get_score_bayesien(activite):
+    """Retourne le score bayésien d'une activité (moyenne a priori si elle n'a aucune note)"""
+    resume = activite.get_resume_notes()
+    return resume.score_bayesien if resume else ResumeNotesActivite.PRIOR_MOYENNE
+
 # Serializers pour les statistiques utilisateur
 
 class UserStatsSerializer(serializers.Serializer):
@@ -401,6 +533,7 @@ class UserStatsSerializer(serializers.Serializer):
     lieux_visites = serializers.SerializerMethodField()
     pays_visites = serializers.SerializerMethodField()
     score_total = serializers.SerializerMethodField()
+    rang = serializers.SerializerMethodField()
     nombre_voyages = serializers.SerializerMethodField()
     nombre_favoris = serializers.SerializerMethodField()
     
@@ -415,8 +548,14 @@ class UserStatsSerializer(serializers.Serializer):
         return PaysSerializer(pays, many=True).data
     
     def get_score_total(self, obj):
-        """Retourne le score total de l'utilisateur"""
-        return obj.get_score_total()
+        """Score du classement (profile.score_total), celui sur lequel porte le rang ; 0 sans profil"""
+        profile = getattr(obj, 'profile', None)
+        return profile.score_total if profile is not None else 0
+    
+    def get_rang(self, obj):
+        """Rang de l'utilisateur au classement des profils (score_total), None sans profil"""
+        profile = getattr(obj, 'profile', None)
+        return EffectifScore.rang(profile.score_total) if profile is not None else None
     
     def get_nombre_voyages(self, obj):
         """Retourne le nombre de voyages de l'utilisateur"""
@@ -434,6 +573,8 @@ class ActiviteSerializer(serializers.ModelSerializer):
     notes = serializers.SerializerMethodField()
     note_moyenne = serializers.SerializerMethodField()
     nombre_notes = serializers.SerializerMethodField()
+    histogramme_notes = serializers.SerializerMethodField()
+    score_bayesien = serializers.SerializerMethodField()
     can_rate = serializers.SerializerMethodField()
     medias = serializers.SerializerMethodField()
     prix_display = serializers.SerializerMethodField()
@@ -442,11 +583,13 @@ class ActiviteSerializer(serializers.ModelSerializer):
     class Meta:
         model = Activite
         fields = ('id', 'titre', 'description', 'lieu', 'lieu_id', 'cree_par', 
-                 'date_creation', 'notes', 'note_moyenne', 'nombre_notes', 'can_rate',
+                 'date_creation', 'notes', 'note_moyenne', 'nombre_notes', 'histogramme_notes',
+                 'score_bayesien', 'can_rate',
                  'prix_estime', 'prix_display', 'age_minimum', 'type_activite', 
                  'type_activite_display', 'adresse_precise', 'transport_public', 
                  'reservation_requise', 'medias')
-        read_only_fields = ('id', 'cree_par', 'date_creation', 'notes', 'note_moyenne', 'nombre_notes', 'medias')
+        read_only_fields = ('id', 'cree_par', 'date_creation', 'notes', 'note_moyenne', 'nombre_notes',
+                            'histogramme_notes', 'score_bayesien', 'medias')
     
     def get_note_moyenne(self, obj):
         return obj.get_note_moyenne()
@@ -454,6 +597,12 @@ class ActiviteSerializer(serializers.ModelSerializer):
     def get_nombre_notes(self, obj):
         return obj.get_nombre_notes()
     
+    def get_histogramme_notes(self, obj):
+        return get_histogramme_notes(obj)
+    
+    def get_score_bayesien(self, obj):
+        return get_score_bayesien(obj)
+    
     def get_notes(self, obj):
         """Retourne les notes de l'activité"""
         notes = obj.notes.all()[:5]  # Limiter à 5 notes pour éviter la surcharge
@@ -473,36 +622,13 @@ class ActiviteSerializer(serializers.ModelSerializer):
         return obj.get_type_activite_display()
     
     def get_can_rate(self, obj):
-        """Vérifie si l'utilisateur connecté peut noter cette activité"""
-        user = self.context['request'].user
-        
-        if not user.is_authenticated:
-            print(f"❌ can_rate: Utilisateur non authentifié")
-            return False
-        
-        # Vérifier si l'utilisateur est le créateur de l'activité
-        if user == obj.cree_par:
-            print(f"❌ can_rate: {user.username} est le créateur de l'activité")
-            return False
-        
-        # Vérifier si l'utilisateur a visité le lieu de l'activité
-        voyages_au_lieu = user.voyages.filter(lieu=obj.lieu)
-        if not voyages_au_lieu.exists():
-            print(f"❌ can_rate: {user.username} n'a pas visité {obj.lieu.nom_ville}")
-            return False
-        
-        # Vérifier si l'utilisateur a déjà noté cette activité
-        if obj.notes.filter(utilisateur=user).exists():
-            print(f"❌ can_rate: {user.username} a déjà noté cette activité")
-            return False
-        
-        print(f"✅ can_rate: {user.username} peut noter {obj.titre}")
-        return True
+        """Vérifie si l'utilisateur connecté peut noter cette activité (contexte visiteur, sans requête par ligne)"""
+        return ContexteVisiteur.pour_requete(self.context.get('request')).peut_noter(obj)
     
     def validate_lieu_id(self, value):
         """Valide que l'utilisateur a visité ce lieu"""
-        user = self.context['request'].user
-        if not user.voyages.filter(lieu_id=value).exists():
+        contexte = ContexteVisiteur.pour_requete(self.context['request'])
+        if not contexte.a_visite(value):
             raise serializers.ValidationError(
                 "Vous devez avoir visité ce lieu pour pouvoir y créer une activité"
             )
@@ -553,10 +679,7 @@ class ActiviteCreateWithMediaSerializer(serializers.ModelSerializer):
     def validate_medias(self, value):
         """Valide les fichiers médias"""
         if value:
-            print(f"🔍 DEBUG: Validation de {len(value)} médias")
-            for i, media in enumerate(value):
-                print(f"🔍 DEBUG: Média {i+1}: {media.name} - {media.content_type} - {media.size} bytes")
-                
+            for media in value:
                 # Vérifier la taille du fichier (max 10MB)
                 if media.size > 10 * 1024 * 1024:
                     raise serializers.ValidationError(f"Le fichier {media.name} dépasse 10MB")
@@ -575,69 +698,20 @@ class ActiviteCreateWithMediaSerializer(serializers.ModelSerializer):
         medias = validated_data.pop('medias', [])
         lieu_id = validated_data.pop('lieu_id')
         
-        print(f"🔍 DEBUG: Création activité avec {len(medias)} médias")
-        print(f"🔍 DEBUG: Données activité: {validated_data}")
-        
         try:
             lieu = Lieu.objects.get(id=lieu_id)
-            print(f"🔍 DEBUG: Lieu trouvé: {lieu.nom_ville}, {lieu.pays.nom}")
         except Lieu.DoesNotExist:
             raise serializers.ValidationError(f"Lieu avec l'ID {lieu_id} n'existe pas")
         
         validated_data['lieu'] = lieu
         validated_data['cree_par'] = self.context['request'].user
         
-        # Créer l'activité
-        activite = super().create(validated_data)
-        print(f"✅ DEBUG: Activité créée avec ID: {activite.id}")
-        
-        # Créer les médias associés
-        if medias:
-            print(f"🔍 DEBUG: Création de {len(medias)} médias...")
-            for i, media_file in enumerate(medias):
-                print(f"🔍 DEBUG: Traitement média {i+1}: {media_file.name} ({media_file.content_type})")
-                
-                # Déterminer le type de média
-                if media_file.content_type.startswith('image/'):
-                    media_type = 'image'
-                elif media_file.content_type.startswith('video/'):
-                    media_type = 'video'
-                else:
-                    print(f"⚠️  Type de média non reconnu: {media_file.content_type}")
-                    continue
-                
-                try:
-                    # Créer le média avec plus de détails
-                    media_obj = MediaActivite.objects.create(
-                        activite=activite,
-                        fichier=media_file,
-                        type_media=media_type,
-                        titre=f"Média {i+1}",
-                        description=f"Fichier {media_file.name}",
-                        ordre=i
-                    )
-                    print(f"✅ Média créé: {media_obj.id} - {media_obj.fichier.name} - Type: {media_obj.type_media}")
-                    print(f"✅ Chemin fichier: {media_obj.fichier.path}")
-                    print(f"✅ URL fichier: {media_obj.fichier.url}")
-                except Exception as e:
-                    print(f"❌ Erreur création média: {e}")
-                    print(f"❌ Type d'erreur: {type(e).__name__}")
-                    import traceback
-                    traceback.print_exc()
-        else:
-            print("ℹ️  Aucun média à traiter")
-        
-        # 🎯 SYSTÈME DE SCORE : +2 points pour création d'activité
-        try:
-            user = self.context['request'].user
-            if hasattr(user, 'profile'):
-                user.profile.score_total += 2
-                user.profile.save()
-                print(f"🎯 Score +2 points ajouté pour {user.username} (création activité). Nouveau score: {user.profile.score_total}")
-            else:
-                print(f"⚠️  Profil utilisateur non trouvé pour {user.username}")
-        except Exception as e:
-            print(f"❌ Erreur lors de l'ajout des points: {e}")
+        # Fichiers écrits en parallèle, puis activité et médias créés dans une seule transaction
+        with ingestion.medias_joints(MediaActivite, medias) as joindre:
+            activite = super().create(validated_data)
+            joindre(activite=activite)
+            # 🎯 SYSTÈME DE SCORE : +2 points pour création d'activité (registre des points)
+            attribuer_points(activite.cree_par_id, MouvementPoints.CREATION_ACTIVITE, activite)
         
         return activite
 
@@ -653,17 +727,17 @@ class NoteActiviteSerializer(serializers.ModelSerializer):
     
     def validate(self, attrs):
         """Validation personnalisée pour les notes d'activités"""
-        user = self.context['request'].user
+        contexte = ContexteVisiteur.pour_requete(self.context['request'])
         activite = attrs['activite']
         
         # Vérifier que l'utilisateur n'a pas déjà noté cette activité
-        if NoteActivite.objects.filter(utilisateur=user, activite=activite).exists():
+        if contexte.a_note(activite.pk):
             raise serializers.ValidationError(
                 "Vous avez déjà noté cette activité"
             )
         
         # Vérifier que l'utilisateur a visité le lieu de l'activité
-        if not user.voyages.filter(lieu=activite.lieu).exists():
+        if not contexte.a_visite(activite.lieu_id):
             raise serializers.ValidationError(
                 "Vous devez avoir visité ce lieu pour pouvoir noter ses activités"
             )
@@ -674,26 +748,24 @@ class NoteActiviteSerializer(serializers.ModelSerializer):
         """Crée une note en assignant l'utilisateur connecté"""
         validated_data['utilisateur'] = self.context['request'].user
         
-        # 🎯 SYSTÈME DE SCORE : +1 point pour notation d'activité
-        try:
-            user = self.context['request'].user
-            if hasattr(user, 'profile'):
-                user.profile.score_total += 1
-                user.profile.save()
-                print(f"🎯 Score +1 point ajouté pour {user.username} (notation activité). Nouveau score: {user.profile.score_total}")
-            else:
-                print(f"⚠️  Profil utilisateur non trouvé pour {user.username}")
-        except Exception as e:
-            print(f"❌ Erreur lors de l'ajout des points: {e}")
-        
-        return super().create(validated_data)
+        note = super().create(validated_data)
+        # 🎯 SYSTÈME DE SCORE : +1 point pour notation d'activité (registre des points)
+        attribuer_points(note.utilisateur_id, MouvementPoints.NOTATION_ACTIVITE, note)
+        ContexteVisiteur.pour_requete(self.context['request']).marquer_note(note.activite_id)
+        return note
 
 class ActiviteListSerializer(serializers.ModelSerializer):
     """Serializer simplifié pour la liste des activités"""
+    # Aperçus limités par activité (appliqués en base par setup_eager_loading)
+    NOMBRE_NOTES_APERCU = 10
+    NOMBRE_MEDIAS_APERCU = 5
+    
     lieu = LieuListSerializer(read_only=True)
     cree_par = UserSerializer(read_only=True)
     note_moyenne = serializers.SerializerMethodField()
     nombre_notes = serializers.SerializerMethodField()
+    histogramme_notes = serializers.SerializerMethodField()
+    score_bayesien = serializers.SerializerMethodField()
     can_rate = serializers.SerializerMethodField()
     notes = serializers.SerializerMethodField()
     medias = serializers.SerializerMethodField()
@@ -703,10 +775,12 @@ class ActiviteListSerializer(serializers.ModelSerializer):
     class Meta:
         model = Activite
         fields = ('id', 'titre', 'description', 'lieu', 'cree_par', 'date_creation', 
-                 'note_moyenne', 'nombre_notes', 'can_rate', 'notes', 'prix_estime', 
+                 'note_moyenne', 'nombre_notes', 'histogramme_notes', 'score_bayesien',
+                 'can_rate', 'notes', 'prix_estime', 
                  'prix_display', 'age_minimum', 'type_activite', 'type_activite_display', 
                  'adresse_precise', 'transport_public', 'reservation_requise', 'medias')
-        read_only_fields = ('id', 'cree_par', 'date_creation', 'note_moyenne', 'nombre_notes', 'can_rate', 'notes', 'medias')
+        read_only_fields = ('id', 'cree_par', 'date_creation', 'note_moyenne', 'nombre_notes',
+                            'histogramme_notes', 'score_bayesien', 'can_rate', 'notes', 'medias')
     
     def get_note_moyenne(self, obj):
         return obj.get_note_moyenne()
@@ -714,14 +788,44 @@ class ActiviteListSerializer(serializers.ModelSerializer):
     def get_nombre_notes(self, obj):
         return obj.get_nombre_notes()
     
+    def get_histogramme_notes(self, obj):
+        return get_histogramme_notes(obj)
+    
+    def get_score_bayesien(self, obj):
+        return get_score_bayesien(obj)
+    
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        """Plan de requêtes : jointures pour les relations simples, prefetch limité par activité pour notes et médias
+        
+        Les tranches des Prefetch sont appliquées en base par une fonction de fenêtrage (ROW_NUMBER par activité),
+        ce qui borne le nombre de requêtes quelle que soit la taille de la liste.
+        """
+        return queryset.select_related('lieu__pays', 'cree_par', 'resume_notes').prefetch_related(
+            Prefetch(
+                'notes',
+                queryset=NoteActivite.objects.select_related('utilisateur')[:cls.NOMBRE_NOTES_APERCU],
+                to_attr='notes_apercu',
+            ),
+            Prefetch(
+                'medias',
+                queryset=MediaActivite.objects.all()[:cls.NOMBRE_MEDIAS_APERCU],
+                to_attr='medias_apercu',
+            ),
+        )
+    
     def get_notes(self, obj):
         """Retourne les notes de l'activité"""
-        notes = obj.notes.all()[:10]  # Limiter à 10 notes pour éviter la surcharge
+        notes = getattr(obj, 'notes_apercu', None)
+        if notes is None:
+            notes = obj.notes.select_related('utilisateur')[:self.NOMBRE_NOTES_APERCU]
         return NoteActiviteSerializer(notes, many=True).data
     
     def get_medias(self, obj):
         """Retourne les médias de l'activité"""
-        medias = obj.medias.all()[:5]  # Limiter à 5 médias pour la liste
+        medias = getattr(obj, 'medias_apercu', None)
+        if medias is None:
+            medias = obj.medias.all()[:self.NOMBRE_MEDIAS_APERCU]
         return MediaActiviteSerializer(medias, many=True, context=self.context).data
     
     def get_prix_display(self, obj):
@@ -733,28 +837,75 @@ class ActiviteListSerializer(serializers.ModelSerializer):
         return obj.get_type_activite_display()
     
     def get_can_rate(self, obj):
-        """Vérifie si l'utilisateur connecté peut noter cette activité"""
-        user = self.context['request'].user
-        
-        if not user.is_authenticated:
-            print(f"❌ can_rate: Utilisateur non authentifié")
-            return False
-        
-        # Vérifier si l'utilisateur est le créateur de l'activité
-        if user == obj.cree_par:
-            print(f"❌ can_rate: {user.username} est le créateur de l'activité")
-            return False
-        
-        # Vérifier si l'utilisateur a visité le lieu de l'activité
-        voyages_au_lieu = user.voyages.filter(lieu=obj.lieu)
-        if not voyages_au_lieu.exists():
-            print(f"❌ can_rate: {user.username} n'a pas visité {obj.lieu.nom_ville}")
-            return False
-        
-        # Vérifier si l'utilisateur a déjà noté cette activité
-        if obj.notes.filter(utilisateur=user).exists():
-            print(f"❌ can_rate: {user.username} a déjà noté cette activité")
-            return False
-        
-        print(f"✅ can_rate: {user.username} peut noter {obj.titre}")
-        return True 
\ No newline at end of file
+        """Vérifie si l'utilisateur connecté peut noter cette activité (contexte visiteur, sans requête par ligne)"""
+        return ContexteVisiteur.pour_requete(self.context.get('request')).peut_noter(obj) 
+
+
+class ActiviteApercuSerializer(serializers.ModelSerializer):
+    """Serializer minimal d'une activité affichée sous un lieu"""
+    note_moyenne = serializers.SerializerMethodField()
+    nombre_notes = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = Activite
+        fields = ('id', 'titre', 'type_activite', 'note_moyenne', 'nombre_notes')
+    
+    def get_note_moyenne(self, obj):
+        return obj.get_note_moyenne()
+    
+    def get_nombre_notes(self, obj):
+        return obj.get_nombre_notes()
+
+class LieuProcheSerializer(LieuListSerializer):
+    """Lieu trouvé par la recherche de proximité, avec sa distance et un aperçu de ses activités"""
+    NOMBRE_ACTIVITES_APERCU = 5
+    
+    distance_km = serializers.SerializerMethodField()
+    activites = serializers.SerializerMethodField()
+    
+    class Meta(LieuListSerializer.Meta):
+        fields = LieuListSerializer.Meta.fields + ('distance_km', 'activites')
+    
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        """Pays joint, activités limitées par lieu en une requête (fenêtrage en base)"""
+        return queryset.select_related('pays').prefetch_related(
+            Prefetch(
+                'activites',
+                queryset=Activite.objects.select_related('resume_notes').order_by('-date_creation', 'id')[
+                    :cls.NOMBRE_ACTIVITES_APERCU
+                ],
+                to_attr='activites_apercu',
+            ),
+        )
+    
+    def get_distance_km(self, obj):
+        return round(obj.distance_km, 3)
+    
+    def get_activites(self, obj):
+        activites = getattr(obj, 'activites_apercu', None)
+        if activites is None:
+            activites = obj.activites.select_related('resume_notes').order_by('-date_creation', 'id')[
+                :self.NOMBRE_ACTIVITES_APERCU
+            ]
+        return ActiviteApercuSerializer(activites, many=True).data
+
+
+class VilleGazetteerSerializer(serializers.ModelSerializer):
+    """Résultat de géocodage : ville du gazetteer et lieu déjà créé pour elle, s'il existe
+
+    Le contexte `lieux_par_geoname` (geoname_id -> id du lieu) est résolu par la vue en une requête.
+    """
+    pays_nom = serializers.SerializerMethodField()
+    lieu_id = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = VilleGazetteer
+        fields = ('geoname_id', 'nom', 'latitude', 'longitude', 'code_pays', 'pays_nom', 'code_admin1',
+                  'population', 'fuseau_horaire', 'lieu_id')
+    
+    def get_pays_nom(self, obj):
+        return nom_pays(obj.code_pays)
+    
+    def get_lieu_id(self, obj):
+        return self.context.get('lieux_par_geoname', {}).get(obj.geoname_id)
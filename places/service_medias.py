@@ -0,0 +1,95 @@
+"""Service des fichiers des médias : requêtes partielles, validateurs de cache, redirection interne
+
+Les fichiers du stockage adressé par contenu (cas/, places/stockage.py) ne changent jamais :
+leur empreinte sert d'ETag et ils sont mis en cache sans limite (immutable). Les autres
+fichiers ont un ETag tiré de leur date et de leur taille, et une durée de cache courte.
+
+Seules les images et vidéos de TYPES_SERVIS sont servies sous leur type ; tout autre fichier
+part en téléchargement (application/octet-stream, attachment), et nosniff interdit au
+navigateur de deviner un autre type : un fichier HTML ou SVG n'est jamais interprété.
+
+Sans mandataire, le fichier est envoyé par FileResponse : le serveur WSGI l'expédie sans copie
+(wsgi.file_wrapper, os.sendfile sous gunicorn), y compris une plage qui va jusqu'à la fin
+du fichier, cas de la lecture d'une vidéo ; une plage bornée est lue par blocs. Avec
+MEDIAS_X_ACCEL_REDIRECT, la vue ne fait que vérifier le chemin et poser les en-têtes, et
+nginx sert le fichier depuis son emplacement interne.
+"""
+import posixpath
+import re
+
+from .stockage import DOSSIER_TEMPORAIRE, PREFIXE
+
+CACHE_IMMUABLE = 'public, max-age=31536000, immutable'
+# Type servi selon l'extension, pour les seuls formats d'images et de vidéos acceptés
+TYPES_SERVIS = {
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.gif': 'image/gif',
+    '.webp': 'image/webp',
+    '.mp4': 'video/mp4',
+    '.avi': 'video/x-msvideo',
+    '.mov': 'video/quicktime',
+    '.wmv': 'video/x-ms-wmv',
+    '.webm': 'video/webm',
+}
+TAILLE_BLOC = 64 * 1024
+
+_PLAGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def est_immuable(chemin):
+    return chemin.startswith(PREFIXE + '/') and not chemin.startswith(DOSSIER_TEMPORAIRE + '/')
+
+
+def type_servi(chemin):
+    """Type MIME d'un fichier servi tel quel, None s'il doit partir en téléchargement"""
+    return TYPES_SERVIS.get(posixpath.splitext(chemin)[1].lower())
+
+
+def etag(chemin, stat):
+    """ETag fort : l'empreinte du contenu pour cas/, sinon la date de modification et la taille"""
+    if est_immuable(chemin):
+        return '"%s"' % chemin.rsplit('/', 1)[-1].split('.', 1)[0]
+    return '"%x-%x"' % (stat.st_mtime_ns, stat.st_size)
+
+
+def plage_demandee(entete, taille):
+    """(début, fin incluse) d'un en-tête Range d'une seule plage, None pour tout le fichier
+
+    Lève ValueError pour une plage impossible à satisfaire (réponse 416). Les demandes de
+    plusieurs plages ou mal formées sont ignorées : le fichier entier est envoyé.
+    """
+    correspondance = _PLAGE.match((entete or '').replace(' ', ''))
+    if correspondance is None:
+        return None
+    debut, fin = correspondance.groups()
+    if not debut and not fin:
+        return None
+    if not debut:
+        # Suffixe : les n derniers octets
+        longueur = int(fin)
+        if longueur == 0:
+            raise ValueError
+        return max(taille - longueur, 0), taille - 1
+    debut = int(debut)
+    fin = min(int(fin), taille - 1) if fin else taille - 1
+    if debut >= taille:
+        raise ValueError
+    if fin < debut:
+        return None
+    return debut, fin
+
+
+def lire_plage(fichier, debut, longueur):
+    """Contenu d'une plage bornée, lu par blocs"""
+    try:
+        fichier.seek(debut)
+        while longueur > 0:
+            bloc = fichier.read(min(TAILLE_BLOC, longueur))
+            if not bloc:
+                break
+            longueur -= len(bloc)
+            yield bloc
+    finally:
+        fichier.close()
@@ -0,0 +1,252 @@
+"""Index spatial des lieux : cellules d'une grille hiérarchique en ordre de Morton (Z-order)
+
+La latitude et la longitude sont ramenées sur une grille de 2^NIVEAU_MAX x 2^NIVEAU_MAX
+cellules dont les bits sont entrelacés. Toutes les sous-cellules d'une cellule de niveau L
+forment alors une plage contiguë de codes : une fenêtre de carte se traduit en quelques
+plages BETWEEN sur une colonne indexée (Lieu.cellule_spatiale), sans extension SIG.
+"""
+import math
+
+NIVEAU_MAX = 24
+# Nombre maximal de cellules énumérées pour couvrir une fenêtre
+CELLULES_MAX_COUVERTURE = 32
+# Rayon moyen de la Terre (IUGG)
+RAYON_TERRE_KM = 6371.0088
+DEMI_CIRCONFERENCE_KM = math.pi * RAYON_TERRE_KM
+# Rayon de la première recherche des plus proches voisins
+RAYON_INITIAL_KM = 2.0
+# Grille de regroupement des marqueurs : au zoom z, 2^(z + BITS_CELLULE_TUILE) cellules Web Mercator
+# par axe (cellules de 64 px pour des tuiles de 256 px), précalculée jusqu'à NIVEAU_MAX_GROUPES
+NIVEAU_MAX_GROUPES = 15
+BITS_CELLULE_TUILE = 2
+LATITUDE_MAX_MERCATOR = 85.0511287798
+
+
+def _entrelacer(x, y):
+    """Entrelace les bits de x (rangs pairs) et de y (rangs impairs)"""
+    code = 0
+    for bit in range(NIVEAU_MAX):
+        code |= ((x >> bit) & 1) << (2 * bit)
+        code |= ((y >> bit) & 1) << (2 * bit + 1)
+    return code
+
+
+def _colonne(longitude, niveau=NIVEAU_MAX):
+    """Colonne de la grille de niveau donné (dérivée du niveau le plus fin pour rester cohérente avec les codes)"""
+    taille = 1 << NIVEAU_MAX
+    colonne = min(taille - 1, max(0, int((float(longitude) + 180.0) / 360.0 * taille)))
+    return colonne >> (NIVEAU_MAX - niveau)
+
+
+def _ligne(latitude, niveau=NIVEAU_MAX):
+    """Ligne de la grille de niveau donné"""
+    taille = 1 << NIVEAU_MAX
+    ligne = min(taille - 1, max(0, int((float(latitude) + 90.0) / 180.0 * taille)))
+    return ligne >> (NIVEAU_MAX - niveau)
+
+
+def code_cellule(latitude, longitude):
+    """Code de Morton de la cellule de niveau NIVEAU_MAX contenant le point"""
+    return _entrelacer(_colonne(longitude), _ligne(latitude))
+
+
+def normaliser_longitude(longitude):
+    """Ramène une longitude dans [-180, 180]"""
+    longitude = float(longitude)
+    if -180.0 <= longitude <= 180.0:
+        return longitude
+    return (longitude + 180.0) % 360.0 - 180.0
+
+
+def decouper_bbox(south, west, north, east):
+    """Découpe une fenêtre en fenêtres qui ne traversent pas l'antiméridien
+
+    Une fenêtre dont l'ouest est à l'est de l'est (ex : 170 → -170) couvre l'antiméridien
+    et devient deux fenêtres [west, 180] et [-180, east].
+    """
+    south, north = max(-90.0, float(south)), min(90.0, float(north))
+    if float(east) - float(west) >= 360.0:
+        return [(south, -180.0, north, 180.0)]
+    west, east = normaliser_longitude(west), normaliser_longitude(east)
+    if west <= east:
+        return [(south, west, north, east)]
+    return [(south, west, north, 180.0), (south, -180.0, north, east)]
+
+
+def plages_bbox(south, west, north, east):
+    """Plages [début, fin) de codes de cellules couvrant la fenêtre (antiméridien géré)
+
+    Le niveau de grille est le plus fin pour lequel la couverture tient en
+    CELLULES_MAX_COUVERTURE cellules ; les plages contiguës sont fusionnées.
+    """
+    plages = []
+    for s, w, n, e in decouper_bbox(south, west, north, east):
+        niveau = NIVEAU_MAX
+        while niveau > 0:
+            nb_colonnes = _colonne(e, niveau) - _colonne(w, niveau) + 1
+            nb_lignes = _ligne(n, niveau) - _ligne(s, niveau) + 1
+            if nb_colonnes * nb_lignes <= CELLULES_MAX_COUVERTURE:
+                break
+            niveau -= 1
+        decalage = 2 * (NIVEAU_MAX - niveau)
+        for x in range(_colonne(w, niveau), _colonne(e, niveau) + 1):
+            for y in range(_ligne(s, niveau), _ligne(n, niveau) + 1):
+                # Le code de niveau L est celui de niveau NIVEAU_MAX privé de ses 2*(NIVEAU_MAX-L) bits faibles
+                debut = _entrelacer(x, y) << decalage
+                plages.append((debut, debut + (1 << decalage)))
+    plages.sort()
+    fusion = []
+    for debut, fin in plages:
+        if fusion and debut <= fusion[-1][1]:
+            fusion[-1] = (fusion[-1][0], max(fusion[-1][1], fin))
+        else:
+            fusion.append((debut, fin))
+    return fusion
+
+
+def filtre_bbox(south, west, north, east, champ='cellule_spatiale'):
+    """Filtre Q : plages de cellules indexées puis coordonnées exactes de la fenêtre"""
+    from django.db.models import Q
+
+    filtre = Q()
+    for s, w, n, e in decouper_bbox(south, west, north, east):
+        plages = Q()
+        for debut, fin in plages_bbox(s, w, n, e):
+            plages |= Q(**{f'{champ}__gte': debut, f'{champ}__lt': fin})
+        filtre |= plages & Q(latitude__gte=s, latitude__lte=n, longitude__gte=w, longitude__lte=e)
+    return filtre
+
+
+def distance_km(lat1, lon1, lat2, lon2):
+    """Distance orthodromique (haversine) entre deux points, en kilomètres"""
+    phi1, phi2 = math.radians(float(lat1)), math.radians(float(lat2))
+    dphi = phi2 - phi1
+    dlambda = math.radians(float(lon2) - float(lon1))
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * RAYON_TERRE_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bbox_cercle(latitude, longitude, rayon_km):
+    """Fenêtre (south, west, north, east) contenant tous les points à moins de rayon_km du centre
+
+    Si le cercle contient un pôle, la fenêtre couvre toutes les longitudes ; sinon
+    l'écart en longitude est celui des points de tangence du cercle avec les méridiens.
+    """
+    latitude, longitude = float(latitude), float(longitude)
+    angle = float(rayon_km) / RAYON_TERRE_KM
+    if angle >= math.pi:
+        return (-90.0, -180.0, 90.0, 180.0)
+    dlat = math.degrees(angle)
+    south, north = latitude - dlat, latitude + dlat
+    if south <= -90.0 or north >= 90.0:
+        return (max(-90.0, south), -180.0, min(90.0, north), 180.0)
+    dlon = math.degrees(math.asin(math.sin(angle) / math.cos(math.radians(latitude))))
+    return (south, longitude - dlon, north, longitude + dlon)
+
+
+def plus_proches(queryset, latitude, longitude, k, rayon_max_km):
+    """Les k lignes du queryset les plus proches du point, à moins de rayon_max_km
+
+    Recherche par rayon croissant : seules les lignes des cellules couvrant le cercle
+    courant sont lues (index sur cellule_spatiale), puis filtrées par distance exacte.
+    Le rayon grandit selon la densité observée jusqu'à contenir k lignes ou atteindre
+    rayon_max_km. Retourne une liste de (distance_km, pk) triée par distance.
+    """
+    rayon_max_km = min(float(rayon_max_km), DEMI_CIRCONFERENCE_KM)
+    rayon = min(RAYON_INITIAL_KM, rayon_max_km)
+    while True:
+        candidats = queryset.filter(filtre_bbox(*bbox_cercle(latitude, longitude, rayon))).values_list(
+            'pk', 'latitude', 'longitude'
+        )
+        trouves = []
+        for pk, lat, lon in candidats:
+            distance = distance_km(latitude, longitude, lat, lon)
+            if distance <= rayon:
+                trouves.append((distance, pk))
+        if len(trouves) >= k or rayon >= rayon_max_km:
+            break
+        # Densité supposée uniforme : le nombre de lignes croît comme le carré du rayon
+        facteur = max(1.5, math.sqrt(k / len(trouves)) * 1.2) if trouves else 4.0
+        rayon = min(rayon * facteur, rayon_max_km)
+    trouves.sort(key=lambda ligne: ligne[0])
+    return trouves[:k]
+
+
+def mercator(latitude, longitude):
+    """Coordonnées Web Mercator normalisées (x, y) dans [0, 1], y croissant vers le sud"""
+    latitude = max(-LATITUDE_MAX_MERCATOR, min(LATITUDE_MAX_MERCATOR, float(latitude)))
+    x = (float(longitude) + 180.0) / 360.0
+    phi = math.radians(latitude)
+    y = (1.0 - math.log(math.tan(phi) + 1.0 / math.cos(phi)) / math.pi) / 2.0
+    return x, y
+
+
+def cellule_mercator(latitude, longitude, niveau=NIVEAU_MAX_GROUPES):
+    """Cellule (x, y) de la grille de regroupement du niveau donné
+
+    Comme pour les codes de Morton, la cellule est dérivée de la grille la plus fine par décalage,
+    afin qu'un point appartienne toujours à la cellule parente de sa cellule fine.
+    """
+    taille = 1 << (NIVEAU_MAX_GROUPES + BITS_CELLULE_TUILE)
+    x, y = mercator(latitude, longitude)
+    x = min(taille - 1, max(0, int(x * taille)))
+    y = min(taille - 1, max(0, int(y * taille)))
+    decalage = NIVEAU_MAX_GROUPES - niveau
+    return x >> decalage, y >> decalage
+
+
+def plages_cellules_mercator(south, west, north, east, niveau):
+    """Plages ((x_min, x_max), (y_min, y_max)) de cellules couvrant la fenêtre (antiméridien géré)"""
+    plages = []
+    for s, w, n, e in decouper_bbox(south, west, north, east):
+        x_min, y_min = cellule_mercator(n, w, niveau)
+        x_max, y_max = cellule_mercator(s, e, niveau)
+        plages.append(((x_min, x_max), (y_min, y_max)))
+    return plages
+
+
+def regrouper(points, niveau):
+    """Agrège par cellule du niveau donné des points (x, y, latitude, longitude)
+
+    (x, y) est la cellule du point au niveau NIVEAU_MAX_GROUPES (voir cellule_mercator).
+    Retourne {(x, y): [nombre, somme_latitude, somme_longitude, lat_min, lat_max, lon_min, lon_max]}.
+    """
+    decalage = NIVEAU_MAX_GROUPES - niveau
+    groupes = {}
+    for x, y, latitude, longitude in points:
+        cle = (x >> decalage, y >> decalage)
+        groupe = groupes.get(cle)
+        if groupe is None:
+            groupes[cle] = [1, latitude, longitude, latitude, latitude, longitude, longitude]
+        else:
+            groupe[0] += 1
+            groupe[1] += latitude
+            groupe[2] += longitude
+            groupe[3] = min(groupe[3], latitude)
+            groupe[4] = max(groupe[4], latitude)
+            groupe[5] = min(groupe[5], longitude)
+            groupe[6] = max(groupe[6], longitude)
+    return groupes
+
+
+def bbox_tuile(z, x, y):
+    """Fenêtre (south, west, north, east) de la tuile Web Mercator z/x/y
+
+    Les tuiles des bords nord et sud s'étendent jusqu'aux pôles : les points au-delà de la
+    latitude limite de la projection y sont ramenés sur le bord, comme dans mercator().
+    """
+    taille = 1 << z
+
+    def latitude(ligne):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * ligne / taille))))
+
+    north = 90.0 if y == 0 else latitude(y)
+    south = -90.0 if y == taille - 1 else latitude(y + 1)
+    return south, x / taille * 360.0 - 180.0, north, (x + 1) / taille * 360.0 - 180.0
+
+
+def tuile_point(latitude, longitude, z):
+    """Tuile (x, y) du zoom z contenant le point"""
+    taille = 1 << z
+    mx, my = mercator(latitude, longitude)
+    return min(taille - 1, max(0, int(mx * taille))), min(taille - 1, max(0, int(my * taille)))
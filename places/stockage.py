@@ -0,0 +1,213 @@
+"""Stockage des médias adressé par contenu, avec dédoublonnage et comptage des références
+
+Un fichier est haché (SHA-256) pendant son écriture et rangé sous
+cas/<2 premiers caractères>/<2 suivants>/<empreinte><extension> : un même contenu n'est
+stocké qu'une fois, quel que soit le nombre de médias qui le rattachent, et son URL ne
+change jamais (cache illimité, voir la vue de service des médias). Chaque sauvegarde
+ajoute une référence au fichier (FichierContenu) et chaque suppression en retire une ;
+le fichier n'est effacé qu'avec sa dernière référence, après validation de la transaction.
+
+Un verrou consultatif Postgres par empreinte ordonne références et effacements : un envoi
+concurrent du même contenu ne peut pas perdre son fichier. Les anciens noms (hors cas/)
+restent servis et sont supprimés directement.
+"""
+import hashlib
+import os
+import posixpath
+import shutil
+import tempfile
+import time
+
+from django.core.files.storage import FileSystemStorage
+from django.db import connection, transaction
+from django.utils.deconstruct import deconstructible
+
+PREFIXE = 'cas'
+# Extension des fichiers selon leur type MIME validé : celle du nom donné par le client n'est jamais
+# reprise, elle déciderait du type sous lequel le fichier est servi (voir places/service_medias.py)
+EXTENSIONS = {
+    'image/jpeg': '.jpg',
+    'image/png': '.png',
+    'image/gif': '.gif',
+    'image/webp': '.webp',
+    'video/mp4': '.mp4',
+    'video/avi': '.avi',
+    'video/mov': '.mov',
+    'video/quicktime': '.mov',
+    'video/wmv': '.wmv',
+    'video/webm': '.webm',
+}
+# Fichiers en cours d'écriture, sur le même système de fichiers que leur destination
+DOSSIER_TEMPORAIRE = posixpath.join(PREFIXE, 'tmp')
+TAILLE_BLOC = 1024 * 1024
+# Âge (secondes) au-delà duquel un fichier temporaire est abandonné : balayer_orphelins le supprime
+AGE_TEMPORAIRES = 24 * 3600
+
+
+def _verrouiller(nom):
+    """Verrou consultatif d'un fichier du stockage, tenu jusqu'à la fin de la transaction"""
+    cle = int(hashlib.sha256(nom.encode()).hexdigest()[:15], 16)
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_xact_lock(%s)', [cle])
+
+
+def chemin_contenu(empreinte, extension=''):
+    return posixpath.join(PREFIXE, empreinte[:2], empreinte[2:4], empreinte + extension)
+
+
+def extension_fichier(name, content):
+    """Extension du fichier stocké : celle de son type MIME (content_type des fichiers envoyés)
+
+    Sans type, cas des fichiers produits par le serveur (déclinaisons, reprise de l'existant),
+    l'extension du nom n'est gardée que si elle est l'une de EXTENSIONS.
+    """
+    type_mime = getattr(content, 'content_type', None)
+    if type_mime is not None:
+        return EXTENSIONS.get(type_mime.lower(), '')
+    extension_nom = os.path.splitext(name)[1].lower()
+    if extension_nom == '.jpeg':
+        return '.jpg'
+    return extension_nom if extension_nom in EXTENSIONS.values() else ''
+
+
+@deconstructible
+class StockageParContenu(FileSystemStorage):
+    """FileSystemStorage dont les noms sont les empreintes des contenus"""
+
+    def get_available_name(self, name, max_length=None):
+        # Le nom définitif dépend du contenu : il est choisi par _save
+        return name
+
+    def _save(self, name, content):
+        from .models import FichierContenu
+
+        empreinte = hashlib.sha256()
+        temporaire = None
+        if hasattr(content, 'temporary_file_path'):
+            # Fichier déjà sur disque (téléversement par morceaux, gros envoi) : haché puis lié, sans
+            # copie ; la source reste en place, son propriétaire la supprime après validation
+            source = content.temporary_file_path()
+            with open(source, 'rb') as fichier:
+                for bloc in iter(lambda: fichier.read(TAILLE_BLOC), b''):
+                    empreinte.update(bloc)
+        else:
+            os.makedirs(self.path(DOSSIER_TEMPORAIRE), exist_ok=True)
+            descripteur, temporaire = tempfile.mkstemp(dir=self.path(DOSSIER_TEMPORAIRE))
+            with os.fdopen(descripteur, 'wb') as sortie:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for bloc in content.chunks(TAILLE_BLOC):
+                    empreinte.update(bloc)
+                    sortie.write(bloc)
+            source = temporaire
+
+        nom = chemin_contenu(empreinte.hexdigest(), extension_fichier(name, content))
+        chemin = self.path(nom)
+        try:
+            with transaction.atomic():
+                _verrouiller(nom)
+                references = FichierContenu.referencer(nom, os.path.getsize(source))
+                # À la première référence, un fichier déjà présent est le reste d'une transaction
+                # annulée (voir balayer_orphelins) : il est remplacé, son contenu n'est pas garanti
+                if references == 1 or not os.path.exists(chemin):
+                    os.makedirs(os.path.dirname(chemin), exist_ok=True)
+                    if temporaire is None:
+                        temporaire = self._lier(source)
+                    os.replace(temporaire, chemin)
+                    temporaire = None
+                    if self.file_permissions_mode is not None:
+                        os.chmod(chemin, self.file_permissions_mode)
+        finally:
+            if temporaire is not None:
+                os.remove(temporaire)
+        return nom
+
+    def _lier(self, source):
+        """Lien physique de la source dans DOSSIER_TEMPORAIRE, copie si elle est sur un autre système de fichiers"""
+        os.makedirs(self.path(DOSSIER_TEMPORAIRE), exist_ok=True)
+        descripteur, temporaire = tempfile.mkstemp(dir=self.path(DOSSIER_TEMPORAIRE))
+        os.close(descripteur)
+        os.remove(temporaire)
+        try:
+            os.link(source, temporaire)
+        except OSError:
+            shutil.copyfile(source, temporaire)
+        return temporaire
+
+    def delete(self, name):
+        """Retire une référence au fichier ; il est effacé après validation si c'était la dernière"""
+        from .models import FichierContenu
+
+        if not name:
+            return
+        if not name.startswith(PREFIXE + '/'):
+            super().delete(name)
+            return
+        with transaction.atomic():
+            _verrouiller(name)
+            restantes = FichierContenu.dereferencer(name)
+        if restantes == 0:
+            transaction.on_commit(lambda: self._effacer_orphelin(name))
+
+    def _effacer_orphelin(self, name):
+        from .models import FichierContenu
+
+        with transaction.atomic():
+            # Sous le verrou : un envoi du même contenu a pu le référencer de nouveau entre-temps
+            _verrouiller(name)
+            if not FichierContenu.objects.filter(chemin=name).exists():
+                super().delete(name)
+
+
+def balayer_orphelins(stockage):
+    """Supprime les fichiers de cas/ sans référence et les fichiers temporaires abandonnés ; retourne leur nombre
+
+    Un fichier rangé dans cas/ par une transaction ensuite annulée (finalisation d'un téléversement,
+    création d'un voyage) n'a plus de ligne FichierContenu. Le verrou de chaque empreinte attend une
+    transaction en cours, qui a pu créer le fichier sans être encore validée.
+    """
+    from .models import FichierContenu
+
+    racine = stockage.path(PREFIXE)
+    dossier_temporaire = stockage.path(DOSSIER_TEMPORAIRE)
+    limite = time.time() - AGE_TEMPORAIRES
+    count = 0
+    for dossier, _, fichiers in os.walk(racine):
+        if dossier == dossier_temporaire:
+            for fichier in fichiers:
+                chemin = os.path.join(dossier, fichier)
+                try:
+                    # ctime : un lien vers un ancien fichier partiel garde la date de modification de celui-ci
+                    if os.stat(chemin).st_ctime < limite:
+                        os.remove(chemin)
+                        count += 1
+                except FileNotFoundError:
+                    pass
+            continue
+        relatif = os.path.relpath(dossier, stockage.location).replace(os.sep, '/')
+        noms = [posixpath.join(relatif, fichier) for fichier in fichiers]
+        connus = set(FichierContenu.objects.filter(chemin__in=noms).values_list('chemin', flat=True))
+        for nom in noms:
+            if nom in connus:
+                continue
+            with transaction.atomic():
+                _verrouiller(nom)
+                if FichierContenu.objects.filter(chemin=nom).exists():
+                    continue
+                try:
+                    os.remove(stockage.path(nom))
+                except FileNotFoundError:
+                    continue
+                count += 1
+    return count
+
+
+_stockage = None
+
+
+def stockage_medias():
+    """Stockage des fichiers des médias (champ fichier de MediaVoyage et MediaActivite)"""
+    global _stockage
+    if _stockage is None:
+        _stockage = StockageParContenu()
+    return _stockage
@@ -0,0 +1,120 @@
+"""Suggestions de lieux personnalisées à partir des favoris d'un utilisateur
+
+Trois étapes, dans l'ordre : lieux des pays des favoris, lieux des autres pays de leurs
+continents, puis lieux les plus visités. Les candidats des deux premières étapes sont lus
+en une seule requête (les lieux les plus visités de chaque pays, par fenêtrage), les lieux
+déjà visités étant exclus en base : le nombre de requêtes ne dépend pas du nombre de
+favoris. Le classement est déterministe (voyages, puis nom, puis identifiant).
+
+Stratégie « covisitation » : les lieux que les visiteurs des lieux de l'utilisateur ont
+aussi visités (places/covisitation.py), complétés par les lieux populaires.
+
+Le résultat est mis en cache par utilisateur et par stratégie, et effacé à chaque écriture
+de ses favoris ou voyages.
+"""
+from django.core.cache import cache
+from django.db import transaction
+
+from .covisitation import get_voisins
+from .pays_reference import codes_continent, continent_pays
+
+NOMBRE_SUGGESTIONS = 6
+# Lieux retenus par pays de favori, puis par favori dans les autres pays de son continent
+PAR_PAYS_FAVORI = 3
+PAR_CONTINENT = 2
+ORDRE = ('-nombre_voyages', 'nom_ville', 'id')
+
+FAVORIS = 'favoris'
+COVISITATION = 'covisitation'
+STRATEGIES = (FAVORIS, COVISITATION)
+
+
+def cle_cache(user_id, strategie=FAVORIS):
+    return f'suggestions:{user_id}:{strategie}'
+
+
+def invalider(user_id):
+    """Efface les suggestions en cache de l'utilisateur, après la validation de la transaction"""
+    transaction.on_commit(lambda: cache.delete_many([cle_cache(user_id, strategie) for strategie in STRATEGIES]))
+
+
+def _rang(lieu):
+    return (-lieu.nombre_voyages, lieu.nom_ville, str(lieu.pk))
+
+
+def suggerer_lieux(user, nombre=NOMBRE_SUGGESTIONS):
+    """Retourne (lieux suggérés, noms des pays des favoris du plus récent au plus ancien)"""
+    from django.db.models import Exists, F, OuterRef, Window
+    from django.db.models.functions import RowNumber
+    from .models import Favori, Lieu, Voyage
+
+    pays_favoris = list(dict.fromkeys(
+        Favori.objects.filter(utilisateur=user).order_by('-date_ajout', '-id').values_list(
+            'lieu__pays_id', 'lieu__pays__nom'
+        )
+    ))
+    non_visites = Lieu.objects.filter(
+        ~Exists(Voyage.objects.filter(utilisateur=user, lieu=OuterRef('pk')))
+    ).select_related('pays')
+
+    suggestions = {}
+    if pays_favoris:
+        continents = {code: continent_pays(code) for code, _ in pays_favoris}
+        codes = set(continents).union(*(codes_continent(continent) for continent in continents.values()))
+        # PAR_PAYS_FAVORI lieux par pays suffisent : les PAR_CONTINENT meilleurs d'un continent
+        # sont chacun parmi les meilleurs de leur pays
+        candidats = sorted(
+            non_visites.filter(pays_id__in=codes).annotate(
+                rang=Window(
+                    RowNumber(),
+                    partition_by=[F('pays_id')],
+                    order_by=[F('nombre_voyages').desc(), F('nom_ville').asc(), F('id').asc()],
+                )
+            ).filter(rang__lte=PAR_PAYS_FAVORI),
+            key=_rang,
+        )
+        for code, _ in pays_favoris:
+            for lieu in [lieu for lieu in candidats if lieu.pays_id == code][:PAR_PAYS_FAVORI]:
+                suggestions.setdefault(lieu.pk, lieu)
+        for code, _ in pays_favoris:
+            if continents[code] is None:
+                continue
+            voisins = [
+                lieu for lieu in candidats
+                if lieu.pays_id != code and continent_pays(lieu.pays_id) == continents[code]
+                and lieu.pk not in suggestions
+            ]
+            for lieu in voisins[:PAR_CONTINENT]:
+                suggestions[lieu.pk] = lieu
+
+    lieux = _completer(list(suggestions.values())[:nombre], non_visites, nombre)
+    return lieux, [nom for _, nom in pays_favoris]
+
+
+def _completer(lieux, candidats, nombre):
+    """Complète les suggestions par les candidats les plus visités"""
+    if len(lieux) < nombre:
+        lieux += candidats.exclude(pk__in=[lieu.pk for lieu in lieux]).order_by(*ORDRE)[:nombre - len(lieux)]
+    return lieux
+
+
+def suggerer_lieux_covisitation(user, nombre=NOMBRE_SUGGESTIONS):
+    """Retourne (lieux suggérés, nombre d'entre eux issus de la co-visitation)
+
+    Les voisins des lieux visités ou favoris de l'utilisateur sont additionnés en mémoire ;
+    ces lieux sont exclus des suggestions, les plus populaires complètent la liste.
+    """
+    from .models import Favori, Lieu, Voyage
+
+    lieux_utilisateur = list(
+        Voyage.objects.filter(utilisateur=user).order_by().values_list('lieu_id', flat=True).union(
+            Favori.objects.filter(utilisateur=user).order_by().values_list('lieu_id', flat=True)
+        )
+    )
+    voisins = get_voisins()
+    recommandes = voisins.recommander(lieux_utilisateur, nombre) if voisins is not None else []
+    lieux = Lieu.objects.select_related('pays').in_bulk([identifiant for identifiant, _ in recommandes])
+    # Un lieu supprimé depuis le calcul des voisins est ignoré
+    lieux = [lieux[identifiant] for identifiant, _ in recommandes if identifiant in lieux]
+    autres = Lieu.objects.exclude(pk__in=lieux_utilisateur).select_related('pays')
+    return _completer(lieux, autres, nombre), len(lieux)
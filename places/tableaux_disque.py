@@ -0,0 +1,46 @@
+"""Jeux de tableaux NumPy écrits sur disque et projetés en mémoire (mmap)
+
+Un jeu vit dans un dossier de base : chaque reconstruction écrit un nouveau sous-dossier
+(un fichier .npy par tableau) puis remplace atomiquement le lien symbolique « courant ».
+Les processus projettent les fichiers en lecture seule et partagent ainsi les pages du
+cache système ; ils comparent la cible du lien à celle qu'ils ont chargée pour savoir
+s'il faut recharger.
+"""
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+LIEN_COURANT = 'courant'
+
+
+def ecrire_tableaux(base, tableaux):
+    """Écrit un nouveau jeu {nom: tableau} et le met en service ; les jeux précédents sont supprimés
+
+    Les processus qui projettent encore un ancien jeu le gardent lisible jusqu'à leur
+    prochain rechargement : un fichier supprimé reste accessible tant qu'il est projeté.
+    """
+    os.makedirs(base, exist_ok=True)
+    dossier = tempfile.mkdtemp(dir=base, prefix='jeu-')
+    for nom, tableau in tableaux.items():
+        np.save(os.path.join(dossier, f'{nom}.npy'), tableau)
+    lien = os.path.join(base, LIEN_COURANT)
+    temporaire = f'{lien}.{os.getpid()}.tmp'
+    os.symlink(os.path.basename(dossier), temporaire)
+    os.replace(temporaire, lien)
+    for nom in os.listdir(base):
+        if nom.startswith('jeu-') and nom != os.path.basename(dossier):
+            shutil.rmtree(os.path.join(base, nom), ignore_errors=True)
+    return dossier
+
+
+def version_courante(base):
+    """Dossier du jeu en service, None s'il n'a pas encore été construit"""
+    cible = os.path.realpath(os.path.join(base, LIEN_COURANT))
+    return cible if os.path.isdir(cible) else None
+
+
+def charger_tableaux(dossier, noms):
+    """Projette en mémoire, en lecture seule, les tableaux d'un jeu"""
+    return {nom: np.load(os.path.join(dossier, f'{nom}.npy'), mmap_mode='r') for nom in noms}
@@ -0,0 +1,131 @@
+"""Téléversement des médias par morceaux, reprenable après une coupure
+
+Protocole (TeleversementViewSet, /api/uploads/) :
+1. POST /api/uploads/ annonce le fichier (nom, type, taille, empreinte SHA-256 facultative) ;
+   la réponse donne la taille des morceaux, et un fichier partiel de la taille annoncée est créé.
+2. PUT /api/uploads/<id>/ envoie un morceau : en-tête Content-Range (bytes début-fin/taille),
+   aligné sur la taille des morceaux, et X-Chunk-SHA256 (empreinte hexadécimale du morceau).
+   Le corps est lu par blocs et écrit à sa place dans le fichier partiel : ni le morceau ni
+   le fichier ne passent en mémoire, quelle que soit leur taille. Un morceau tronqué ou dont
+   l'empreinte diffère n'est pas enregistré et peut être renvoyé.
+3. GET /api/uploads/<id>/ liste les morceaux reçus : après une coupure, seuls les autres sont renvoyés.
+4. POST /api/uploads/<id>/complete/ rattache le fichier complet à un voyage ou à une activité ;
+   le fichier partiel est lié (sans copie) dans le stockage des médias, puis supprimé après validation.
+
+Les fichiers partiels sont sous TELEVERSEMENTS_DIR ; la commande purge_uploads supprime
+les sessions expirées et leurs fichiers.
+"""
+import hashlib
+import logging
+import os
+import re
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+TYPES_IMAGES = ['image/jpeg', 'image/png', 'image/gif', 'image/webp']
+TYPES_VIDEOS = ['video/mp4', 'video/avi', 'video/mov', 'video/wmv', 'video/quicktime', 'video/webm']
+
+# Lecture du corps des requêtes et relecture des fichiers, par blocs
+TAILLE_BLOC = 1024 * 1024
+
+_CONTENT_RANGE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+
+class MorceauIncomplet(Exception):
+    """Le corps de la requête s'est arrêté avant la fin annoncée du morceau"""
+
+
+class FichierAssemble(File):
+    """Fichier partiel complet : le stockage le lie au lieu de le recopier"""
+
+    def __init__(self, file, name=None, content_type=None):
+        super().__init__(file, name)
+        # Type validé à l'annonce du fichier : il fixe l'extension du fichier stocké
+        self.content_type = content_type
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def type_media(type_mime):
+    """'image' ou 'video' selon le type MIME, None s'il n'est pas accepté"""
+    if type_mime in TYPES_IMAGES:
+        return 'image'
+    if type_mime in TYPES_VIDEOS:
+        return 'video'
+    return None
+
+
+def taille_max(type_mime):
+    return settings.TELEVERSEMENT_TAILLE_MAX_IMAGE if type_media(type_mime) == 'image' else settings.TELEVERSEMENT_TAILLE_MAX_VIDEO
+
+
+def chemin_partiel(televersement):
+    return os.path.join(settings.TELEVERSEMENTS_DIR, f'{televersement.pk}.part')
+
+
+def creer_fichier(televersement):
+    """Crée le fichier partiel à sa taille finale (creux : les morceaux absents n'occupent pas le disque)"""
+    os.makedirs(settings.TELEVERSEMENTS_DIR, exist_ok=True)
+    with open(chemin_partiel(televersement), 'wb') as fichier:
+        fichier.truncate(televersement.taille)
+
+
+def analyser_content_range(valeur):
+    """(début, fin incluse, taille totale) d'un en-tête Content-Range ; ValueError s'il est invalide"""
+    correspondance = _CONTENT_RANGE.match(valeur or '')
+    if correspondance is None:
+        raise ValueError('En-tête Content-Range attendu : bytes début-fin/taille')
+    debut, fin, total = (int(groupe) for groupe in correspondance.groups())
+    if fin < debut or fin >= total:
+        raise ValueError('Plage Content-Range invalide')
+    return debut, fin, total
+
+
+def ecrire_morceau(televersement, flux, debut, longueur):
+    """Écrit longueur octets du flux à partir de début dans le fichier partiel ; retourne leur SHA-256"""
+    empreinte = hashlib.sha256()
+    descripteur = os.open(chemin_partiel(televersement), os.O_WRONLY)
+    try:
+        position, fin = debut, debut + longueur
+        while position < fin:
+            bloc = flux.read(min(TAILLE_BLOC, fin - position)) if flux is not None else b''
+            if not bloc:
+                raise MorceauIncomplet
+            empreinte.update(bloc)
+            vue = memoryview(bloc)
+            while vue:
+                ecrits = os.pwrite(descripteur, vue, position)
+                vue = vue[ecrits:]
+                position += ecrits
+    finally:
+        os.close(descripteur)
+    return empreinte.hexdigest()
+
+
+def empreinte_fichier(chemin):
+    """SHA-256 d'un fichier, relu par blocs"""
+    empreinte = hashlib.sha256()
+    with open(chemin, 'rb') as fichier:
+        for bloc in iter(lambda: fichier.read(TAILLE_BLOC), b''):
+            empreinte.update(bloc)
+    return empreinte.hexdigest()
+
+
+def supprimer_fichier(televersement):
+    """Supprime le fichier partiel d'une session, une fois sa suppression validée"""
+    chemin = chemin_partiel(televersement)
+
+    def effacer():
+        try:
+            os.remove(chemin)
+        except FileNotFoundError:
+            pass
+        except OSError:
+            logger.warning('Fichier partiel %s non supprimé', chemin)
+
+    transaction.on_commit(effacer)
@@ -0,0 +1,80 @@
+"""Lieux tendance : popularité à décroissance exponentielle, lue en O(K)
+
+Chaque voyage ou favori apporte à son lieu, pour chaque fenêtre, un poids qui perd la moitié
+de sa valeur à chaque demi-vie. Plutôt que de faire décroître tous les scores au fil du temps,
+on fait croître les contributions (décroissance « vers l'avant ») : une contribution de
+l'instant t vaut poids * 2^((t - repère) / demi-vie), le repère de la fenêtre étant fixe.
+Le temps qui passe multiplie tous les scores d'une fenêtre par le même facteur : l'ordre
+stocké reste l'ordre courant et l'index (fenetre, -score) sert directement les K premiers.
+Le score courant vaut score * 2^(-(maintenant - repère) / demi-vie).
+
+Les scores sont maintenus à chaque écriture de voyage ou de favori (signaux dans
+places/models.py). La commande compact_trending, à lancer régulièrement, ramène le repère
+au présent, ce qui borne les exposants, et supprime les lignes devenues négligeables.
+"""
+from datetime import timedelta
+
+# Fenêtres servies, par demi-vie ; TOUT classe par nombre de voyages (Lieu.nombre_voyages)
+FENETRES = {
+    '24h': timedelta(days=1),
+    '7d': timedelta(days=7),
+    '30d': timedelta(days=30),
+}
+TOUT = 'all'
+FENETRE_DEFAUT = '7d'
+
+POIDS_VOYAGE = 1.0
+POIDS_FAVORI = 1.0
+# Score courant en dessous duquel la compaction supprime une ligne (un voyage vieux de ~7 demi-vies)
+SEUIL_SUPPRESSION = 0.01
+# 2^-1000 est nul en pratique, et reste représentable (Postgres refuse les sous-dépassements)
+EXPOSANT_MIN = -1000.0
+
+
+def exposant(instant, repere, demi_vie):
+    """Nombre de demi-vies écoulées du repère à l'instant (négatif avant le repère)"""
+    return max((instant - repere) / demi_vie, EXPOSANT_MIN)
+
+
+def contribution(poids, instant, repere, demi_vie):
+    """Valeur stockée d'un poids apporté à l'instant donné"""
+    return poids * 2.0 ** exposant(instant, repere, demi_vie)
+
+
+def scores_fenetres(evenements, reperes):
+    """{(lieu_id, fenetre): score} depuis [(lieu_id, instant, poids)] et {fenetre: (repère, demi_vie)}"""
+    scores = {}
+    for lieu_id, instant, poids in evenements:
+        for fenetre, (repere, demi_vie) in reperes.items():
+            cle = (lieu_id, fenetre)
+            scores[cle] = scores.get(cle, 0.0) + contribution(poids, instant, repere, demi_vie)
+    return scores
+
+
+def lieux_tendance(fenetre, nombre, maintenant=None):
+    """Les lieux les plus en vogue d'une fenêtre, chacun avec son score courant (score_tendance)
+
+    Une seule requête, servie par l'index de classement : le repère est lu avec les scores.
+    """
+    from django.db.models import Subquery
+    from django.utils import timezone
+    from .models import EpoqueTendance, Lieu, TendanceLieu
+
+    if fenetre == TOUT:
+        lieux = list(Lieu.objects.select_related('pays').order_by('-nombre_voyages', 'nom_ville', 'id')[:nombre])
+        for lieu in lieux:
+            lieu.score_tendance = float(lieu.nombre_voyages)
+        return lieux
+
+    maintenant = maintenant or timezone.now()
+    epoque = EpoqueTendance.objects.filter(fenetre=fenetre)
+    tendances = TendanceLieu.objects.filter(fenetre=fenetre, score__gt=0).select_related('lieu__pays').annotate(
+        repere=Subquery(epoque.values('repere')),
+        demi_vie=Subquery(epoque.values('demi_vie')),
+    ).order_by('-score', 'lieu_id')[:nombre]
+    lieux = []
+    for tendance in tendances:
+        lieu = tendance.lieu
+        lieu.score_tendance = contribution(tendance.score, tendance.repere, maintenant, tendance.demi_vie)
+        lieux.append(lieu)
+    return lieux
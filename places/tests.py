@@ -1,3 +1,761 @@
-from django.test import TestCase
+import base64
+import hashlib
+import json
+import os
+import shutil
+import struct
+import tempfile
+from datetime import date, timedelta
+from io import BytesIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import RequestFactory, override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from . import renditions
+from .contexte import ContexteVisiteur
+from .models import (
+    Activite, EffectifScore, EpoqueTendance, Favori, FichierContenu, Lieu, MediaVoyage, MouvementPoints,
+    NoteActivite, Pays, TeleversementMedia, TendanceLieu, UserProfile, Voyage,
+)
+from .scoring import attribuer_points, recalculer_scores, reconcilier
+from .serializers import VoyageCreateWithMediaSerializer, VoyageSerializer
+from .spatial import mercator
+from .stockage import balayer_orphelins, chemin_contenu, stockage_medias
+from .tendances import FENETRES, lieux_tendance
+from .tuiles import ETENDUE, encoder_tuile
+
+
+def creer_lieu(nom_ville, pays, latitude=45.0, longitude=4.0):
+    return Lieu.objects.create(nom_ville=nom_ville, pays=pays, latitude=latitude, longitude=longitude)
+
+
+class DossiersTemporairesMixin:
+    """MEDIA_ROOT, TELEVERSEMENTS_DIR et TUILES_CACHE_DIR dans des dossiers temporaires, effacés après chaque test"""
+
+    def setUp(self):
+        super().setUp()
+        dossiers = {}
+        for reglage in ('MEDIA_ROOT', 'TELEVERSEMENTS_DIR', 'TUILES_CACHE_DIR'):
+            dossiers[reglage] = tempfile.mkdtemp()
+            self.addCleanup(shutil.rmtree, dossiers[reglage], ignore_errors=True)
+        reglages = override_settings(**dossiers)
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+
+
+class KeysetPaginationTests(APITestCase):
+    """Pagination par curseur (places/pagination.py) sur les listes de l'API"""
+
+    @classmethod
+    def setUpTestData(cls):
+        pays = [Pays.objects.create(code_iso=code, nom=nom) for code, nom in [
+            ('FRA', 'France'), ('BEL', 'Belgique'), ('CHE', 'Suisse'), ('ITA', 'Italie'),
+        ]]
+        # Le même nom dans plusieurs pays : la première colonne de tri a des égalités
+        for nom_ville, nombre in [('Lyon', 4), ('Annecy', 3), ('Nice', 1)]:
+            for i in range(nombre):
+                creer_lieu(nom_ville, pays[i])
+        cls.utilisateur = User.objects.create_user('voyageur', password='secret')
+        cls.lieu = Lieu.objects.filter(nom_ville='Nice').get()
+        for jour in [1, 1, 1, 5, 5, 9]:
+            Voyage.objects.create(utilisateur=cls.utilisateur, lieu=cls.lieu, date_debut=date(2024, 3, jour))
+
+    def parcourir(self, url, lien='next'):
+        """Identifiants de toutes les pages, en suivant les liens depuis url"""
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(element['id'] for element in response.json()['results'])
+            url = response.json()[lien]
+        return ids
+
+    @staticmethod
+    def curseur(url):
+        encode = url.split('cursor=')[1].split('&')[0]
+        return json.loads(base64.urlsafe_b64decode(encode + '=' * (-len(encode) % 4)))
+
+    def test_parcours_complet_avec_egalites(self):
+        attendus = [str(pk) for pk in Lieu.objects.order_by('nom_ville', 'id').values_list('id', flat=True)]
+        self.assertEqual(self.parcourir('/api/lieux/?limit=3'), attendus)
+
+    def test_retour_en_arriere(self):
+        response = self.client.get('/api/lieux/?limit=3')
+        self.assertIsNone(response.json()['previous'])
+        while response.json()['next']:
+            derniere = response
+            response = self.client.get(response.json()['next'])
+        # Pages précédentes depuis la dernière, chacune dans l'ordre de tri
+        precedentes = []
+        url = response.json()['previous']
+        while url:
+            page = self.client.get(url).json()
+            precedentes = [element['id'] for element in page['results']] + precedentes
+            url = page['previous']
+        attendus = [str(pk) for pk in Lieu.objects.order_by('nom_ville', 'id').values_list('id', flat=True)]
+        self.assertEqual(precedentes + [element['id'] for element in response.json()['results']], attendus)
+        self.assertEqual(
+            [element['id'] for element in derniere.json()['results']],
+            [element['id'] for element in self.client.get(response.json()['previous']).json()['results']],
+        )
+
+    def test_curseur_invalide(self):
+        self.assertEqual(self.client.get('/api/lieux/?cursor=pas-un-curseur').status_code, 404)
+        # Base64 valide, mais pas autant de valeurs que de colonnes de tri
+        encode = base64.urlsafe_b64encode(b'{"v":["Lyon"]}').decode().rstrip('=')
+        self.assertEqual(self.client.get(f'/api/lieux/?cursor={encode}').status_code, 404)
+
+    @override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'PAGE_SIZE': 3, 'MAX_PAGE_SIZE': 5})
+    def test_limit_borne(self):
+        def taille(parametres):
+            return len(self.client.get(f'/api/lieux/{parametres}').json()['results'])
+
+        self.assertEqual(taille(''), 3)
+        self.assertEqual(taille('?limit=abc'), 3)
+        self.assertEqual(taille('?limit=0'), 1)
+        self.assertEqual(taille('?limit=-4'), 1)
+        self.assertEqual(taille('?limit=4'), 4)
+        self.assertEqual(taille('?limit=1000'), 5)
+
+    def test_ordre_de_l_action(self):
+        """@action(pagination_ordering=...) : voyages d'un lieu par date décroissante, pas par nom de ville"""
+        url = f'/api/lieux/{self.lieu.id}/voyages/?limit=2'
+        attendus = [
+            str(pk) for pk in Voyage.objects.filter(lieu=self.lieu).order_by('-date_debut', 'id').values_list('id', flat=True)
+        ]
+        self.assertEqual(self.parcourir(url), attendus)
+        suivant = self.client.get(url).json()['next']
+        # Le curseur porte la clé de l'action (date, id) de la dernière ligne de la page
+        self.assertEqual(self.curseur(suivant)['v'][0], '2024-03-05')
+        self.assertEqual(len(self.curseur(suivant)['v']), 2)
+
+
+def lire_varint(contenu, position):
+    """Entier varint à la position donnée, et la position qui le suit"""
+    valeur = decalage = 0
+    while True:
+        octet = contenu[position]
+        position += 1
+        valeur |= (octet & 0x7F) << decalage
+        if not octet & 0x80:
+            return valeur, position
+        decalage += 7
+
+
+def lire_protobuf(contenu):
+    """Champs d'un message protobuf : {numéro: [valeurs]} (entier, ou octets des champs délimités et fixes)"""
+    champs, position = {}, 0
+    while position < len(contenu):
+        cle, position = lire_varint(contenu, position)
+        numero, type_fil = cle >> 3, cle & 7
+        if type_fil == 0:
+            valeur, position = lire_varint(contenu, position)
+        elif type_fil == 1:
+            valeur, position = contenu[position:position + 8], position + 8
+        elif type_fil == 2:
+            longueur, position = lire_varint(contenu, position)
+            valeur, position = contenu[position:position + longueur], position + longueur
+        elif type_fil == 5:
+            valeur, position = contenu[position:position + 4], position + 4
+        else:
+            raise ValueError(f'Type de fil {type_fil} inattendu')
+        champs.setdefault(numero, []).append(valeur)
+    return champs
+
+
+def lire_varints(contenu):
+    """Liste compacte d'entiers (tags, géométrie)"""
+    valeurs, position = [], 0
+    while position < len(contenu):
+        valeur, position = lire_varint(contenu, position)
+        valeurs.append(valeur)
+    return valeurs
+
+
+def dezigzag(valeur):
+    return (valeur >> 1) ^ -(valeur & 1)
+
+
+def lire_tuile(contenu):
+    """Décode une tuile vectorielle selon la spécification Mapbox Vector Tile 2.1
+
+    Retourne {couche: {'version', 'extent', 'features': [(type, [(x, y)], attributs)]}}.
+    """
+    def valeur(message):
+        (numero, (brute,)), = lire_protobuf(message).items()
+        if numero == 1:
+            return brute.decode('utf-8')
+        if numero == 2:
+            return struct.unpack('<f', brute)[0]
+        if numero == 3:
+            return struct.unpack('<d', brute)[0]
+        if numero in (4, 5):
+            return brute
+        if numero == 6:
+            return dezigzag(brute)
+        return bool(brute)
+
+    couches = {}
+    for message in lire_protobuf(contenu).get(3, []):
+        couche = lire_protobuf(message)
+        cles = [cle.decode('utf-8') for cle in couche.get(3, [])]
+        valeurs = [valeur(message) for message in couche.get(4, [])]
+        features = []
+        for message in couche.get(2, []):
+            feature = lire_protobuf(message)
+            tags = lire_varints(feature.get(2, [b''])[0])
+            attributs = {cles[tags[i]]: valeurs[tags[i + 1]] for i in range(0, len(tags), 2)}
+            # Points : MoveTo (id 1) suivi de paires de déplacements zigzag relatifs
+            geometrie = lire_varints(feature[4][0])
+            commande, nombre = geometrie[0] & 7, geometrie[0] >> 3
+            assert commande == 1
+            points, x, y = [], 0, 0
+            for i in range(nombre):
+                x += dezigzag(geometrie[1 + 2 * i])
+                y += dezigzag(geometrie[2 + 2 * i])
+                points.append((x, y))
+            features.append((feature[3][0], points, attributs))
+        couches[couche[1][0].decode('utf-8')] = {
+            'version': couche[15][0], 'extent': couche[5][0], 'features': features,
+        }
+    return couches
+
+
+class EncodageTuileTests(APITestCase):
+    """Encodeur protobuf des tuiles vectorielles (places/tuiles.py), relu selon la spécification"""
+
+    def test_points_et_types_d_attributs(self):
+        contenu = encoder_tuile('lieux', [
+            (-5, 4200, {'nom': 'Montréal', 'visites': 300, 'ecart': -7, 'note': 2.5, 'favori': True, 'absent': None}),
+            (0, 0, {'nom': 'Genève', 'visites': 300, 'favori': False}),
+            (-70000, -1, {}),
+        ])
+        couche = lire_tuile(contenu)['lieux']
+        self.assertEqual(couche['version'], 2)
+        self.assertEqual(couche['extent'], ETENDUE)
+        self.assertEqual(couche['features'], [
+            (1, [(-5, 4200)], {'nom': 'Montréal', 'visites': 300, 'ecart': -7, 'note': 2.5, 'favori': True}),
+            (1, [(0, 0)], {'nom': 'Genève', 'visites': 300, 'favori': False}),
+            (1, [(-70000, -1)], {}),
+        ])
+        # Valeurs identiques partagées dans la table de la couche, booléen distinct de l'entier 1
+        self.assertIs(couche['features'][0][2]['favori'], True)
+        self.assertEqual(len(lire_protobuf(lire_protobuf(contenu)[3][0])[4]), 7)
+
+    def test_grands_entiers(self):
+        attributs = {'grand': 2 ** 40, 'negatif': -(2 ** 40)}
+        self.assertEqual(lire_tuile(encoder_tuile('c', [(1, 2, attributs)]))['c']['features'][0][2], attributs)
+
+    def test_tuile_vide(self):
+        self.assertEqual(encoder_tuile('lieux', []), b'')
+
+
+class TuileLieuxTests(DossiersTemporairesMixin, APITestCase):
+    """Vue des tuiles des lieux (/api/tiles/z/x/y)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        chili = Pays.objects.create(code_iso='CHL', nom='Chili')
+        cls.santiago = creer_lieu('Santiago', chili, latitude=-33.45, longitude=-70.66)
+
+    def test_tuile_decodee(self):
+        response = self.client.get('/api/tiles/1/0/1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/vnd.mapbox-vector-tile')
+        (type_geometrie, points, attributs), = lire_tuile(response.content)['lieux']['features']
+        mx, my = mercator(self.santiago.latitude, self.santiago.longitude)
+        self.assertEqual(type_geometrie, 1)
+        self.assertEqual(points, [(round(mx * 2 * ETENDUE), round((my * 2 - 1) * ETENDUE))])
+        # note_moyenne omise : le lieu n'a pas de note
+        self.assertEqual(attributs, {
+            'id': str(self.santiago.id), 'nom_ville': 'Santiago', 'pays': 'CHL', 'nombre_voyages': 0,
+        })
+        self.assertEqual(self.client.get('/api/tiles/1/1/0').content, b'')
+
+    def test_tuile_hors_grille(self):
+        for chemin in ['1/2/0', '1/0/2', '23/0/0', '0/1/0']:
+            self.assertEqual(self.client.get(f'/api/tiles/{chemin}').status_code, 404, chemin)
+
+
+@override_settings(TELEVERSEMENT_TAILLE_MORCEAU=8)
+class TeleversementTests(DossiersTemporairesMixin, APITestCase):
+    """Téléversement par morceaux (/api/uploads/, protocole décrit dans places/televersements.py)"""
+    CONTENU = b'0123456789abcdefghij'  # trois morceaux : 8, 8 et 4 octets
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.utilisateur = User.objects.create_user('voyageur', password='secret')
+        cls.autre = User.objects.create_user('curieux', password='secret')
+        lieu = creer_lieu('Porto', Pays.objects.create(code_iso='PRT', nom='Portugal'))
+        cls.voyage = Voyage.objects.create(utilisateur=cls.utilisateur, lieu=lieu, date_debut=date(2024, 5, 1))
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.utilisateur)
+        response = self.client.post('/api/uploads/', {
+            # Extension trompeuse : le fichier stocké prend celle du type annoncé
+            'nom_fichier': 'film.html', 'type_mime': 'video/mp4', 'taille': len(self.CONTENU),
+            'sha256': hashlib.sha256(self.CONTENU).hexdigest(),
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.url = f"/api/uploads/{response.json()['id']}/"
+
+    def envoyer(self, debut, fin, corps=None, empreinte=None):
+        corps = self.CONTENU[debut:fin + 1] if corps is None else corps
+        return self.client.generic(
+            'PUT', self.url, corps, content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=f'bytes {debut}-{fin}/{len(self.CONTENU)}',
+            HTTP_X_CHUNK_SHA256=empreinte or hashlib.sha256(corps).hexdigest(),
+        )
+
+    def envoyer_tout(self):
+        for debut, fin in [(0, 7), (8, 15), (16, 19)]:
+            self.assertEqual(self.envoyer(debut, fin).status_code, 200)
+
+    def recus(self):
+        return self.client.get(self.url).json()['morceaux_recus']
+
+    def finaliser(self):
+        return self.client.post(f'{self.url}complete/', {'voyage_id': str(self.voyage.id)}, format='json')
+
+    def test_reprise_et_finalisation(self):
+        self.assertEqual(self.envoyer(16, 19).status_code, 200)
+        self.assertEqual(self.envoyer(0, 7).status_code, 200)
+        self.assertEqual(self.recus(), [0, 2])
+        response = self.envoyer(8, 15)
+        self.assertEqual(response.json(), {'index': 1, 'nombre_recus': 3, 'nombre_morceaux': 3})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.finaliser()
+        self.assertEqual(response.status_code, 201)
+        media = MediaVoyage.objects.get(voyage=self.voyage)
+        self.assertEqual(response.json()['id'], str(media.id))
+        self.assertTrue(media.fichier.name.endswith('.mp4'))
+        with media.fichier.open('rb') as fichier:
+            self.assertEqual(fichier.read(), self.CONTENU)
+        self.assertEqual(os.listdir(settings.TELEVERSEMENTS_DIR), [])
+
+    def test_morceau_mal_aligne(self):
+        for debut, fin in [(1, 8), (0, 3), (8, 19)]:
+            self.assertEqual(self.envoyer(debut, fin).status_code, 400, (debut, fin))
+        # Taille totale différente de celle annoncée
+        response = self.client.generic(
+            'PUT', self.url, self.CONTENU[:8], content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE='bytes 0-7/21', HTTP_X_CHUNK_SHA256=hashlib.sha256(self.CONTENU[:8]).hexdigest(),
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.recus(), [])
+
+    def test_empreinte_du_morceau_incorrecte(self):
+        self.assertEqual(self.envoyer(0, 7, empreinte='0' * 64).status_code, 400)
+        self.assertEqual(self.recus(), [])
+        self.assertEqual(self.envoyer(0, 7).status_code, 200)
+        self.assertEqual(self.recus(), [0])
+
+    def test_corps_tronque(self):
+        response = self.envoyer(0, 7, corps=self.CONTENU[:5], empreinte=hashlib.sha256(self.CONTENU[:8]).hexdigest())
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.recus(), [])
+
+    def test_finalisation_avec_morceaux_manquants(self):
+        self.envoyer(8, 15)
+        response = self.finaliser()
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['morceaux_manquants'], [0, 2])
+        self.assertFalse(MediaVoyage.objects.exists())
+
+    def test_finalisation_repetee(self):
+        self.envoyer_tout()
+        premiere = self.finaliser()
+        seconde = self.finaliser()
+        self.assertEqual(premiere.status_code, 201)
+        self.assertEqual(seconde.status_code, 200)
+        self.assertEqual(seconde.json()['id'], premiere.json()['id'])
+        self.assertEqual(MediaVoyage.objects.count(), 1)
+
+    def test_finalisation_annulee_rejouable(self):
+        self.envoyer_tout()
+        partiel = os.path.join(settings.TELEVERSEMENTS_DIR, self.url.split('/')[-2] + '.part')
+        with mock.patch.object(TeleversementMedia, 'save', side_effect=RuntimeError('panne')):
+            with self.assertRaises(RuntimeError):
+                self.finaliser()
+        # Fichier partiel gardé ; le fichier rangé dans cas/ n'a plus de référence
+        self.assertTrue(os.path.exists(partiel))
+        self.assertFalse(FichierContenu.objects.exists())
+        self.assertEqual(balayer_orphelins(stockage_medias()), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.finaliser().status_code, 201)
+        with MediaVoyage.objects.get(voyage=self.voyage).fichier.open('rb') as fichier:
+            self.assertEqual(fichier.read(), self.CONTENU)
+        self.assertFalse(os.path.exists(partiel))
+        self.assertEqual(balayer_orphelins(stockage_medias()), 0)
+
+    def test_envoi_apres_finalisation(self):
+        self.envoyer_tout()
+        self.finaliser()
+        self.assertEqual(self.envoyer(0, 7).status_code, 409)
+
+    def test_session_d_un_autre_utilisateur(self):
+        self.envoyer_tout()
+        self.client.force_authenticate(self.autre)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        self.assertEqual(self.envoyer(0, 7).status_code, 404)
+        self.assertEqual(self.finaliser().status_code, 404)
+        self.assertEqual(self.client.delete(self.url).status_code, 404)
+        self.assertFalse(MediaVoyage.objects.exists())
+
+
+class StockageParContenuTests(DossiersTemporairesMixin, APITestCase):
+    """Stockage des médias adressé par contenu et comptage des références (places/stockage.py)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        utilisateur = User.objects.create_user('voyageur', password='secret')
+        lieu = creer_lieu('Séville', Pays.objects.create(code_iso='ESP', nom='Espagne'))
+        cls.voyage = Voyage.objects.create(utilisateur=utilisateur, lieu=lieu, date_debut=date(2024, 4, 1))
+
+    def creer_media(self, contenu, nom='film.mp4', type_mime='video/mp4'):
+        return MediaVoyage.objects.create(
+            voyage=self.voyage, fichier=SimpleUploadedFile(nom, contenu, type_mime), type_media=type_mime.split('/')[0]
+        )
+
+    def fichiers(self):
+        return sorted(
+            os.path.relpath(os.path.join(dossier, nom), settings.MEDIA_ROOT)
+            for dossier, _, noms in os.walk(settings.MEDIA_ROOT) for nom in noms
+        )
+
+    def test_contenus_identiques_dedoublonnes(self):
+        premier = self.creer_media(b'meme contenu', 'a.mp4')
+        second = self.creer_media(b'meme contenu', 'B.MP4')
+        empreinte = hashlib.sha256(b'meme contenu').hexdigest()
+        chemin = f'cas/{empreinte[:2]}/{empreinte[2:4]}/{empreinte}.mp4'
+        self.assertEqual(premier.fichier.name, chemin)
+        self.assertEqual(second.fichier.name, chemin)
+        self.assertEqual(self.fichiers(), [chemin])
+        self.assertEqual(FichierContenu.objects.get(chemin=chemin).references, 2)
+
+    def test_reste_d_une_transaction_annulee_remplace(self):
+        """Un fichier de cas/ sans référence n'est pas réutilisé tel quel : son contenu n'est pas garanti"""
+        chemin = chemin_contenu(hashlib.sha256(b'contenu attendu').hexdigest(), '.mp4')
+        os.makedirs(os.path.dirname(os.path.join(settings.MEDIA_ROOT, chemin)))
+        with open(os.path.join(settings.MEDIA_ROOT, chemin), 'wb') as fichier:
+            fichier.write(b'contenu modifie')
+        media = self.creer_media(b'contenu attendu')
+        self.assertEqual(media.fichier.name, chemin)
+        with media.fichier.open('rb') as fichier:
+            self.assertEqual(fichier.read(), b'contenu attendu')
+
+    def test_extension_du_type_valide(self):
+        """L'extension vient du type MIME, jamais du nom choisi par le client"""
+        self.assertTrue(self.creer_media(b'<script>', 'page.html', 'image/png').fichier.name.endswith('.png'))
+        self.assertRegex(self.creer_media(b'<svg/>', 'dessin.svg', 'image/svg+xml').fichier.name, r'/[0-9a-f]{64}$')
+
+    def test_fichier_efface_avec_sa_derniere_reference(self):
+        premier = self.creer_media(b'meme contenu')
+        second = self.creer_media(b'meme contenu')
+        chemin = premier.fichier.name
+
+        with self.captureOnCommitCallbacks(execute=True):
+            premier.delete()
+        self.assertEqual(FichierContenu.objects.get(chemin=chemin).references, 1)
+        self.assertEqual(self.fichiers(), [chemin])
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            second.delete()
+            # Effacé seulement après validation
+            self.assertEqual(self.fichiers(), [chemin])
+        self.assertEqual(len(callbacks), 1)
+        self.assertFalse(FichierContenu.objects.filter(chemin=chemin).exists())
+        self.assertEqual(self.fichiers(), [])
+
+    def test_ancien_nom_supprime_directement(self):
+        chemin = 'voyages_medias/ancien.mp4'
+        os.makedirs(os.path.join(settings.MEDIA_ROOT, 'voyages_medias'))
+        with open(os.path.join(settings.MEDIA_ROOT, chemin), 'wb') as fichier:
+            fichier.write(b'ancien')
+        media = MediaVoyage.objects.create(voyage=self.voyage, fichier=chemin, type_media='video')
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            media.delete()
+        self.assertEqual(callbacks, [])
+        self.assertEqual(self.fichiers(), [])
+        self.assertFalse(FichierContenu.objects.exists())
+
+    def test_declinaisons_liberees_si_le_media_disparait(self):
+        """Média supprimé pendant la production de ses déclinaisons : elles ne gardent aucune référence"""
+        from PIL import Image
+
+        tampon = BytesIO()
+        Image.new('RGB', (900, 600), (20, 120, 200)).save(tampon, 'JPEG')
+        media = self.creer_media(tampon.getvalue(), 'photo.jpg', 'image/jpeg')
+        decliner = renditions.decliner
+
+        def decliner_puis_supprimer(*args):
+            resultat = decliner(*args)
+            # Suppression validée : l'original est effacé avant la fin de generer
+            with self.captureOnCommitCallbacks(execute=True):
+                MediaVoyage.objects.filter(pk=media.pk).delete()
+            return resultat
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with mock.patch.object(renditions, 'decliner', decliner_puis_supprimer):
+                self.assertEqual(renditions.generer(MediaVoyage, media.pk), renditions.PRET)
+        self.assertFalse(FichierContenu.objects.exists())
+        self.assertEqual(self.fichiers(), [])
+
+
+class ServiceMediasTests(DossiersTemporairesMixin, APITestCase):
+    """Service des fichiers de MEDIA_ROOT (/media/…) : type servi et en-têtes de sécurité"""
+
+    def ecrire(self, chemin, contenu=b'contenu'):
+        complet = os.path.join(settings.MEDIA_ROOT, chemin)
+        os.makedirs(os.path.dirname(complet), exist_ok=True)
+        with open(complet, 'wb') as fichier:
+            fichier.write(contenu)
+
+    def test_image_servie_sous_son_type(self):
+        self.ecrire('voyages_medias/photo.JPG')
+        response = self.client.get('/media/voyages_medias/photo.JPG')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['X-Content-Type-Options'], 'nosniff')
+        self.assertTrue(response['Content-Disposition'].startswith('inline'))
+
+    def test_autres_types_telecharges(self):
+        for chemin in ['voyages_medias/page.html', 'voyages_medias/dessin.svg', 'voyages_medias/sans_extension']:
+            self.ecrire(chemin, b'<script>alert(1)</script>')
+            response = self.client.get(f'/media/{chemin}')
+            self.assertEqual(response['Content-Type'], 'application/octet-stream', chemin)
+            self.assertEqual(response['Content-Disposition'], 'attachment', chemin)
+            self.assertEqual(response['X-Content-Type-Options'], 'nosniff', chemin)
+
+    @override_settings(MEDIAS_X_ACCEL_REDIRECT='/medias-internes/')
+    def test_redirection_interne(self):
+        self.ecrire('voyages_medias/page.html')
+        response = self.client.get('/media/voyages_medias/page.html')
+        self.assertEqual(response['X-Accel-Redirect'], '/medias-internes/voyages_medias/page.html')
+        self.assertEqual(response['Content-Type'], 'application/octet-stream')
+        self.assertEqual(response['Content-Disposition'], 'attachment')
+        self.assertEqual(response['X-Content-Type-Options'], 'nosniff')
+
+
+class EffectifScoreTests(APITestCase):
+    """Cache de rang du classement (EffectifScore)"""
+
+    def effectifs(self):
+        return {(niveau, valeur): nombre for niveau, valeur, nombre in EffectifScore.objects.values_list('niveau', 'valeur', 'nombre')}
+
+    def ctid(self, niveau, valeur):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT ctid FROM {EffectifScore._meta.db_table} WHERE niveau = %s AND valeur = %s', [niveau, valeur]
+            )
+            return cursor.fetchone()
+
+    def test_points_dans_la_tranche(self):
+        """Un score qui reste dans sa tranche ne réécrit pas la ligne de la tranche, partagée par tous"""
+        utilisateurs = [User.objects.create_user(f'joueur{i}') for i in range(2)]
+        avant = self.ctid(1, 0)
+        self.assertEqual(attribuer_points(utilisateurs[0].id, MouvementPoints.CREATION_VOYAGE, points=3), 3)
+        self.assertEqual(self.ctid(1, 0), avant)
+        self.assertEqual(self.effectifs(), {(0, 0): 1, (0, 3): 1, (1, 0): 2})
+
+    def test_appliquer(self):
+        EffectifScore.appliquer(150, 1, 3)
+        EffectifScore.appliquer(150, -1)
+        self.assertEqual(self.effectifs(), {(0, 150): 2, (1, 1): 2})
+        # Les cellules vidées sont supprimées
+        EffectifScore.appliquer(150, -1, 2)
+        self.assertEqual(self.effectifs(), {})
+
+    def test_deplacer(self):
+        for score in [5, 99, 100]:
+            EffectifScore.appliquer(score, 1)
+        EffectifScore.deplacer([(99, 100), (100, 250), (5, 5)])
+        self.assertEqual(self.effectifs(), {(0, 5): 1, (0, 100): 1, (0, 250): 1, (1, 0): 1, (1, 1): 1, (1, 2): 1})
+
+    def test_rangs_ex_aequo_et_limites_de_tranche(self):
+        scores = [300, 200, 200, 199, 100, 99, 0, 0]
+        for score in scores:
+            EffectifScore.appliquer(score, 1)
+        demandes = [301, 300, 250, 200, 199, 150, 100, 99, 1, 0]
+        attendus = {demande: 1 + sum(score > demande for score in scores) for demande in demandes}
+        self.assertEqual(EffectifScore.rangs(demandes), attendus)
+        self.assertEqual(attendus[200], 2)
+        self.assertEqual(attendus[199], 4)
+        for demande in demandes:
+            self.assertEqual(EffectifScore.rang(demande), attendus[demande], demande)
+
+    def test_rang_du_profil(self):
+        """Ex aequo au même rang, dans les statistiques, le profil public et le classement"""
+        scores = {'premier': 105, 'second': 105, 'troisieme': 100, 'dernier': 0}
+        utilisateurs = {}
+        for nom, score in scores.items():
+            utilisateurs[nom] = User.objects.create_user(nom)
+            if score:
+                attribuer_points(utilisateurs[nom].id, MouvementPoints.CORRECTION, points=score)
+        # Utilisateur relu, comme à chaque requête : celui créé garde son profil à 0 point
+        self.client.force_authenticate(User.objects.get(username='second'))
+        self.assertEqual(self.client.get('/api/profile/').json()['rang'], 1)
+        self.assertEqual(self.client.get(f"/api/users/{utilisateurs['troisieme'].id}/profile/").json()['rang'], 3)
+        classement = self.client.get('/api/leaderboard/').json()['results']
+        self.assertEqual([(ligne['username'], ligne['rang']) for ligne in classement], [
+            ('premier', 1), ('second', 1), ('troisieme', 3), ('dernier', 4),
+        ])
+
+
+class RegistrePointsTests(APITestCase):
+    """Registre des points (places/scoring.py) et score en cache des profils"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.utilisateur = User.objects.create_user('voyageur')
+        cls.lieu = creer_lieu('Porto', Pays.objects.create(code_iso='PRT', nom='Portugal'))
+
+    def score(self):
+        return UserProfile.objects.get(utilisateur=self.utilisateur).score_total
+
+    def effectifs(self):
+        return {(niveau, valeur): nombre for niveau, valeur, nombre in EffectifScore.objects.values_list('niveau', 'valeur', 'nombre')}
+
+    def verifier_cache_de_rang(self):
+        effectifs = self.effectifs()
+        EffectifScore.recalculer()
+        self.assertEqual(effectifs, self.effectifs())
+
+    def test_attribution_idempotente(self):
+        voyages = [Voyage.objects.create(utilisateur=self.utilisateur, lieu=self.lieu, date_debut=date(2024, 5, 1)) for _ in range(2)]
+        self.assertEqual(attribuer_points(self.utilisateur.id, MouvementPoints.CREATION_VOYAGE, voyages[0]), 3)
+        self.assertIsNone(attribuer_points(self.utilisateur.id, MouvementPoints.CREATION_VOYAGE, voyages[0]))
+        # Même source, autre motif ; autre source, même motif
+        self.assertEqual(attribuer_points(self.utilisateur.id, MouvementPoints.CREATION_ACTIVITE, voyages[0]), 5)
+        self.assertEqual(attribuer_points(self.utilisateur.id, MouvementPoints.CREATION_VOYAGE, voyages[1]), 8)
+        self.assertEqual(MouvementPoints.objects.filter(utilisateur=self.utilisateur).count(), 3)
+        self.assertEqual(self.score(), 8)
+        self.verifier_cache_de_rang()
+
+    def test_reconcilier(self):
+        attribuer_points(self.utilisateur.id, MouvementPoints.CORRECTION, points=5)
+        # Score en cache divergent du registre
+        UserProfile.objects.filter(utilisateur=self.utilisateur).update(score_total=150)
+        EffectifScore.deplacer([(5, 150)])
+
+        self.assertEqual(reconcilier(appliquer=False), [(self.utilisateur.id, 150, 5)])
+        self.assertEqual(self.score(), 150)
+        self.assertEqual(reconcilier(taille_lot=1), [(self.utilisateur.id, 150, 5)])
+        self.assertEqual(self.score(), 5)
+        self.verifier_cache_de_rang()
+        self.assertEqual(reconcilier(), [])
+
+    def test_recalculer_scores(self):
+        voyage = Voyage.objects.create(utilisateur=self.utilisateur, lieu=self.lieu, date_debut=date(2024, 5, 1))
+        attribuer_points(self.utilisateur.id, MouvementPoints.CREATION_VOYAGE, voyage)
+        # Activité et note sans points au registre : 2 + 1 points manquants
+        activite = Activite.objects.create(titre='Tram 28', description='Tour', lieu=self.lieu, cree_par=self.utilisateur)
+        NoteActivite.objects.create(activite=activite, utilisateur=self.utilisateur, note=4)
+
+        ecart = [(self.utilisateur.id, 3, 3, 6)]
+        self.assertEqual([e for lot in recalculer_scores(appliquer=False) for e in lot], ecart)
+        self.assertEqual(self.score(), 3)
+        self.assertEqual([e for lot in recalculer_scores() for e in lot], ecart)
+        self.assertEqual(self.score(), 6)
+        correction = MouvementPoints.objects.get(utilisateur=self.utilisateur, motif=MouvementPoints.CORRECTION)
+        self.assertEqual(correction.points, 3)
+        self.verifier_cache_de_rang()
+        self.assertEqual([e for lot in recalculer_scores() for e in lot], [])
+
+
+class TendancesTests(APITestCase):
+    """Scores de tendance à décroissance vers l'avant (places/tendances.py)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        # Repères dans le passé : les contributions du test en sont éloignées
+        cls.repere = timezone.now() - timedelta(days=3)
+        for fenetre, demi_vie in FENETRES.items():
+            EpoqueTendance.objects.update_or_create(fenetre=fenetre, defaults={'demi_vie': demi_vie, 'repere': cls.repere})
+        cls.utilisateur = User.objects.create_user('voyageur')
+        pays = Pays.objects.create(code_iso='PRT', nom='Portugal')
+        cls.lieux = [creer_lieu(nom_ville, pays) for nom_ville in ['Porto', 'Lisbonne', 'Faro']]
+
+    def creer_voyage(self, lieu):
+        return Voyage.objects.create(utilisateur=self.utilisateur, lieu=lieu, date_debut=date(2024, 5, 1))
+
+    def classements(self, maintenant):
+        return {
+            fenetre: [(lieu.id, lieu.score_tendance) for lieu in lieux_tendance(fenetre, 10, maintenant)]
+            for fenetre in FENETRES
+        }
+
+    def assertClassementsEgaux(self, obtenus, attendus):
+        for fenetre, classement in attendus.items():
+            self.assertEqual([lieu_id for lieu_id, _ in obtenus[fenetre]], [lieu_id for lieu_id, _ in classement], fenetre)
+            for (_, obtenu), (_, attendu) in zip(obtenus[fenetre], classement):
+                self.assertAlmostEqual(obtenu, attendu, places=9, msg=fenetre)
+
+    def test_scores_egaux_au_recalcul(self):
+        porto, lisbonne, faro = self.lieux
+        voyages = [self.creer_voyage(porto) for _ in range(4)] + [self.creer_voyage(faro)]
+        Favori.objects.create(utilisateur=self.utilisateur, lieu=lisbonne)
+        voyages[0].delete()
+        # Voyage déplacé : la contribution passe d'un lieu à l'autre
+        voyages[-1].lieu = lisbonne
+        voyages[-1].save()
+
+        maintenant = timezone.now() + timedelta(hours=6)
+        incrementaux = self.classements(maintenant)
+        self.assertEqual([lieu_id for lieu_id, _ in incrementaux['7d']], [porto.id, lisbonne.id])
+        TendanceLieu.recalculer(maintenant)
+        self.assertClassementsEgaux(self.classements(maintenant), incrementaux)
+
+    def test_compacter_garde_l_ordre(self):
+        porto, lisbonne, faro = self.lieux
+        for lieu, nombre in [(porto, 1), (lisbonne, 3), (faro, 2)]:
+            for _ in range(nombre):
+                self.creer_voyage(lieu)
+        maintenant = timezone.now() + timedelta(days=2)
+        avant = self.classements(maintenant)
+        self.assertEqual([lieu_id for lieu_id, _ in avant['24h']], [lisbonne.id, faro.id, porto.id])
+        self.assertEqual(TendanceLieu.compacter(maintenant), 0)
+        self.assertEqual(EpoqueTendance.objects.get(fenetre='7d').repere, maintenant)
+        self.assertClassementsEgaux(self.classements(maintenant), avant)
+
+    def test_score_courant_decroit(self):
+        voyage = self.creer_voyage(self.lieux[0])
+        for demi_vies, attendu in [(0, 1.0), (1, 0.5), (2, 0.25)]:
+            maintenant = voyage.date_creation + demi_vies * FENETRES['7d']
+            [lieu] = lieux_tendance('7d', 5, maintenant)
+            self.assertAlmostEqual(lieu.score_tendance, attendu, places=9)
+
+
+class ContexteVisiteurTests(APITestCase):
+    """Données de l'utilisateur courant chargées une fois par requête (places/contexte.py)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.utilisateur = User.objects.create_user('voyageur')
+        cls.lieu = creer_lieu('Porto', Pays.objects.create(code_iso='PRT', nom='Portugal'))
+
+    def test_voyage_cree_marque_la_visite(self):
+        for serializer_class in (VoyageCreateWithMediaSerializer, VoyageSerializer):
+            requete = RequestFactory().post('/api/voyages/')
+            requete.user = self.utilisateur
+            # Lieux visités déjà chargés dans la requête, avant la création
+            contexte = ContexteVisiteur.pour_requete(requete)
+            self.assertFalse(contexte.a_visite(self.lieu.id))
+            serializer = serializer_class(
+                data={'lieu_id': str(self.lieu.id), 'date_debut': '2024-05-01'}, context={'request': requete}
+            )
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+            serializer.save()
+            with self.assertNumQueries(0):
+                self.assertTrue(contexte.a_visite(self.lieu.id), serializer_class.__name__)
+            Voyage.objects.all().delete()
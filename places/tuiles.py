@@ -0,0 +1,177 @@
+"""Tuiles vectorielles des lieux (format Mapbox Vector Tile) et leur cache disque
+
+L'encodage protobuf est écrit à la main : une tuile ne contient qu'une couche de points,
+ce qui ne justifie pas une dépendance. Les tuiles sont mises en cache sous
+TUILES_CACHE_DIR/TUILES_VERSION/z/x/y.mvt ; changer TUILES_VERSION invalide tout le jeu,
+et la modification d'un lieu n'efface que les tuiles qui le contiennent.
+"""
+import os
+import shutil
+import struct
+import tempfile
+
+from django.conf import settings
+from django.db import transaction
+
+from .spatial import bbox_tuile, filtre_bbox, mercator, tuile_point
+
+TYPE_MIME = 'application/vnd.mapbox-vector-tile'
+ZOOM_MAX_TUILES = 22
+ETENDUE = 4096
+# Nombre maximal de lieux par tuile, les plus visités d'abord
+LIEUX_MAX_TUILE = 4096
+COUCHE_LIEUX = 'lieux'
+
+
+def _varint(valeur):
+    octets = bytearray()
+    while True:
+        octet = valeur & 0x7F
+        valeur >>= 7
+        if valeur:
+            octets.append(octet | 0x80)
+        else:
+            octets.append(octet)
+            return bytes(octets)
+
+
+def _zigzag(valeur):
+    return (valeur << 1) ^ (valeur >> 63)
+
+
+def _cle(champ, type_fil):
+    return _varint((champ << 3) | type_fil)
+
+
+def _message(champ, contenu):
+    """Champ de longueur délimitée (chaîne, message imbriqué ou liste compacte)"""
+    return _cle(champ, 2) + _varint(len(contenu)) + contenu
+
+
+def _valeur(valeur):
+    """Message Value d'un attribut"""
+    if isinstance(valeur, str):
+        return _message(1, valeur.encode('utf-8'))
+    if isinstance(valeur, bool):
+        return _cle(7, 0) + _varint(int(valeur))
+    if isinstance(valeur, int):
+        return _cle(5, 0) + _varint(valeur) if valeur >= 0 else _cle(6, 0) + _varint(_zigzag(valeur))
+    return _cle(3, 1) + struct.pack('<d', float(valeur))
+
+
+def encoder_tuile(nom_couche, elements, etendue=ETENDUE):
+    """Encode une couche de points [(x, y, attributs)] en tuile vectorielle
+
+    x et y sont exprimés dans le repère de la tuile (0 à etendue) ; les attributs None sont omis.
+    """
+    cles, valeurs, features = {}, {}, []
+    for x, y, attributs in elements:
+        tags = []
+        for nom, valeur in attributs.items():
+            if valeur is None:
+                continue
+            encodee = _valeur(valeur)
+            tags.append(cles.setdefault(nom, len(cles)))
+            tags.append(valeurs.setdefault(encodee, len(valeurs)))
+        # MoveTo (commande 1, une fois) puis le point en coordonnées zigzag
+        geometrie = _varint(9) + _varint(_zigzag(x)) + _varint(_zigzag(y))
+        features.append(_message(
+            2,
+            _message(2, b''.join(_varint(tag) for tag in tags))
+            + _cle(3, 0) + _varint(1)
+            + _message(4, geometrie),
+        ))
+    if not features:
+        return b''
+    couche = (
+        _cle(15, 0) + _varint(2)
+        + _message(1, nom_couche.encode('utf-8'))
+        + b''.join(features)
+        + b''.join(_message(3, cle.encode('utf-8')) for cle in cles)
+        + b''.join(_message(4, valeur) for valeur in valeurs)
+        + _cle(5, 0) + _varint(etendue)
+    )
+    return _message(3, couche)
+
+
+def construire_tuile_lieux(z, x, y):
+    """Tuile z/x/y des lieux avec leur nombre de voyages et leur note moyenne"""
+    from .models import Lieu
+
+    taille = 1 << z
+    lignes = Lieu.objects.filter(filtre_bbox(*bbox_tuile(z, x, y))).order_by('-nombre_voyages', 'id').values_list(
+        'id', 'nom_ville', 'pays_id', 'latitude', 'longitude', 'nombre_voyages', 'nombre_notes', 'somme_notes'
+    )[:LIEUX_MAX_TUILE]
+    elements = []
+    for pk, nom_ville, pays, latitude, longitude, nombre_voyages, nombre_notes, somme_notes in lignes:
+        # Un point sur un bord appartient à une seule tuile, celle que l'invalidation retrouve
+        if tuile_point(latitude, longitude, z) != (x, y):
+            continue
+        mx, my = mercator(latitude, longitude)
+        elements.append((
+            round((mx * taille - x) * ETENDUE),
+            round((my * taille - y) * ETENDUE),
+            {
+                'id': str(pk),
+                'nom_ville': nom_ville,
+                'pays': pays,
+                'nombre_voyages': nombre_voyages,
+                'note_moyenne': somme_notes / nombre_notes if nombre_notes else None,
+            },
+        ))
+    return encoder_tuile(COUCHE_LIEUX, elements)
+
+
+def _dossier_cache():
+    return os.path.join(settings.TUILES_CACHE_DIR, str(settings.TUILES_VERSION))
+
+
+def chemin_tuile(z, x, y):
+    return os.path.join(_dossier_cache(), str(z), str(x), f'{y}.mvt')
+
+
+def lire_tuile(z, x, y):
+    """Contenu de la tuile en cache, None si elle n'y est pas"""
+    try:
+        with open(chemin_tuile(z, x, y), 'rb') as fichier:
+            return fichier.read()
+    except FileNotFoundError:
+        return None
+
+
+def ecrire_tuile(z, x, y, contenu):
+    """Écrit la tuile en cache de façon atomique (fichier temporaire puis renommage)"""
+    chemin = chemin_tuile(z, x, y)
+    os.makedirs(os.path.dirname(chemin), exist_ok=True)
+    descripteur, temporaire = tempfile.mkstemp(dir=os.path.dirname(chemin), suffix='.tmp')
+    try:
+        with os.fdopen(descripteur, 'wb') as fichier:
+            fichier.write(contenu)
+        os.replace(temporaire, chemin)
+    except BaseException:
+        os.unlink(temporaire)
+        raise
+
+
+def _supprimer_tuiles(points):
+    for latitude, longitude in points:
+        for z in range(ZOOM_MAX_TUILES + 1):
+            try:
+                os.unlink(chemin_tuile(z, *tuile_point(latitude, longitude, z)))
+            except FileNotFoundError:
+                pass
+
+
+def invalider_tuiles(points):
+    """Efface du cache, après la validation de la transaction, les tuiles de tous les zooms contenant ces points
+
+    Effacer après le commit évite qu'une requête concurrente remette en cache l'état précédent.
+    """
+    points = [(latitude, longitude) for latitude, longitude in points]
+    if points:
+        transaction.on_commit(lambda: _supprimer_tuiles(points))
+
+
+def vider_cache_tuiles():
+    """Efface toutes les tuiles de la version courante"""
+    shutil.rmtree(_dossier_cache(), ignore_errors=True)
@@ -10,6 +10,7 @@ router.register(r'voyages', views.VoyageViewSet, basename='voyage')
 router.register(r'favoris', views.FavoriViewSet, basename='favori')
 router.register(r'activites', views.ActiviteViewSet, basename='activite')
 router.register(r'notes-activites', views.NoteActiviteViewSet, basename='noteactivite')
+router.register(r'uploads', views.TeleversementViewSet, basename='televersement')
 
 urlpatterns = [
     # Endpoints d'authentification
@@ -25,10 +26,17 @@ urlpatterns = [
     path('profile/', views.UserProfileView.as_view(), name='user-profile'),
     path('lieux/<uuid:lieu_id>/detail/', views.LieuDetailView.as_view(), name='lieu-detail'),
     path('search/', views.SearchView.as_view(), name='search'),
+    path('autocomplete/', views.AutocompleteView.as_view(), name='autocomplete'),
+    path('geocode/', views.GeocodeView.as_view(), name='geocode'),
+    path('geocode/reverse/', views.ReverseGeocodeView.as_view(), name='geocode-reverse'),
+    path('tiles/<int:z>/<int:x>/<int:y>', views.tuile_lieux, name='tuile-lieux'),
     
     # Endpoint pour les suggestions personnalisées
     path('suggestions/', views.SuggestionsView.as_view(), name='suggestions'),
     
+    # Classement des utilisateurs par score
+    path('leaderboard/', views.LeaderboardView.as_view(), name='leaderboard'),
+    
     # Nouvel endpoint pour le profil public des autres utilisateurs
     path('users/<int:user_id>/profile/', views.UserPublicProfileView.as_view(), name='user-public-profile'),
 ] 
\ No newline at end of file
@@ -1,27 +1,142 @@
-from django.http import JsonResponse
-from rest_framework import status, viewsets, permissions
+import hashlib
+import os
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.http import require_GET, require_http_methods
+from rest_framework import generics, mixins, status, viewsets, permissions
 from rest_framework.decorators import api_view, permission_classes, action
-from rest_framework.permissions import AllowAny, IsAuthenticated, BasePermission
+from rest_framework.permissions import AllowAny, IsAuthenticated, IsAuthenticatedOrReadOnly, BasePermission
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from django.contrib.auth import authenticate
 from django.shortcuts import get_object_or_404
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import Value
+from django.utils import timezone
 from .serializers import (
     RegisterSerializer, LoginSerializer, UserSerializer,
     PaysSerializer, LieuSerializer, LieuListSerializer,
     VoyageSerializer, VoyageCreateSerializer,
     FavoriSerializer, FavoriCreateSerializer, UserStatsSerializer,
     VoyageCreateWithMediaSerializer, ActiviteSerializer, ActiviteListSerializer,
-    NoteActiviteSerializer, ActiviteCreateWithMediaSerializer, UserProfileSerializer, UserPublicProfileSerializer
+    NoteActiviteSerializer, ActiviteCreateWithMediaSerializer, UserProfileSerializer, UserPublicProfileSerializer,
+    BboxSerializer, NearbySerializer, LieuProcheSerializer, ClustersSerializer,
+    GeocodeSerializer, ReverseGeocodeSerializer, VilleGazetteerSerializer,
+    LieuTendanceSerializer, TrendingSerializer, ClassementSerializer, MediaVoyageSerializer, MediaActiviteSerializer,
+    TeleversementSerializer, FinalisationTeleversementSerializer
+)
+from .autocomplete import IndexIndisponible, LIMITE_MAX as LIMITE_MAX_AUTOCOMPLETION, get_index as get_index_autocompletion
+from .geocodage import ville_la_plus_proche
+from .search import rechercher_lieux, rechercher_pays, rechercher_villes
+from .suggestions import (
+    COVISITATION, FAVORIS, STRATEGIES, cle_cache as cle_cache_suggestions, suggerer_lieux,
+    suggerer_lieux_covisitation,
+)
+from .service_medias import CACHE_IMMUABLE, est_immuable, etag as etag_media, lire_plage, plage_demandee, type_servi
+from .spatial import NIVEAU_MAX_GROUPES, filtre_bbox, plages_cellules_mercator, plus_proches
+from .stockage import DOSSIER_TEMPORAIRE
+from .televersements import MorceauIncomplet, analyser_content_range, chemin_partiel, ecrire_morceau, empreinte_fichier
+from .tendances import lieux_tendance
+from .tuiles import TYPE_MIME, ZOOM_MAX_TUILES, construire_tuile_lieux, ecrire_tuile, lire_tuile
+from .models import (
+    Pays, Lieu, Voyage, Favori, MediaVoyage, Activite, NoteActivite, MediaActivite, UserProfile, GroupeLieux,
+    EffectifScore, TeleversementMedia, MorceauTeleversement
 )
-from .models import Pays, Lieu, Voyage, Favori, MediaVoyage, Activite, NoteActivite, MediaActivite, UserProfile
 
 def ping(request):
     return JsonResponse({"message": "pong"})
 
+@require_GET
+def tuile_lieux(request, z, x, y):
+    """Tuile vectorielle z/x/y des lieux, servie depuis le cache disque et construite au premier accès"""
+    if z > ZOOM_MAX_TUILES or x >= 1 << z or y >= 1 << z:
+        raise Http404
+    contenu = lire_tuile(z, x, y)
+    if contenu is None:
+        contenu = construire_tuile_lieux(z, x, y)
+        ecrire_tuile(z, x, y, contenu)
+    
+    etag = f'"{settings.TUILES_VERSION}-{hashlib.sha1(contenu).hexdigest()[:20]}"'
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(contenu, content_type=TYPE_MIME)
+    response['ETag'] = etag
+    response['Cache-Control'] = f'public, max-age={settings.TUILES_MAX_AGE}'
+    return response
+
+@require_http_methods(['GET', 'HEAD'])
+def servir_media(request, chemin):
+    """Fichier de MEDIA_ROOT : requêtes partielles (Range), réponses 304, cache long (places/service_medias.py)"""
+    try:
+        chemin_complet = safe_join(settings.MEDIA_ROOT, chemin)
+    except SuspiciousFileOperation:
+        raise Http404
+    if chemin.startswith(DOSSIER_TEMPORAIRE + '/') or not os.path.isfile(chemin_complet):
+        raise Http404
+    stat = os.stat(chemin_complet)
+    validateur = etag_media(chemin, stat)
+    derniere_modification = http_date(stat.st_mtime)
+    
+    response = get_conditional_response(request, etag=validateur, last_modified=int(stat.st_mtime))
+    if response is None:
+        response = _reponse_media(request, chemin, chemin_complet, stat.st_size, validateur, derniere_modification)
+    response['ETag'] = validateur
+    response['Last-Modified'] = derniere_modification
+    response['Cache-Control'] = CACHE_IMMUABLE if est_immuable(chemin) else f'public, max-age={settings.MEDIAS_MAX_AGE}'
+    response['Accept-Ranges'] = 'bytes'
+    # Avec X-Accel-Redirect, nginx garde Content-Type et Content-Disposition ; nosniff est aussi
+    # posé par l'emplacement interne (docs/medias.md)
+    response['X-Content-Type-Options'] = 'nosniff'
+    if type_servi(chemin) is None:
+        # Ni image ni vidéo acceptée : téléchargé, jamais affiché par le navigateur
+        response['Content-Disposition'] = 'attachment'
+    return response
+
+def _reponse_media(request, chemin, chemin_complet, taille, validateur, derniere_modification):
+    content_type = type_servi(chemin) or 'application/octet-stream'
+    if settings.MEDIAS_X_ACCEL_REDIRECT:
+        # nginx sert le fichier (et la plage demandée) depuis son emplacement interne
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = settings.MEDIAS_X_ACCEL_REDIRECT.rstrip('/') + '/' + quote(chemin)
+        return response
+    
+    plage = None
+    # If-Range : la plage n'est servie que si le fichier n'a pas changé depuis la première réponse
+    if 'Range' in request.headers and request.headers.get('If-Range', validateur) in (validateur, derniere_modification):
+        try:
+            plage = plage_demandee(request.headers['Range'], taille)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{taille}'
+            return response
+    debut, fin = plage or (0, taille - 1)
+    longueur = fin - debut + 1 if taille else 0
+    
+    if request.method == 'HEAD':
+        response = HttpResponse(content_type=content_type)
+    elif fin == taille - 1:
+        # Jusqu'à la fin du fichier : envoi sans copie par le serveur WSGI (wsgi.file_wrapper)
+        fichier = open(chemin_complet, 'rb')
+        fichier.seek(debut)
+        response = FileResponse(fichier, content_type=content_type)
+    else:
+        response = StreamingHttpResponse(lire_plage(open(chemin_complet, 'rb'), debut, longueur), content_type=content_type)
+    response['Content-Length'] = longueur
+    if plage is not None:
+        response.status_code = 206
+        response['Content-Range'] = f'bytes {debut}-{fin}/{taille}'
+    return response
+
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def register(request):
@@ -64,24 +179,27 @@ class PaysViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Pays.objects.all()
     serializer_class = PaysSerializer
     permission_classes = [AllowAny]
+    pagination_ordering = ('nom',)
     
-    @action(detail=False, methods=['get'])
+    @action(detail=False, methods=['get'], pagination_ordering=('-pertinence', 'nom'))
     def search(self, request):
-        """Recherche de pays par nom"""
+        """Recherche de pays par nom, sans tenir compte des accents, classée par pertinence"""
         query = request.query_params.get('q', '')
         if query:
-            pays = Pays.objects.filter(nom__icontains=query)
+            pays = rechercher_pays(query)
         else:
-            pays = Pays.objects.all()
+            pays = Pays.objects.annotate(pertinence=Value(0.0))
         
-        serializer = self.get_serializer(pays, many=True)
-        return Response(serializer.data)
+        page = self.paginate_queryset(pays)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
 class LieuViewSet(viewsets.ModelViewSet):
     """ViewSet pour les lieux"""
-    queryset = Lieu.objects.all()
+    queryset = Lieu.objects.select_related('pays')
     serializer_class = LieuSerializer
     permission_classes = [AllowAny]
+    pagination_ordering = ('nom_ville', 'id')
     
     def get_serializer_class(self):
         """Utilise un serializer différent selon l'action"""
@@ -89,37 +207,125 @@ class LieuViewSet(viewsets.ModelViewSet):
             return LieuListSerializer
         return LieuSerializer
     
-    @action(detail=False, methods=['get'])
+    @action(detail=False, methods=['get'], pagination_ordering=('-pertinence', 'id'))
     def search(self, request):
-        """Recherche de lieux par nom de ville"""
+        """Recherche de lieux par nom de ville ou de pays, sans tenir compte des accents, classée par pertinence"""
         query = request.query_params.get('q', '')
         if query:
-            lieux = Lieu.objects.filter(
-                Q(nom_ville__icontains=query) | 
-                Q(pays__nom__icontains=query)
-            )
+            lieux = rechercher_lieux(query, Lieu.objects.select_related('pays'))
         else:
-            lieux = Lieu.objects.all()
+            lieux = Lieu.objects.select_related('pays').annotate(pertinence=Value(0.0))
         
-        serializer = LieuListSerializer(lieux, many=True)
-        return Response(serializer.data)
+        page = self.paginate_queryset(lieux)
+        serializer = LieuListSerializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+    
+    # Colonnes des lignes compactes renvoyées pour la carte
+    COLONNES_LIEUX = ['id', 'nom_ville', 'pays', 'latitude', 'longitude', 'nombre_voyages']
+    COLONNES_GROUPES = ['latitude', 'longitude', 'nombre', 'south', 'west', 'north', 'east']
+    # Nombre maximal de cellules de regroupement lues pour une fenêtre
+    GROUPES_MAX_FENETRE = 2048
+    
+    def _lignes_lieux(self, fenetre):
+        """Lieux d'une fenêtre en lignes compactes, triés par cellule spatiale et tronqués à limit"""
+        limit = fenetre['limit']
+        lignes = list(
+            Lieu.objects.filter(
+                filtre_bbox(fenetre['south'], fenetre['west'], fenetre['north'], fenetre['east'])
+            ).order_by('cellule_spatiale').values_list(
+                'id', 'nom_ville', 'pays_id', 'latitude', 'longitude', 'nombre_voyages'
+            )[:limit + 1]
+        )
+        return [
+            [str(pk), nom, pays, float(lat), float(lon), nb_voyages]
+            for pk, nom, pays, lat, lon, nb_voyages in lignes[:limit]
+        ], len(lignes) > limit
     
-    @action(detail=True, methods=['get'])
+    @action(detail=False, methods=['get'])
+    def bbox(self, request):
+        """Lieux contenus dans une fenêtre de carte, en lignes compactes (index spatial par cellules)"""
+        params = BboxSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        lieux, tronque = self._lignes_lieux(params.validated_data)
+        return Response({'colonnes': self.COLONNES_LIEUX, 'lieux': lieux, 'tronque': tronque})
+    
+    @action(detail=False, methods=['get'])
+    def clusters(self, request):
+        """Groupes de lieux précalculés pour un zoom et une fenêtre, ou lieux individuels aux zooms élevés"""
+        params = ClustersSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        fenetre = params.validated_data
+        
+        if fenetre['zoom'] > NIVEAU_MAX_GROUPES:
+            lieux, tronque = self._lignes_lieux(fenetre)
+            return Response({'colonnes': self.COLONNES_LIEUX, 'lieux': lieux, 'tronque': tronque})
+        
+        # Une fenêtre trop large pour son zoom est servie au niveau plus grossier qui tient dans la limite
+        niveau = fenetre['zoom']
+        bornes = (fenetre['south'], fenetre['west'], fenetre['north'], fenetre['east'])
+        while niveau > 0 and sum(
+            (x_max - x_min + 1) * (y_max - y_min + 1)
+            for (x_min, x_max), (y_min, y_max) in plages_cellules_mercator(*bornes, niveau)
+        ) > self.GROUPES_MAX_FENETRE:
+            niveau -= 1
+        
+        groupes = [
+            [
+                *groupe.get_centre(), groupe.nombre,
+                groupe.latitude_min, groupe.longitude_min, groupe.latitude_max, groupe.longitude_max,
+            ]
+            for groupe in GroupeLieux.dans_fenetre(*bornes, niveau).filter(nombre__gt=0)
+        ]
+        return Response({'niveau': niveau, 'colonnes': self.COLONNES_GROUPES, 'groupes': groupes})
+    
+    @action(detail=False, methods=['get'])
+    def nearby(self, request):
+        """Les k lieux les plus proches d'un point (distance orthodromique), avec leurs activités"""
+        params = NearbySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        point = params.validated_data
+        
+        voisins = plus_proches(Lieu.objects.all(), point['lat'], point['lon'], point['k'], point['radius_km'])
+        lieux = LieuProcheSerializer.setup_eager_loading(Lieu.objects.filter(pk__in=[pk for _, pk in voisins]))
+        lieux = {lieu.pk: lieu for lieu in lieux}
+        resultats = []
+        for distance, pk in voisins:
+            lieu = lieux.get(pk)
+            if lieu is None:
+                continue
+            lieu.distance_km = distance
+            resultats.append(lieu)
+        return Response(LieuProcheSerializer(resultats, many=True).data)
+    
+    @action(detail=False, methods=['get'])
+    def trending(self, request):
+        """Lieux les plus en vogue sur une fenêtre (scores à décroissance exponentielle maintenus en base)"""
+        params = TrendingSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        fenetre = params.validated_data['window']
+        lieux = lieux_tendance(fenetre, params.validated_data['limit'])
+        return Response({'window': fenetre, 'resultats': LieuTendanceSerializer(lieux, many=True).data})
+    
+    @action(detail=True, methods=['get'], pagination_ordering=('-date_debut', 'id'))
     def voyages(self, request, pk=None):
         """Récupère les voyages pour un lieu spécifique"""
         lieu = self.get_object()
-        voyages = lieu.voyages.all()
-        serializer = VoyageSerializer(voyages, many=True)
-        return Response(serializer.data)
+        voyages = lieu.voyages.select_related('lieu__pays', 'utilisateur').prefetch_related('medias')
+        page = self.paginate_queryset(voyages)
+        serializer = VoyageSerializer(page, many=True, context=self.get_serializer_context())
+        return self.get_paginated_response(serializer.data)
 
 class VoyageViewSet(viewsets.ModelViewSet):
     """ViewSet pour les voyages"""
     serializer_class = VoyageSerializer
     permission_classes = [IsAuthenticated]
+    pagination_ordering = ('-date_debut', 'id')
     
     def get_queryset(self):
         """Retourne seulement les voyages de l'utilisateur connecté"""
-        return Voyage.objects.filter(utilisateur=self.request.user)
+        return Voyage.objects.filter(utilisateur=self.request.user).select_related(
+            'lieu__pays', 'utilisateur'
+        ).prefetch_related('medias')
     
     def get_serializer_class(self):
         """Utilise un serializer différent selon l'action"""
@@ -139,14 +345,105 @@ class VoyageViewSet(viewsets.ModelViewSet):
         except Voyage.DoesNotExist:
             return Response({'error': 'Voyage non trouvé'}, status=status.HTTP_404_NOT_FOUND)
 
+class TeleversementViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, mixins.DestroyModelMixin,
+                           viewsets.GenericViewSet):
+    """Téléversement des médias par morceaux, reprenable (protocole décrit dans places/televersements.py)"""
+    serializer_class = TeleversementSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        """Sessions non expirées de l'utilisateur connecté"""
+        return TeleversementMedia.objects.filter(utilisateur=self.request.user, date_expiration__gt=timezone.now())
+    
+    def update(self, request, *args, **kwargs):
+        """Reçoit un morceau (PUT, en-têtes Content-Range et X-Chunk-SHA256), écrit sur disque au fil de la lecture
+
+        La session reste verrouillée pendant l'écriture : la finalisation attend les morceaux en cours,
+        aucun ne peut plus écrire dans le fichier une fois celui-ci rangé dans le stockage.
+        """
+        with transaction.atomic():
+            televersement = get_object_or_404(self.get_queryset().select_for_update(), pk=kwargs['pk'])
+            return self._recevoir_morceau(request, televersement)
+    
+    def _recevoir_morceau(self, request, televersement):
+        if televersement.etat != TeleversementMedia.EN_COURS:
+            return Response({'error': 'Téléversement déjà terminé'}, status=status.HTTP_409_CONFLICT)
+        try:
+            debut, fin, total = analyser_content_range(request.headers.get('Content-Range'))
+        except ValueError as erreur:
+            return Response({'error': str(erreur)}, status=status.HTTP_400_BAD_REQUEST)
+        longueur = fin - debut + 1
+        index, decalage = divmod(debut, televersement.taille_morceau)
+        if (
+            total != televersement.taille or decalage
+            or longueur != min(televersement.taille_morceau, televersement.taille - debut)
+        ):
+            return Response(
+                {'error': f'Un morceau couvre {televersement.taille_morceau} octets alignés (le dernier, le reste du fichier)'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        empreinte_annoncee = request.headers.get('X-Chunk-SHA256', '').lower()
+        if len(empreinte_annoncee) != 64:
+            return Response({'error': 'En-tête X-Chunk-SHA256 attendu'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # request.stream lit le corps au fil de l'eau (request.data le chargerait en entier)
+        try:
+            empreinte = ecrire_morceau(televersement, request.stream, debut, longueur)
+        except MorceauIncomplet:
+            return Response({'error': 'Morceau incomplet, à renvoyer'}, status=status.HTTP_400_BAD_REQUEST)
+        except FileNotFoundError:
+            # Fichier partiel supprimé (session finalisée ou abandonnée)
+            return Response({'error': 'Téléversement terminé ou abandonné'}, status=status.HTTP_409_CONFLICT)
+        if empreinte != empreinte_annoncee:
+            return Response({'error': 'Empreinte du morceau incorrecte, à renvoyer'}, status=status.HTTP_400_BAD_REQUEST)
+        MorceauTeleversement.objects.update_or_create(
+            televersement=televersement, index=index, defaults={'taille': longueur, 'sha256': empreinte}
+        )
+        return Response({'index': index, 'nombre_recus': televersement.morceaux.count(),
+                         'nombre_morceaux': televersement.nombre_morceaux})
+    
+    @action(detail=True, methods=['post'])
+    def complete(self, request, pk=None):
+        """Rattache le fichier complet à un voyage ou à une activité ; répétable sans doublon"""
+        with transaction.atomic():
+            # Session introuvable (ou d'un autre utilisateur) avant toute validation : 404
+            televersement = get_object_or_404(self.get_queryset().select_for_update(), pk=pk)
+            serializer = FinalisationTeleversementSerializer(data=request.data, context={'request': request})
+            serializer.is_valid(raise_exception=True)
+            if televersement.etat == TeleversementMedia.TERMINE:
+                media = televersement.media_voyage or televersement.media_activite
+                if media is None:
+                    return Response({'error': 'Média supprimé depuis'}, status=status.HTTP_410_GONE)
+                statut = status.HTTP_200_OK
+            else:
+                recus = set(televersement.morceaux.values_list('index', flat=True))
+                manquants = [index for index in range(televersement.nombre_morceaux) if index not in recus]
+                if manquants:
+                    return Response(
+                        {'error': 'Morceaux manquants', 'morceaux_manquants': manquants},
+                        status=status.HTTP_409_CONFLICT
+                    )
+                if televersement.sha256 and empreinte_fichier(chemin_partiel(televersement)) != televersement.sha256:
+                    # Morceaux corrompus sans qu'on sache lesquels : tout est à renvoyer
+                    televersement.morceaux.all().delete()
+                    return Response(
+                        {'error': 'Empreinte du fichier incorrecte, morceaux à renvoyer'},
+                        status=status.HTTP_409_CONFLICT
+                    )
+                media = televersement.attacher(**serializer.validated_data)
+                statut = status.HTTP_201_CREATED
+        serializer_media = MediaVoyageSerializer if televersement.media_voyage_id else MediaActiviteSerializer
+        return Response(serializer_media(media, context={'request': request}).data, status=statut)
+
 class FavoriViewSet(viewsets.ModelViewSet):
     """ViewSet pour les favoris"""
     serializer_class = FavoriSerializer
     permission_classes = [IsAuthenticated]
+    pagination_ordering = ('-date_ajout', 'id')
     
     def get_queryset(self):
         """Retourne seulement les favoris de l'utilisateur connecté"""
-        return Favori.objects.filter(utilisateur=self.request.user)
+        return Favori.objects.filter(utilisateur=self.request.user).select_related('lieu__pays', 'utilisateur')
     
     def perform_create(self, serializer):
         """Crée un favori en assignant l'utilisateur connecté"""
@@ -221,6 +518,22 @@ class UserPublicProfileView(APIView):
         except UserProfile.DoesNotExist:
             return Response({'error': 'Profil non trouvé'}, status=status.HTTP_404_NOT_FOUND)
 
+class LeaderboardView(generics.ListAPIView):
+    """Classement des utilisateurs par score total, paginé par curseur sur l'index (score_total, id)
+    
+    Le rang de chaque ligne est lu dans le cache de rang (EffectifScore), ex aequo au même rang.
+    """
+    permission_classes = [AllowAny]
+    serializer_class = ClassementSerializer
+    queryset = UserProfile.objects.select_related('utilisateur')
+    pagination_ordering = ('-score_total', 'id')
+    
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.get_queryset())
+        rangs = EffectifScore.rangs(profil.score_total for profil in page)
+        serializer = self.get_serializer(page, many=True, context={**self.get_serializer_context(), 'rangs': rangs})
+        return self.get_paginated_response(serializer.data)
+
 class LieuDetailView(APIView):
     """Vue détaillée pour un lieu avec ses voyages et favoris"""
     permission_classes = [AllowAny]
@@ -229,7 +542,7 @@ class LieuDetailView(APIView):
     def get(self, request, lieu_id):
         """Récupère les détails d'un lieu"""
         try:
-            lieu = Lieu.objects.get(id=lieu_id)
+            lieu = Lieu.objects.select_related('pays').get(id=lieu_id)
         except Lieu.DoesNotExist:
             return Response({'error': 'Lieu non trouvé'}, status=status.HTTP_404_NOT_FOUND)
         
@@ -247,7 +560,7 @@ class LieuDetailView(APIView):
         lieu_data = LieuSerializer(lieu).data
         lieu_data['is_favori'] = is_favori
         lieu_data['user_voyages'] = VoyageSerializer(all_voyages, many=True).data
-        lieu_data['total_voyages'] = all_voyages.count()
+        lieu_data['total_voyages'] = lieu.nombre_voyages
         
         return Response(lieu_data)
 
@@ -255,6 +568,7 @@ class ActiviteViewSet(viewsets.ModelViewSet):
     """ViewSet pour les activités"""
     serializer_class = ActiviteSerializer
     authentication_classes = [JWTAuthentication]  # Forcer l'authentification JWT sur toutes les actions
+    pagination_ordering = ('-date_creation', 'id')
     
     def get_permissions(self):
         """Permissions différentes selon l'action"""
@@ -268,7 +582,10 @@ class ActiviteViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         """Retourne les activités avec filtrage optionnel par lieu"""
-        queryset = Activite.objects.all()
+        queryset = Activite.objects.select_related('resume_notes')
+        if self.action in ['list', 'retrieve']:
+            # Plan de requêtes borné : relations jointes et aperçus notes/médias préchargés
+            queryset = ActiviteListSerializer.setup_eager_loading(queryset)
         
         # Filtrer par lieu si le paramètre lieu_id est fourni
         lieu_id = self.request.query_params.get('lieu_id')
@@ -289,29 +606,8 @@ class ActiviteViewSet(viewsets.ModelViewSet):
         """S'assure que le contexte utilisateur est toujours passé"""
         context = super().get_serializer_context()
         # Toujours inclure la requête pour que les serializers puissent accéder à l'utilisateur
+        # (et au ContexteVisiteur chargé une seule fois pour toute la requête)
         context['request'] = self.request
-        
-        # Pour les actions publiques, s'assurer que l'utilisateur est bien dans le contexte
-        if self.action in ['list', 'retrieve']:
-            # Même si l'action est publique, on veut pouvoir vérifier l'utilisateur si il est connecté
-            if self.request.user.is_authenticated:
-                print(f"🔍 DEBUG ViewSet: Utilisateur authentifié: {self.request.user.username}")
-                
-                # Debug: vérifier les voyages de l'utilisateur
-                lieu_id = self.request.query_params.get('lieu_id')
-                if lieu_id:
-                    voyages_count = self.request.user.voyages.filter(lieu_id=lieu_id).count()
-                    print(f"🔍 DEBUG ViewSet: Utilisateur a {voyages_count} voyages dans ce lieu")
-                    
-                    # Debug: vérifier le lieu
-                    try:
-                        lieu = Lieu.objects.get(id=lieu_id)
-                        print(f"🔍 DEBUG ViewSet: Lieu demandé: {lieu.nom_ville}, {lieu.pays.nom}")
-                    except Lieu.DoesNotExist:
-                        print(f"❌ DEBUG ViewSet: Lieu non trouvé")
-            else:
-                print(f"🔍 DEBUG ViewSet: Utilisateur anonyme")
-        
         return context
     
     def perform_create(self, serializer):
@@ -342,6 +638,7 @@ class NoteActiviteViewSet(viewsets.ModelViewSet):
     """ViewSet pour les notes d'activités"""
     serializer_class = NoteActiviteSerializer
     permission_classes = [IsAuthenticated]
+    pagination_ordering = ('-date_creation', 'id')
     
     def get_queryset(self):
         """Retourne seulement les notes de l'utilisateur connecté"""
@@ -369,119 +666,138 @@ class SearchView(APIView):
         if not query:
             return Response({'error': 'Paramètre de recherche requis'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Recherche dans les lieux
-        lieux = Lieu.objects.filter(
-            Q(nom_ville__icontains=query) | 
-            Q(pays__nom__icontains=query)
-        )[:10]  # Limiter à 10 résultats
+        # Recherche dans les lieux (clé normalisée indexée, les plus pertinents d'abord)
+        lieux = rechercher_lieux(query, Lieu.objects.select_related('pays')).order_by('-pertinence', 'nom_ville')[:10]
         
         # Recherche dans les pays
-        pays = Pays.objects.filter(nom__icontains=query)[:5]
+        pays = rechercher_pays(query).order_by('-pertinence', 'nom')[:5]
         
         return Response({
             'lieux': LieuListSerializer(lieux, many=True).data,
             'pays': PaysSerializer(pays, many=True).data
         })
 
-class SuggestionsView(APIView):
-    """Vue pour générer des suggestions personnalisées basées sur les favoris de l'utilisateur"""
-    permission_classes = [IsAuthenticated]
+class AutocompleteView(APIView):
+    """Autocomplétion des lieux et des pays, servie depuis l'index en mémoire (aucune requête SQL)"""
+    permission_classes = [AllowAny]
+    authentication_classes = []
     
     def get(self, request):
-        """Génère des suggestions personnalisées pour l'utilisateur connecté"""
-        user = request.user
-        suggestions = []
-        
-        # Étape 1: Même pays que les favoris
-        favoris = user.favoris.all()
-        for favori in favoris:
-            pays_favori = favori.lieu.pays
-            lieux_meme_pays = Lieu.objects.filter(
-                pays=pays_favori
-            ).exclude(
-                voyages__utilisateur=user  # Pas déjà visités
-            ).distinct()[:3]
-            suggestions.extend(lieux_meme_pays)
-        
-        # Étape 2: Même continent que les favoris
-        for favori in favoris:
-            pays_favori = favori.lieu.pays
-            continent_favori = self.get_continent(pays_favori.code_iso)
-            
-            lieux_meme_continent = Lieu.objects.filter(
-                pays__code_iso__in=self.get_pays_continent(continent_favori)
-            ).exclude(
-                voyages__utilisateur=user
-            ).exclude(
-                pays=pays_favori  # Pas du même pays
-            ).distinct()[:2]
-            suggestions.extend(lieux_meme_continent)
-        
-        # Étape 3: Lieux populaires comme fallback
-        if len(suggestions) < 6:
-            from django.db.models import Count
-            lieux_populaires = Lieu.objects.annotate(
-                nb_voyages=Count('voyages')
-            ).order_by('-nb_voyages')[:10]
-            
-            lieux_disponibles = [
-                lieu for lieu in lieux_populaires 
-                if lieu not in suggestions and 
-                not lieu.voyages.filter(utilisateur=user).exists()
-            ]
-            suggestions.extend(lieux_disponibles[:6-len(suggestions)])
-        
-        # Retourner max 6 suggestions uniques
-        suggestions_finales = list(set(suggestions))[:6]
-        
-        # Sérialiser les suggestions
-        data = LieuListSerializer(suggestions_finales, many=True).data
-        
-        return Response({
-            'suggestions': data,
-            'total': len(data),
-            'message': self.get_message_explicatif(user, favoris)
-        })
+        query = request.query_params.get('q', '')
+        try:
+            limite = max(1, min(int(request.query_params.get('limit', 10)), LIMITE_MAX_AUTOCOMPLETION))
+        except ValueError:
+            limite = 10
+        try:
+            index = get_index_autocompletion()
+        except IndexIndisponible:
+            return Response({'error': 'Autocomplétion momentanément indisponible', 'resultats': []}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return Response({'resultats': index.rechercher(query, limite)})
+
+class GeocodeView(APIView):
+    """Géocodage d'un nom de ville sur le gazetteer local (geoname_id, coordonnées et pays)"""
+    permission_classes = [AllowAny]
+    authentication_classes = []
     
-    def get_continent(self, code_pays):
-        """Mapping simple pays → continent"""
-        europe = ['FRA', 'DEU', 'ITA', 'ESP', 'GBR', 'NLD', 'BEL', 'CHE', 'AUT', 'POL', 'IRL', 'DNK', 'SWE', 'NOR', 'FIN']
-        asie = ['JPN', 'CHN', 'KOR', 'THA', 'VNM', 'IDN', 'MYS', 'SGP', 'PHL', 'IND', 'PAK', 'BGD', 'LKA']
-        amerique = ['USA', 'CAN', 'MEX', 'BRA', 'ARG', 'CHL', 'PER', 'COL', 'VE', 'EC', 'BO', 'PY', 'UY']
-        afrique = ['ZAF', 'EGY', 'MAR', 'TUN', 'KEN', 'GHA', 'NGA', 'ETH', 'UGA', 'TZA', 'ZWE', 'MWI']
-        oceanie = ['AUS', 'NZL', 'FJI', 'PNG', 'VUT', 'NCL', 'PYF']
+    def get(self, request):
+        params = GeocodeSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        requete = params.validated_data
         
-        if code_pays in europe:
-            return 'europe'
-        elif code_pays in asie:
-            return 'asie'
-        elif code_pays in amerique:
-            return 'amerique'
-        elif code_pays in afrique:
-            return 'afrique'
-        elif code_pays in oceanie:
-            return 'oceanie'
-        else:
-            return 'autre'
-    
-    def get_pays_continent(self, continent):
-        """Retourne les codes pays d'un continent"""
-        mapping = {
-            'europe': ['FRA', 'DEU', 'ITA', 'ESP', 'GBR', 'NLD', 'BEL', 'CHE', 'AUT', 'POL', 'IRL', 'DNK', 'SWE', 'NOR', 'FIN'],
-            'asie': ['JPN', 'CHN', 'KOR', 'THA', 'VNM', 'IDN', 'MYS', 'SGP', 'PHL', 'IND', 'PAK', 'BGD', 'LKA'],
-            'amerique': ['USA', 'CAN', 'MEX', 'BRA', 'ARG', 'CHL', 'PER', 'COL', 'VE', 'EC', 'BO', 'PY', 'UY'],
-            'afrique': ['ZAF', 'EGY', 'MAR', 'TUN', 'KEN', 'GHA', 'NGA', 'ETH', 'UGA', 'TZA', 'ZWE', 'MWI'],
-            'oceanie': ['AUS', 'NZL', 'FJI', 'PNG', 'VUT', 'NCL', 'PYF']
-        }
-        return mapping.get(continent, [])
-    
-    def get_message_explicatif(self, user, favoris):
-        """Génère un message explicatif personnalisé"""
-        if not favoris.exists():
+        villes = rechercher_villes(requete['q'])
+        if 'pays' in requete:
+            villes = villes.filter(code_pays=requete['pays'].upper())
+        villes = list(villes.order_by('-pertinence', '-population', 'geoname_id')[:requete['limit']])
+        # Lieux déjà créés pour ces villes, en une requête
+        lieux_par_geoname = dict(
+            Lieu.objects.filter(geoname_id__in=[ville.geoname_id for ville in villes]).values_list('geoname_id', 'id')
+        )
+        serializer = VilleGazetteerSerializer(villes, many=True, context={'lieux_par_geoname': lieux_par_geoname})
+        return Response({'resultats': serializer.data})
+
+class ReverseGeocodeView(APIView):
+    """Géocodage inverse : ville du gazetteer la plus proche d'un point (places/geocodage.py)
+    
+    En POST, le lieu de cette ville est retrouvé par geoname_id ou créé.
+    """
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    
+    def _ville(self, donnees):
+        params = ReverseGeocodeSerializer(data=donnees)
+        params.is_valid(raise_exception=True)
+        point = params.validated_data
+        return ville_la_plus_proche(point['lat'], point['lon'], point['radius_km'])
+    
+    def get(self, request):
+        resultat = self._ville(request.query_params)
+        if resultat is None:
+            return Response({'error': 'Aucune ville connue dans ce rayon'}, status=status.HTTP_404_NOT_FOUND)
+        distance, ville = resultat
+        lieux_par_geoname = dict(Lieu.objects.filter(geoname_id=ville.geoname_id).values_list('geoname_id', 'id'))
+        donnees = VilleGazetteerSerializer(ville, context={'lieux_par_geoname': lieux_par_geoname}).data
+        donnees['distance_km'] = distance
+        return Response(donnees)
+    
+    def post(self, request):
+        resultat = self._ville(request.data)
+        if resultat is None:
+            return Response({'error': 'Aucune ville connue dans ce rayon'}, status=status.HTTP_404_NOT_FOUND)
+        distance, ville = resultat
+        lieu, cree = ville.obtenir_lieu()
+        donnees = VilleGazetteerSerializer(ville, context={'lieux_par_geoname': {ville.geoname_id: lieu.pk}}).data
+        donnees['distance_km'] = distance
+        return Response(
+            {'ville': donnees, 'lieu': LieuSerializer(lieu).data},
+            status=status.HTTP_201_CREATED if cree else status.HTTP_200_OK,
+        )
+
+class SuggestionsView(APIView):
+    """Vue pour générer des suggestions personnalisées (places/suggestions.py)
+    
+    `?strategie=favoris` (par défaut) : pays et continents des favoris ; `?strategie=covisitation` :
+    lieux visités par les voyageurs qui ont visité les mêmes lieux que l'utilisateur.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        """Génère des suggestions personnalisées pour l'utilisateur connecté, en cache jusqu'à sa prochaine écriture"""
+        strategie = request.query_params.get('strategie', FAVORIS)
+        if strategie not in STRATEGIES:
+            return Response(
+                {'error': f"Stratégie inconnue, valeurs possibles : {', '.join(STRATEGIES)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        cle = cle_cache_suggestions(request.user.pk, strategie)
+        reponse = cache.get(cle)
+        if reponse is None:
+            if strategie == COVISITATION:
+                lieux, nombre_recommandes = suggerer_lieux_covisitation(request.user)
+                message = self.get_message_covisitation(nombre_recommandes)
+            else:
+                lieux, pays_favoris = suggerer_lieux(request.user)
+                message = self.get_message_explicatif(pays_favoris)
+            data = list(LieuListSerializer(lieux, many=True).data)
+            reponse = {
+                'suggestions': data,
+                'total': len(data),
+                'strategie': strategie,
+                'message': message
+            }
+            cache.set(cle, reponse, settings.SUGGESTIONS_CACHE_TTL)
+        return Response(reponse)
+    
+    def get_message_explicatif(self, pays_favoris):
+        """Génère un message explicatif à partir des pays des favoris (les plus récents d'abord)"""
+        if not pays_favoris:
             return "Découvrez des destinations populaires"
         
-        pays_favoris = [f.lieu.pays.nom for f in favoris[:2]]
         if len(pays_favoris) == 1:
             return f"Basé sur vos favoris en {pays_favoris[0]}"
         else:
             return f"Basé sur vos favoris en {pays_favoris[0]} et {pays_favoris[1]}"
+    
+    def get_message_covisitation(self, nombre_recommandes):
+        """Message des suggestions par co-visitation"""
+        if not nombre_recommandes:
+            return "Découvrez des destinations populaires"
+        return "Les voyageurs qui ont visité les mêmes lieux que vous ont aussi visité ces destinations"
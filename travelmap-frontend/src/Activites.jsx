@@ -1,4 +1,5 @@
 import React, { useState, useEffect } from 'react';
+import { readAllPages } from './api';
 
 const Activites = () => {
   const [lieuxVisites, setLieuxVisites] = useState([]);
@@ -112,7 +113,9 @@ const Activites = () => {
       });
 
       if (response.ok) {
-        const data = await response.json();
+        const data = await readAllPages(response, {
+          headers: { 'Authorization': `Bearer ${token}` }
+        });
         // Filtrer pour ne garder que les activités créées par l'utilisateur connecté
         const userData = JSON.parse(localStorage.getItem('user') || '{}');
         const userActivites = data.filter(activite => 
@@ -151,7 +154,9 @@ const Activites = () => {
       });
 
       if (response.ok) {
-        const data = await response.json();
+        const data = await readAllPages(response, {
+          headers: { 'Authorization': `Bearer ${token}` }
+        });
         setVoyages(data);
       } else if (response.status === 401) {
         console.error('❌ Erreur 401: Token invalide ou expiré');
@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import VoyageDetail from './VoyageDetail';
 import ActiviteDetail from './ActiviteDetail';
+import { readAllPages } from './api';
 
 const Dashboard = ({ setViewingUserId, setCurrentPage, onNavigateToLieu }) => {
   // États communs
@@ -216,7 +217,9 @@ const clearFiles = () => {
       });
 
       if (response.ok) {
-        const data = await response.json();
+        const data = await readAllPages(response, {
+          headers: { 'Authorization': `Bearer ${token}` }
+        });
         setVoyages(data);
       } else if (response.status === 401) {
         console.error('❌ Erreur 401: Token invalide ou expiré');
@@ -243,13 +246,23 @@ const clearFiles = () => {
 
     try {
       const response = await fetch(
-        `http://api.geonames.org/searchJSON?q=${encodeURIComponent(query)}&maxRows=10&username=ourouchy&featureClass=P&featureClass=A&featureClass=T&orderby=relevance`
+        `http://localhost:8000/api/geocode/?q=${encodeURIComponent(query)}&limit=10`
       );
       
       if (response.ok) {
         const data = await response.json();
-        if (data.geonames && data.geonames.length > 0) {
-          const validPlaces = data.geonames.filter(place => 
+        // Gazetteer local du backend, ramené aux champs de l'ancienne réponse GeoNames
+        const geonames = (data.resultats || []).map(ville => ({
+          geonameId: ville.geoname_id,
+          name: ville.nom,
+          countryName: ville.pays_nom || ville.code_pays,
+          countryCode: ville.code_pays,
+          lat: ville.latitude,
+          lng: ville.longitude,
+          fcodeName: ville.population ? `${ville.population.toLocaleString('fr-FR')} hab.` : 'ville'
+        }));
+        if (geonames.length > 0) {
+          const validPlaces = geonames.filter(place => 
             place.name && 
             place.countryName && 
             place.countryCode && 
@@ -269,12 +282,12 @@ const clearFiles = () => {
           setShowSearchResults(false);
         }
       } else {
-        console.warn('Erreur lors de la recherche GeoNames:', response.status);
+        console.warn('Erreur lors du géocodage:', response.status);
         setSearchResults([]);
         setShowSearchResults(false);
       }
     } catch (error) {
-      console.error('Erreur de recherche GeoNames:', error);
+      console.error('Erreur de géocodage:', error);
       setSearchResults([]);
       setShowSearchResults(false);
     }
@@ -539,7 +552,9 @@ const clearFiles = () => {
       });
 
       if (response.ok) {
-        const data = await response.json();
+        const data = await readAllPages(response, {
+          headers: { 'Authorization': `Bearer ${token}` }
+        });
         const userData = JSON.parse(localStorage.getItem('user') || '{}');
         const userActivites = data.filter(activite => 
           activite.cree_par?.id === userData.id || activite.cree_par === userData.id
@@ -1,4 +1,5 @@
 import React, { useState, useEffect } from 'react';
+import { readAllPages } from './api';
 
 const Favoris = ({ onNavigateBack, onNavigateToLieu }) => {
   const [favoris, setFavoris] = useState([]);
@@ -26,7 +27,9 @@ const Favoris = ({ onNavigateBack, onNavigateToLieu }) => {
       });
 
       if (response.ok) {
-        const data = await response.json();
+        const data = await readAllPages(response, {
+          headers: { 'Authorization': `Bearer ${token}` }
+        });
         setFavoris(data);
       } else {
         setError('Erreur lors du chargement des favoris');
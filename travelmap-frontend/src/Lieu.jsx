@@ -2,6 +2,7 @@ import React, { useState, useEffect } from 'react';
 import Map from './components/Map';
 import VoyageDetail from './VoyageDetail';
 import ActiviteDetail from './ActiviteDetail';
+import { readAllPages } from './api';
 
 const Lieu = ({ lieuId, lieuData, onNavigateBack, setViewingUserId, setCurrentPage, onNavigateToLieu }) => {
   const [lieuDetails, setLieuDetails] = useState(null);
@@ -134,7 +135,7 @@ const Lieu = ({ lieuId, lieuData, onNavigateBack, setViewingUserId, setCurrentPa
         });
         
         if (response.ok) {
-          const data = await response.json();
+          const data = await readAllPages(response, { headers });
           setActivites(data);
         } else {
           console.error('Erreur lors du chargement des activités');
@@ -345,7 +346,9 @@ const Lieu = ({ lieuId, lieuData, onNavigateBack, setViewingUserId, setCurrentPa
           headers: { 'Authorization': `Bearer ${token}` }
         });
         if (activitesResponse.ok) {
-          setActivites(await activitesResponse.json());
+          setActivites(await readAllPages(activitesResponse, {
+            headers: { 'Authorization': `Bearer ${token}` }
+          }));
         }
         
         alert('Activité créée avec succès !');
@@ -486,7 +489,9 @@ const ArrowDownSVG = () => (
     });
     
     if (favorisResponse.ok) {
-      const favoris = await favorisResponse.json();
+      const favoris = await readAllPages(favorisResponse, {
+        headers: { 'Authorization': `Bearer ${token}` }
+      });
       const favori = favoris.find(f => f.lieu.id === lieuId);
       
       if (favori) {
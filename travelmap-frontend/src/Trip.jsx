@@ -1,4 +1,5 @@
 import React, { useState, useEffect } from 'react';
+import { readAllPages } from './api';
 
 const Trip = () => {
   const [selectedLieu, setSelectedLieu] = useState(null);
@@ -134,7 +135,9 @@ const Trip = () => {
       });
 
       if (response.ok) {
-        const data = await response.json();
+        const data = await readAllPages(response, {
+          headers: { 'Authorization': `Bearer ${token}` }
+        });
         setVoyages(data);
       } else if (response.status === 401) {
         console.error('❌ Erreur 401: Token invalide ou expiré');
@@ -152,7 +155,7 @@ const Trip = () => {
     }
   };
 
-  // Recherche de lieux via GeoNames
+  // Recherche de lieux via le gazetteer GeoNames local
   const searchPlaces = async (query) => {
     if (!query || query.length < 2) {
       setSearchResults([]);
@@ -161,16 +164,26 @@ const Trip = () => {
     }
 
     try {
-      // Utilisation de l'API GeoNames avec votre username
+      // Géocodage sur le gazetteer local (commande import_gazetteer)
       const response = await fetch(
-        `http://api.geonames.org/searchJSON?q=${encodeURIComponent(query)}&maxRows=10&username=ourouchy&featureClass=P&featureClass=A&featureClass=T&orderby=relevance`
+        `http://localhost:8000/api/geocode/?q=${encodeURIComponent(query)}&limit=10`
       );
       
       if (response.ok) {
         const data = await response.json();
-        if (data.geonames && data.geonames.length > 0) {
+        // Gazetteer local du backend, ramené aux champs de l'ancienne réponse GeoNames
+        const geonames = (data.resultats || []).map(ville => ({
+          geonameId: ville.geoname_id,
+          name: ville.nom,
+          countryName: ville.pays_nom || ville.code_pays,
+          countryCode: ville.code_pays,
+          lat: ville.latitude,
+          lng: ville.longitude,
+          fcodeName: ville.population ? `${ville.population.toLocaleString('fr-FR')} hab.` : 'ville'
+        }));
+        if (geonames.length > 0) {
           // Filtrer les résultats pour s'assurer qu'ils ont toutes les données requises
-          const validPlaces = data.geonames.filter(place => 
+          const validPlaces = geonames.filter(place => 
             place.name && 
             place.countryName && 
             place.countryCode && 
@@ -190,12 +203,12 @@ const Trip = () => {
           setShowSearchResults(false);
         }
       } else {
-        console.warn('Erreur lors de la recherche GeoNames:', response.status);
+        console.warn('Erreur lors du géocodage:', response.status);
         setSearchResults([]);
         setShowSearchResults(false);
       }
     } catch (error) {
-      console.error('Erreur de recherche GeoNames:', error);
+      console.error('Erreur de géocodage:', error);
       setSearchResults([]);
       setShowSearchResults(false);
     }
@@ -573,7 +586,7 @@ const Trip = () => {
                     type="text"
                     value={searchQuery}
                     onChange={handleSearchChange}
-                    placeholder="Rechercher une ville ou un pays via GeoNames..."
+                    placeholder="Rechercher une ville ou un pays..."
                     style={{
                       width: '100%',
                       padding: '12px',
@@ -0,0 +1,19 @@
+// Les listes de l'API sont paginées par curseur : { next, previous, results }.
+// readAllPages lit la première réponse puis suit les liens `next` pour reconstituer la liste complète.
+export const readAllPages = async (response, options = {}) => {
+  let data = await response.json();
+  if (Array.isArray(data)) {
+    return data;
+  }
+
+  const results = [...data.results];
+  while (data.next) {
+    const nextResponse = await fetch(data.next, options);
+    if (!nextResponse.ok) {
+      break;
+    }
+    data = await nextResponse.json();
+    results.push(...data.results);
+  }
+  return results;
+};
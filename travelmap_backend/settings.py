@@ -38,6 +38,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "rest_framework",         
     "rest_framework_simplejwt",
     "corsheaders",            
@@ -138,6 +139,10 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
+    # Pagination par curseur (keyset) sur toutes les listes ; ?limit= borné par MAX_PAGE_SIZE
+    'DEFAULT_PAGINATION_CLASS': 'places.pagination.KeysetPagination',
+    'PAGE_SIZE': 50,
+    'MAX_PAGE_SIZE': 200,
 }
 
 # JWT settings
@@ -155,6 +160,42 @@ SIMPLE_JWT = {
 # Media files configuration
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Service des médias (places/views.py, servir_media) : durée de cache des fichiers hors cas/ (secondes),
+# et préfixe de l'emplacement interne nginx (X-Accel-Redirect) qui sert les fichiers à la place de Django
+MEDIAS_MAX_AGE = 3600
+MEDIAS_X_ACCEL_REDIRECT = None
+
+# Tuiles vectorielles de la carte : cache disque, à changer de version pour tout invalider
+TUILES_CACHE_DIR = os.path.join(BASE_DIR, 'cache', 'tuiles')
+TUILES_VERSION = '1'
+TUILES_MAX_AGE = 300  # secondes
+
+# Autocomplétion en mémoire : âge maximal (secondes) de l'index avant rechargement en arrière-plan
+AUTOCOMPLETE_TTL = 300
+
+# Géocodage inverse : index des villes du gazetteer (tableaux NumPy projetés en mémoire)
+GEOCODAGE_INDEX_DIR = os.path.join(BASE_DIR, 'cache', 'geocodage')
+
+# Suggestions : durée de vie (secondes) du cache par utilisateur, effacé à chaque écriture de ses favoris
+# ou voyages (avec plusieurs processus, un cache partagé est nécessaire pour que l'effacement les atteigne tous)
+SUGGESTIONS_CACHE_TTL = 300
+
+# Suggestions par co-visitation : voisins des lieux (tableaux NumPy projetés en mémoire, commande build_covisitation)
+COVISITATION_DIR = os.path.join(BASE_DIR, 'cache', 'covisitation')
+
+# Déclinaisons des images téléversées (places/renditions.py) : nombre de fils de traitement par processus
+RENDITIONS_WORKERS = 2
+
+# Médias joints à la création d'un voyage ou d'une activité (places/ingestion.py) : fils d'écriture par processus
+MEDIAS_INGESTION_WORKERS = 8
+
+# Téléversements par morceaux (places/televersements.py) : fichiers partiels, taille des morceaux,
+# tailles maximales par type de média et durée de vie d'une session
+TELEVERSEMENTS_DIR = os.path.join(BASE_DIR, 'televersements')
+TELEVERSEMENT_TAILLE_MORCEAU = 8 * 1024 * 1024  # 8MB
+TELEVERSEMENT_TAILLE_MAX_IMAGE = 20 * 1024 * 1024  # 20MB
+TELEVERSEMENT_TAILLE_MAX_VIDEO = 2 * 1024 * 1024 * 1024  # 2GB
+TELEVERSEMENT_DUREE = timedelta(hours=24)
 
 # File upload settings
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
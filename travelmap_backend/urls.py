@@ -15,15 +15,15 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
+import re
+
+from django.urls import path, include, re_path
 from django.conf import settings
-from django.conf.urls.static import static
+from places.views import servir_media
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/", include("places.urls")),
+    # Fichiers des médias, avec requêtes partielles et validateurs de cache (servis par nginx si MEDIAS_X_ACCEL_REDIRECT)
+    re_path(rf"^{re.escape(settings.MEDIA_URL.lstrip('/'))}(?P<chemin>.+)$", servir_media, name="media"),
 ]
-
-# Serve media files in development
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "travelmap_backend.settings")
 
 application = get_wsgi_application()
+
+# Chargement de l'index d'autocomplétion en arrière-plan dès le démarrage du processus
+from places.autocomplete import precharger  # noqa: E402
+
+precharger()